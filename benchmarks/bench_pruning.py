@@ -0,0 +1,105 @@
+"""MaxScore pruning versus exhaustive scoring on the in-process indexes.
+
+Loads a Zipf corpus (see ``bench_retrieval.py``) into a ``LocalIndexReplica`` and an
+``IndexSnapshot``, then runs long multi-term queries through ``search`` with and
+without pruning. Every query's results are compared and the run aborts on the first
+difference, so reported speedups are for identical top-k lists.
+
+Usage:
+    python benchmarks/bench_pruning.py [--docs 10000 100000] [--terms 4 8 16] [-k 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from bench_retrieval import TABLE, sqlite_connection, synthetic_corpus
+
+from langchain_hana_retriever.instrumentation import Instrumentation
+from langchain_hana_retriever.replica import LocalIndexReplica
+from langchain_hana_retriever.snapshot import IndexSnapshot
+
+
+def long_queries(n_queries: int, n_terms: int, vocab_size: int, seed: int) -> list[list[str]]:
+    """Queries mixing frequent and rare terms, log-uniform over term rank."""
+    rng = random.Random(seed + n_terms)
+    return [
+        [
+            f"term{min(int(math.exp(rng.uniform(0, math.log(vocab_size)))), vocab_size - 1)}"
+            for _ in range(n_terms)
+        ]
+        for _ in range(n_queries)
+    ]
+
+
+def compare(index: Any, queries: list[list[str]], k: int) -> dict[str, float]:
+    """Median latency of each mode, after checking both return the same results."""
+    for query in queries:
+        pruned, exhaustive = index.search(query, k), index.search(query, k, prune=False)
+        if pruned != exhaustive:
+            raise AssertionError(f"results differ for {query}")
+
+    instrumentation = Instrumentation()
+    timings: dict[bool, list[float]] = {True: [], False: []}
+    for prune in (False, True):
+        for query in queries:
+            with instrumentation.profile("search"):
+                began = time.perf_counter()
+                index.search(query, k, prune=prune)
+                timings[prune].append((time.perf_counter() - began) * 1000)
+    exhaustive_ms = statistics.median(timings[False])
+    pruned_ms = statistics.median(timings[True])
+    return {
+        "exhaustive_ms": exhaustive_ms,
+        "pruned_ms": pruned_ms,
+        "speedup": exhaustive_ms / pruned_ms,
+        "skipped": instrumentation.counters().get("postings_skipped", 0) / len(queries),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--terms", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocab", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of term ranks")
+    parser.add_argument("--doc-len", type=int, default=80)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{'index':>8}  {'docs':>7}  {'terms':>5}  {'exhaustive ms':>13}  "
+        f"{'pruned ms':>9}  {'speedup':>7}  {'skipped/query':>13}"
+    )
+    for n_docs in args.docs:
+        corpus = synthetic_corpus(n_docs, args.vocab, args.zipf, args.doc_len, args.seed)
+        conn = sqlite_connection(corpus)
+        replica = LocalIndexReplica(conn, TABLE, id_column="ID", batch_size=5000)
+        replica.load()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bench.idx"
+            replica.save_snapshot(path)
+            with IndexSnapshot(path) as snapshot:
+                for n_terms in args.terms:
+                    queries = long_queries(args.queries, n_terms, args.vocab, args.seed)
+                    for name, index in (("replica", replica), ("snapshot", snapshot)):
+                        row = compare(index, queries, args.k)
+                        print(
+                            f"{name:>8}  {n_docs:>7}  {n_terms:>5}  "
+                            f"{row['exhaustive_ms']:>13.3f}  {row['pruned_ms']:>9.3f}  "
+                            f"{row['speedup']:>6.2f}x  {row['skipped']:>13.0f}"
+                        )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""End-to-end retrieval benchmark against a local SQLite stand-in for HANA.
+
+Generates Zipf-distributed synthetic corpora, loads them into an in-memory SQLite
+database with a ``LOCATE`` shim, and measures ``HANABm25Retriever``,
+``HANAHybridRetriever`` (with a numpy fake vector store) and
+``reciprocal_rank_fusion``. Reports throughput, latency percentiles and peak Python
+heap per corpus size and ``candidate_limit``. Runs are seeded, so two runs on the
+same machine measure the same work; ``--json`` writes results that ``--compare``
+reads back.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--docs 1000 10000] [--candidate-limits 50 500]
+        [--queries 200] [--vocab 5000] [--zipf 1.1] [--json out.json] [--compare base.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+import zlib
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.hybrid import HANAHybridRetriever
+from langchain_hana_retriever.utils import reciprocal_rank_fusion
+
+TABLE = "BENCH_DOCS"
+DIMENSIONS = 64
+
+
+# -- Corpus and stand-ins ----------------------------------------------------------
+
+
+def zipf_weights(vocab_size: int, exponent: float) -> list[float]:
+    return [1.0 / (rank + 1) ** exponent for rank in range(vocab_size)]
+
+
+def synthetic_corpus(
+    n_docs: int, vocab_size: int, exponent: float, doc_len: int, seed: int
+) -> list[str]:
+    """Documents of ``doc_len`` words drawn from a Zipf distribution over the vocabulary."""
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    weights = zipf_weights(vocab_size, exponent)
+    return [" ".join(rng.choices(vocab, weights=weights, k=doc_len)) for _ in range(n_docs)]
+
+
+def synthetic_queries(n_queries: int, vocab_size: int, seed: int) -> list[str]:
+    """Queries of 2-4 terms, biased towards mid-frequency terms as real queries are."""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(n_queries):
+        n_terms = rng.randint(2, 4)
+        ranks = [
+            int(math.exp(rng.uniform(math.log(5), math.log(vocab_size)))) for _ in range(n_terms)
+        ]
+        queries.append(" ".join(f"term{min(rank, vocab_size - 1)}" for rank in ranks))
+    return queries
+
+
+def _locate(haystack: Any, needle: Any) -> int:
+    if haystack is None or needle is None:
+        return 0
+    return str(haystack).find(str(needle)) + 1
+
+
+def sqlite_connection(corpus: list[str]) -> sqlite3.Connection:
+    """In-memory DB-API connection shaped like a HANA table with the functions we use."""
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.create_function("LOCATE", 2, _locate, deterministic=True)
+    conn.create_function("TO_NVARCHAR", 1, lambda value: value, deterministic=True)
+    conn.execute(f"CREATE TABLE {TABLE} (ID INTEGER PRIMARY KEY, VEC_TEXT NCLOB, SOURCE TEXT)")
+    conn.executemany(
+        f"INSERT INTO {TABLE} VALUES (?, ?, ?)",
+        [(i, text, f"doc{i % 100}.pdf") for i, text in enumerate(corpus)],
+    )
+    conn.commit()
+    return conn
+
+
+def _embed(text: str) -> np.ndarray:
+    # Hashed bag of words, L2-normalized: cheap and deterministic
+    vector = np.zeros(DIMENSIONS)
+    for word in text.split():
+        vector[zlib.crc32(word.encode()) % DIMENSIONS] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class FakeVectorStore:
+    """Exact cosine search over hashed embeddings, with the HanaDB search methods used."""
+
+    def __init__(self, corpus: list[str]) -> None:
+        self.corpus = corpus
+        self.matrix = np.vstack([_embed(text) for text in corpus])
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        scores = self.matrix @ _embed(query)
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [Document(page_content=self.corpus[i], metadata={"ID": int(i)}) for i in top]
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        return self.similarity_search(query, k=k, **kwargs)
+
+
+# -- Measurement -------------------------------------------------------------------
+
+
+def _percentile(ordered: list[float], percent: float) -> float:
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def measure(run: Callable[[str], object], queries: list[str]) -> dict[str, float]:
+    """Latency percentiles and throughput over ``queries``, then peak heap in a second pass."""
+    run(queries[0])  # warm-up: imports, numpy and statement caches
+    samples = []
+    start = time.perf_counter()
+    for query in queries:
+        began = time.perf_counter()
+        run(query)
+        samples.append((time.perf_counter() - began) * 1000)
+    elapsed = time.perf_counter() - start
+
+    # tracemalloc slows allocation down, so memory is measured in a separate pass
+    tracemalloc.start()
+    for query in queries:
+        run(query)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ordered = sorted(samples)
+    return {
+        "qps": len(queries) / elapsed,
+        "mean_ms": sum(samples) / len(samples),
+        "p50_ms": _percentile(ordered, 50),
+        "p95_ms": _percentile(ordered, 95),
+        "p99_ms": _percentile(ordered, 99),
+        "peak_kib": peak / 1024,
+    }
+
+
+def bench_case(
+    corpus: list[str], queries: list[str], candidate_limit: int, k: int
+) -> list[dict[str, Any]]:
+    conn = sqlite_connection(corpus)
+    store = FakeVectorStore(corpus)
+    bm25 = HANABm25Retriever(
+        connection=conn,
+        table_name=TABLE,
+        metadata_columns=["ID"],
+        candidate_limit=candidate_limit,
+        k=k,
+    )
+    hybrid = HANAHybridRetriever(vector_store=store, keyword_retriever=bm25, k=k, id_key="ID")
+    # Fusion alone, on precomputed leg results
+    legs = {query: (store.similarity_search(query, k=k), bm25.invoke(query)) for query in queries}
+
+    cases: dict[str, Callable[[str], object]] = {
+        "bm25": bm25.invoke,
+        "hybrid": hybrid.invoke,
+        "rrf": lambda query: reciprocal_rank_fusion(list(legs[query]), [0.5, 0.5], k=k),
+    }
+    try:
+        return [
+            {"case": name, "docs": len(corpus), "candidate_limit": candidate_limit}
+            | measure(run, queries)
+            for name, run in cases.items()
+        ]
+    finally:
+        conn.close()
+
+
+# -- Reporting ---------------------------------------------------------------------
+
+
+def _key(row: dict[str, Any]) -> tuple[str, int, int]:
+    return (row["case"], row["docs"], row["candidate_limit"])
+
+
+def print_table(results: list[dict[str, Any]], baseline: dict[tuple[str, int, int], Any]) -> None:
+    header = (
+        f"{'case':>6}  {'docs':>7}  {'limit':>5}  {'qps':>8}  {'p50 ms':>7}  "
+        f"{'p95 ms':>7}  {'p99 ms':>7}  {'peak KiB':>9}"
+    )
+    if baseline:
+        header += f"  {'p50 vs base':>11}"
+    print(header)
+    for row in results:
+        line = (
+            f"{row['case']:>6}  {row['docs']:>7}  {row['candidate_limit']:>5}  "
+            f"{row['qps']:>8.1f}  {row['p50_ms']:>7.2f}  {row['p95_ms']:>7.2f}  "
+            f"{row['p99_ms']:>7.2f}  {row['peak_kib']:>9.1f}"
+        )
+        base = baseline.get(_key(row))
+        if base is not None:
+            line += f"  {row['p50_ms'] / base['p50_ms']:>10.2f}x"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--candidate-limits", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocab", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of term ranks")
+    parser.add_argument("--doc-len", type=int, default=80)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", metavar="PATH", help="write machine-readable results")
+    parser.add_argument("--compare", metavar="PATH", help="results of an earlier --json run")
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries, args.vocab, args.seed)
+    results = []
+    for n_docs in args.docs:
+        corpus = synthetic_corpus(n_docs, args.vocab, args.zipf, args.doc_len, args.seed)
+        for candidate_limit in args.candidate_limits:
+            results.extend(bench_case(corpus, queries, candidate_limit, args.k))
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {_key(row): row for row in json.load(f)["results"]}
+    print_table(results, baseline)
+
+    if args.json:
+        report = {
+            "config": {key: value for key, value in vars(args).items() if key != "compare"},
+            "environment": {"python": sys.version.split()[0], "platform": platform.platform()},
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Micro-benchmark: rank_bm25 per-query construction vs the vectorized BM25 engine.
+
+Usage:
+    python benchmarks/bench_scoring.py [--candidates 50 500 5000] [--repeat 20] [--json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections.abc import Callable
+from functools import partial
+
+from rank_bm25 import BM25Okapi
+
+from langchain_hana_retriever.scoring import BM25Scorer, top_k
+
+
+def synthetic_corpus(
+    n_docs: int, vocab_size: int = 20_000, doc_len: int = 120, seed: int = 0
+) -> list[list[str]]:
+    """Zipf-distributed tokenized documents."""
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    weights = [1.0 / (rank + 1) for rank in range(vocab_size)]
+    return [rng.choices(vocab, weights=weights, k=doc_len) for _ in range(n_docs)]
+
+
+def rank_bm25_path(query: list[str], corpus: list[list[str]], k: int) -> list[int]:
+    scores = BM25Okapi(corpus).get_scores(query)
+    ranked = sorted(zip(scores, range(len(corpus)), strict=True), key=lambda x: x[0], reverse=True)
+    return [i for _, i in ranked[:k]]
+
+
+def engine_path(query: list[str], corpus: list[list[str]], k: int) -> list[int]:
+    return top_k(BM25Scorer().score(query, corpus), k).tolist()
+
+
+def timeit(func: Callable[[], object], repeat: int) -> dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    queries = {
+        # Only rare terms: no IDF floor needed
+        "rare": ["term40", "term250", "term1200", "term9000"],
+        # "term0" occurs in most documents, triggering the Okapi IDF floor, which needs
+        # the average IDF over the whole candidate vocabulary
+        "common": ["term0", "term40", "term250", "term1200", "term9000"],
+    }
+    results = []
+    for n in args.candidates:
+        corpus = synthetic_corpus(n)
+        for name, query in queries.items():
+            assert rank_bm25_path(query, corpus, args.k) == engine_path(query, corpus, args.k)
+            baseline = timeit(partial(rank_bm25_path, query, corpus, args.k), args.repeat)
+            engine = timeit(partial(engine_path, query, corpus, args.k), args.repeat)
+            results.append(
+                {
+                    "candidates": n,
+                    "query": name,
+                    "rank_bm25_ms": baseline["median_ms"],
+                    "engine_ms": engine["median_ms"],
+                    "speedup": baseline["median_ms"] / engine["median_ms"],
+                }
+            )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'candidates':>10}  {'query':>6}  {'rank_bm25 ms':>12}  {'engine ms':>10}  {'speedup':>8}"
+    )
+    for row in results:
+        print(
+            f"{row['candidates']:>10}  {row['query']:>6}  {row['rank_bm25_ms']:>12.2f}  "
+            f"{row['engine_ms']:>10.2f}  {row['speedup']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
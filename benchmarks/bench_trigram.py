@@ -0,0 +1,109 @@
+"""LOCATE scan versus trigram-narrowed candidate fetch on a SQLite stand-in.
+
+Loads a Zipf corpus (see ``bench_retrieval.py``), builds a ``HANATrigramIndex`` next to
+it and runs the same queries through ``HANABm25Retriever`` with and without the index.
+Before timing, every query's candidate set is fetched both ways with an unbounded
+``candidate_limit`` and compared, so narrowing is checked to keep substring matching
+unchanged. Reported times are the mean of the ``sql`` and ``fetch`` stages (candidate
+fetch) and the median of whole queries.
+
+SQLite evaluates the ``LOCATE`` shim in Python, which exaggerates the cost of a scan
+compared to HANA; treat the ratio as an upper bound and the shape as the result.
+
+Usage:
+    python benchmarks/bench_trigram.py [--docs 1000 10000] [--queries 200] [--limit 50]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Any
+
+from bench_retrieval import TABLE, sqlite_connection, synthetic_corpus, synthetic_queries
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.instrumentation import Instrumentation
+from langchain_hana_retriever.trigram import HANATrigramIndex
+
+
+def _retriever(conn: Any, limit: int, k: int, **kwargs: Any) -> HANABm25Retriever:
+    return HANABm25Retriever(
+        connection=conn,
+        table_name=TABLE,
+        metadata_columns=["ID"],
+        id_column="ID",
+        candidate_limit=limit,
+        k=k,
+        **kwargs,
+    )
+
+
+def check_same_candidates(
+    conn: Any, index: HANATrigramIndex, queries: list[str], n_docs: int
+) -> None:
+    scan = _retriever(conn, n_docs, n_docs)
+    narrowed = _retriever(conn, n_docs, n_docs, trigram_index=index)
+    for query in queries:
+        expected = {doc.metadata["ID"] for doc in scan.invoke(query)}
+        if {doc.metadata["ID"] for doc in narrowed.invoke(query)} != expected:
+            raise AssertionError(f"candidates differ for {query!r}")
+
+
+def measure(retriever: HANABm25Retriever, queries: list[str]) -> dict[str, float]:
+    instrumentation = Instrumentation(window=len(queries))
+    retriever = retriever.model_copy(update={"instrumentation": instrumentation})
+    retriever.invoke(queries[0])  # warm-up
+    instrumentation.reset()
+    samples = []
+    for query in queries:
+        began = time.perf_counter()
+        retriever.invoke(query)
+        samples.append((time.perf_counter() - began) * 1000)
+    stats = instrumentation.stats()
+    return {
+        "fetch_ms": (stats["sql"].mean + stats["fetch"].mean) * 1000,
+        "p50_ms": statistics.median(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocab", type=int, default=5000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of term ranks")
+    parser.add_argument("--doc-len", type=int, default=80)
+    parser.add_argument("--limit", type=int, default=50, help="candidate_limit")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries, args.vocab, args.seed)
+    print(
+        f"{'docs':>7}  {'build s':>7}  {'scan fetch ms':>13}  {'trigram fetch ms':>16}  "
+        f"{'scan p50 ms':>13}  {'trigram p50 ms':>16}  {'speedup':>7}"
+    )
+    for n_docs in args.docs:
+        corpus = synthetic_corpus(n_docs, args.vocab, args.zipf, args.doc_len, args.seed)
+        conn = sqlite_connection(corpus)
+        index = HANATrigramIndex(conn, TABLE, id_column="ID", id_type="INTEGER")
+        index.create()
+        began = time.perf_counter()
+        index.build(batch_size=5000)
+        build_s = time.perf_counter() - began
+
+        check_same_candidates(conn, index, queries, n_docs)
+        scan = measure(_retriever(conn, args.limit, args.k), queries)
+        narrowed = measure(_retriever(conn, args.limit, args.k, trigram_index=index), queries)
+        print(
+            f"{n_docs:>7}  {build_s:>7.2f}  {scan['fetch_ms']:>13.3f}  "
+            f"{narrowed['fetch_ms']:>16.3f}  {scan['p50_ms']:>13.3f}  "
+            f"{narrowed['p50_ms']:>16.3f}  {scan['fetch_ms'] / narrowed['fetch_ms']:>6.2f}x"
+        )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
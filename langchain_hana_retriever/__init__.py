@@ -1,7 +1,40 @@
 """LangChain BM25 and hybrid retrievers for SAP HANA Cloud."""
 
+from langchain_hana_retriever.admission import AdmissionController
+from langchain_hana_retriever.analysis import Analyzer
 from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.build import ParallelIndexBuilder
+from langchain_hana_retriever.cache import QueryCache
+from langchain_hana_retriever.embeddings import EmbeddingCache
+from langchain_hana_retriever.filters import MetadataFilter
 from langchain_hana_retriever.hybrid import HANAHybridRetriever
+from langchain_hana_retriever.index import HANAPostingsIndex
+from langchain_hana_retriever.instrumentation import Instrumentation
+from langchain_hana_retriever.planner import QueryPlanner
+from langchain_hana_retriever.pool import HANAConnectionPool
+from langchain_hana_retriever.replica import LocalIndexReplica
+from langchain_hana_retriever.sharded import HANAShardedRetriever
+from langchain_hana_retriever.snapshot import IndexSnapshot
+from langchain_hana_retriever.stats import CorpusStats
+from langchain_hana_retriever.trigram import HANATrigramIndex
 
-__all__ = ["HANABm25Retriever", "HANAHybridRetriever"]
+__all__ = [
+    "AdmissionController",
+    "Analyzer",
+    "CorpusStats",
+    "EmbeddingCache",
+    "HANABm25Retriever",
+    "HANAConnectionPool",
+    "HANAHybridRetriever",
+    "HANAPostingsIndex",
+    "HANAShardedRetriever",
+    "HANATrigramIndex",
+    "IndexSnapshot",
+    "Instrumentation",
+    "LocalIndexReplica",
+    "MetadataFilter",
+    "ParallelIndexBuilder",
+    "QueryCache",
+    "QueryPlanner",
+]
 __version__ = "0.1.0"
@@ -0,0 +1,298 @@
+"""Admission control, request deadlines and load shedding for retrieval calls."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import (
+    AbstractAsyncContextManager,
+    AbstractContextManager,
+    asynccontextmanager,
+    contextmanager,
+    nullcontext,
+)
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_hana_retriever.instrumentation import count
+
+# Absolute monotonic deadline of the current request, and the controllers holding a
+# slot for it. Copied contexts (legs, shards, run_blocking) inherit both, so nested
+# retrievers share the caller's deadline and do not queue for a second slot.
+_deadline: ContextVar[float | None] = ContextVar("hana_retriever_deadline", default=None)
+_held: ContextVar[frozenset[int]] = ContextVar("hana_retriever_admitted", default=frozenset())
+
+
+class LoadShedError(RuntimeError):
+    """Raised when a request is rejected: the wait queue is full or no slot freed in time."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised when a request's deadline passed before its next statement could start."""
+
+
+@dataclass(frozen=True)
+class AdmissionMetrics:
+    """Point-in-time snapshot of admission control."""
+
+    max_concurrent: int
+    in_flight: int
+    queue_depth: int
+    admitted: int
+    shed: int
+    wait_time: float
+    degraded: dict[str, int]
+
+
+@contextmanager
+def deadline(timeout: float | None) -> Iterator[None]:
+    """Give the enclosed work ``timeout`` seconds, never extending an outer deadline."""
+    if timeout is None:
+        yield
+        return
+    current = _deadline.get()
+    expires = time.monotonic() + timeout
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> float | None:
+    """Seconds until the current request's deadline (negative once passed), or ``None``."""
+    expires = _deadline.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def apply_deadline(cursor: Any) -> None:
+    """Bound statements on ``cursor`` by the current request's deadline.
+
+    Raises :class:`DeadlineExceededError` when the deadline has already passed, so no
+    statement is sent whose result nobody waits for. Otherwise sets the cursor's query
+    timeout (hdbcli's ``setquerytimeout``, in whole seconds) to the time left, so HANA
+    cancels the statement instead of finishing work after the caller gave up; drivers
+    without it run unbounded.
+    """
+    left = time_left()
+    if left is None:
+        return
+    if left <= 0:
+        raise DeadlineExceededError("request deadline passed before the statement started")
+    set_timeout = getattr(cursor, "setquerytimeout", None)
+    if set_timeout is not None:
+        set_timeout(max(1, math.ceil(left)))
+
+
+class _Waiter:
+    """A queued request; ``granted`` is set under the controller lock on hand-off."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        self.granted = False
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        else:
+            assert self.loop is not None
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self) -> None:
+        assert self.future is not None
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class AdmissionController:
+    """Bounds concurrent retrieval calls, shared across retriever instances.
+
+    Each request holds one slot from the moment it is admitted until it returns, so
+    at most ``max_concurrent`` requests reach the database at once. Further requests
+    wait in a FIFO queue of at most ``max_queue`` entries, up to ``max_wait`` seconds
+    or their deadline, whichever comes first; a request arriving at a full queue, or
+    still queued when its time runs out, is shed with :class:`LoadShedError` rather
+    than piling more statements onto HANA. Nested retrievers (hybrid legs, shards)
+    inherit their caller's slot instead of queueing for a second one. Sync and async
+    callers share one queue; async callers wait without holding a thread.
+
+    Retrievers degrade instead of failing when less than ``degrade_within`` seconds
+    are left before their deadline (fewer BM25 candidates, a single hybrid leg) and
+    report it through :meth:`record_degraded`.
+
+    Args:
+        max_concurrent: Requests admitted at once.
+        max_queue: Requests allowed to wait for a slot.
+        max_wait: Seconds a request may wait without a deadline (``None`` waits).
+        degrade_within: Seconds before the deadline at which retrievers degrade.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_queue: int = 64,
+        max_wait: float | None = None,
+        degrade_within: float | None = None,
+    ) -> None:
+        if max_concurrent < 1 or max_queue < 0:
+            raise ValueError("require max_concurrent >= 1 and max_queue >= 0")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.degrade_within = degrade_within
+
+        self._lock = threading.Lock()
+        self._waiters: deque[_Waiter] = deque()
+        self._in_flight = 0
+        self._admitted = 0
+        self._shed = 0
+        self._wait_time = 0.0
+        self._degraded: Counter[str] = Counter()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot for the enclosed request, waiting in the queue if needed."""
+        if id(self) in _held.get():
+            yield
+            return
+        start = time.monotonic()
+        waiter = self._enqueue()
+        if waiter is not None:
+            assert waiter.event is not None
+            try:
+                waiter.event.wait(self._wait_timeout())
+            except BaseException:
+                self._abandon(waiter)
+                raise
+            self._settle(waiter, start)
+        token = _held.set(_held.get() | {id(self)})
+        try:
+            yield
+        finally:
+            _held.reset(token)
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """Async variant of :meth:`slot`."""
+        if id(self) in _held.get():
+            yield
+            return
+        start = time.monotonic()
+        waiter = self._enqueue(asyncio.get_running_loop())
+        if waiter is not None:
+            assert waiter.future is not None
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self._wait_timeout())
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                self._abandon(waiter)
+                raise
+            self._settle(waiter, start)
+        token = _held.set(_held.get() | {id(self)})
+        try:
+            yield
+        finally:
+            _held.reset(token)
+            self._release()
+
+    def near_deadline(self) -> bool:
+        """Whether the current request has less than ``degrade_within`` seconds left."""
+        left = time_left()
+        return self.degrade_within is not None and left is not None and left < self.degrade_within
+
+    def record_degraded(self, mode: str) -> None:
+        """Count a request served in a degraded ``mode`` (e.g. ``"keyword_only"``)."""
+        with self._lock:
+            self._degraded[mode] += 1
+        count(f"degraded_{mode}", 1)
+
+    def metrics(self) -> AdmissionMetrics:
+        """Return a snapshot of admission counters."""
+        with self._lock:
+            return AdmissionMetrics(
+                max_concurrent=self.max_concurrent,
+                in_flight=self._in_flight,
+                queue_depth=len(self._waiters),
+                admitted=self._admitted,
+                shed=self._shed,
+                wait_time=self._wait_time,
+                degraded=dict(self._degraded),
+            )
+
+    def _wait_timeout(self) -> float | None:
+        left = time_left()
+        if left is None:
+            return self.max_wait
+        return max(left, 0.0) if self.max_wait is None else max(min(left, self.max_wait), 0.0)
+
+    def _enqueue(self, loop: asyncio.AbstractEventLoop | None = None) -> _Waiter | None:
+        """Admit immediately (``None``) or return a queued waiter; shed if neither."""
+        left = time_left()
+        with self._lock:
+            if left is not None and left <= 0:
+                reason = "deadline already passed"
+            elif self._in_flight < self.max_concurrent and not self._waiters:
+                self._in_flight += 1
+                self._admitted += 1
+                return None
+            elif len(self._waiters) < self.max_queue:
+                waiter = _Waiter(loop)
+                self._waiters.append(waiter)
+                return waiter
+            else:
+                reason = f"wait queue full ({self.max_queue} waiting)"
+            self._shed += 1
+        count("shed", 1)
+        raise LoadShedError(f"request shed: {reason}")
+
+    def _settle(self, waiter: _Waiter, start: float) -> None:
+        """Keep a granted slot, or leave the queue and shed the request."""
+        with self._lock:
+            self._wait_time += time.monotonic() - start
+            if waiter.granted:
+                return
+            self._waiters.remove(waiter)
+            self._shed += 1
+        count("shed", 1)
+        raise LoadShedError(
+            f"request shed: no slot within {time.monotonic() - start:.3f}s "
+            f"({self.max_concurrent} in flight)"
+        )
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Leave the queue after an interruption, passing on a slot granted meanwhile."""
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                return
+        self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self._in_flight -= 1
+                return
+            # Hand the slot straight to the oldest waiter
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self._admitted += 1
+        waiter.wake()
+
+
+def admit(controller: AdmissionController | None) -> AbstractContextManager[Any]:
+    """Hold a slot of ``controller``, or do nothing when it is ``None``."""
+    return nullcontext() if controller is None else controller.slot()
+
+
+def aadmit(controller: AdmissionController | None) -> AbstractAsyncContextManager[Any]:
+    """Async variant of :func:`admit`."""
+    return nullcontext() if controller is None else controller.aslot()
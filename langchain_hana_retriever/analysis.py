@@ -0,0 +1,215 @@
+"""Configurable text analysis: tokenization, stopwords, light stemming and accent folding."""
+
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any
+
+# Letters and digits of any script; underscores split words like other punctuation
+_WORD = re.compile(r"[^\W_]+")
+
+ENGLISH_STOPWORDS: frozenset[str] = frozenset(
+    """
+    a an and are as at be but by for from has have in is it its of on or that the this
+    to was were will with
+    """.split()
+)
+
+SPANISH_STOPWORDS: frozenset[str] = frozenset(
+    """
+    a al como con de del el en es esta este la las le les lo los más mas no o para pero
+    por que se sin su sus un una y
+    """.split()
+)
+
+STOPWORDS: dict[str, frozenset[str]] = {
+    "english": ENGLISH_STOPWORDS,
+    "spanish": SPANISH_STOPWORDS,
+}
+
+
+def fold_accents(text: str) -> str:
+    """Strip combining marks (``canción`` -> ``cancion``), keeping ``ñ`` distinct."""
+    decomposed = unicodedata.normalize("NFD", text.replace("ñ", "\0"))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.replace("\0", "ñ")
+
+
+def english_light_stem(token: str) -> str:
+    """Harman's S-stemmer: conflate plural forms only."""
+    if len(token) > 3 and token.endswith("ies") and not token.endswith(("eies", "aies")):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("es") and not token.endswith(("aes", "ees", "oes")):
+        return token[:-1]
+    if len(token) > 2 and token.endswith("s") and not token.endswith(("us", "ss")):
+        return token[:-1]
+    return token
+
+
+def spanish_light_stem(token: str) -> str:
+    """Conflate regular Spanish plurals (``canciones`` -> ``cancion``, ``luces`` -> ``luz``)."""
+    if len(token) > 4 and token.endswith("ces"):
+        return token[:-3] + "z"
+    if len(token) > 4 and token.endswith("es") and token[-3] in "lrndjy":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and token[-2] in "aeiouáéó":
+        return token[:-1]
+    return token
+
+
+_fold = fold_accents
+
+STEMMERS: dict[str, Callable[[str], str]] = {
+    "english": english_light_stem,
+    "spanish": spanish_light_stem,
+}
+
+
+class Analyzer:
+    """Text analysis pipeline shared by query parsing, scoring and index building.
+
+    Text is lowercased and split into Unicode letter/digit runs of at least
+    ``min_length`` characters; stopwords are dropped. :meth:`tokens` stops there, so
+    tokens stay substrings of the lowercased text (as needed by SQL ``LOCATE``).
+    :meth:`normalize` then applies the light stemmer and accent folding to give index
+    terms. Unlike :func:`~langchain_hana_retriever.utils.tokenize`, repeated terms are
+    kept, so BM25 sees real term frequencies.
+
+    :meth:`counts` memoizes term counts of recently analyzed documents (keyed by row id
+    when given, otherwise by text), so candidate rows returned by many queries are only
+    analyzed once.
+
+    Args:
+        stopwords: Language name(s) from :data:`STOPWORDS` or an explicit word set.
+        stemmer: ``"english"``, ``"spanish"`` or ``None``.
+        fold_accents: Map accented letters to their base letter (except ``ñ``).
+        min_length: Minimum token length.
+        cache_size: Number of documents whose counts are memoized; ``0`` disables it.
+    """
+
+    def __init__(
+        self,
+        stopwords: str | Iterable[str] | None = None,
+        stemmer: str | None = None,
+        fold_accents: bool = False,
+        min_length: int = 2,
+        cache_size: int = 4096,
+    ) -> None:
+        if isinstance(stopwords, str):
+            stopwords = [stopwords]
+        words: set[str] = set()
+        for entry in stopwords or ():
+            words |= STOPWORDS.get(entry, {entry})
+        if stemmer is not None and stemmer not in STEMMERS:
+            raise ValueError(f"unknown stemmer: {stemmer!r}")
+        self.stopwords = frozenset(words)
+        self.stemmer = stemmer
+        self.fold_accents = fold_accents
+        self.min_length = min_length
+        self.cache_size = cache_size
+
+        self._stem = STEMMERS[stemmer] if stemmer else None
+        # Tokens are checked before folding, so also drop unaccented spellings
+        self._stopwords = (
+            self.stopwords | {_fold(w) for w in words} if fold_accents else self.stopwords
+        )
+        self._normal: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[Hashable, tuple[str, dict[str, int]]] = OrderedDict()
+
+    def config(self) -> dict[str, Any]:
+        """Settings that determine the produced terms (for persistence and comparison)."""
+        return {
+            "stopwords": sorted(self.stopwords),
+            "stemmer": self.stemmer,
+            "fold_accents": self.fold_accents,
+            "min_length": self.min_length,
+        }
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Analyzer) and self.config() == other.config()
+
+    def __hash__(self) -> int:
+        return hash((self.stopwords, self.stemmer, self.fold_accents, self.min_length))
+
+    def __repr__(self) -> str:
+        return (
+            f"Analyzer(stemmer={self.stemmer!r}, fold_accents={self.fold_accents}, "
+            f"stopwords={len(self.stopwords)}, min_length={self.min_length})"
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Locks and caches stay behind when shipped to worker processes
+        return {**self.config(), "cache_size": self.cache_size}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__init__(**state)  # type: ignore[misc]
+
+    def tokens(self, text: str | None) -> list[str]:
+        """Lowercased tokens in order, with repeats and without stopwords."""
+        if not text:
+            return []
+        min_length = self.min_length
+        stopwords = self._stopwords
+        return [
+            token
+            for token in _WORD.findall(text.lower())
+            if len(token) >= min_length and token not in stopwords
+        ]
+
+    def query_tokens(self, text: str | None) -> list[str]:
+        """Distinct :meth:`tokens` of a query, in first-occurrence order."""
+        return list(dict.fromkeys(self.tokens(text)))
+
+    def normalize(self, token: str) -> str:
+        """Index term for a token: stemmed and accent-folded as configured."""
+        term = self._normal.get(token)
+        if term is None:
+            term = token
+            if self._stem is not None:
+                term = self._stem(term)
+            if self.fold_accents:
+                term = _fold(term)
+            if len(self._normal) < 1_000_000:
+                self._normal[token] = term
+        return term
+
+    def terms(self, text: str | None) -> list[str]:
+        """Index terms of a text, with repeats."""
+        tokens = self.tokens(text)
+        if self._stem is None and not self.fold_accents:
+            return tokens
+        return list(map(self.normalize, tokens))
+
+    def query_terms(self, tokens: Iterable[str]) -> list[str]:
+        """Distinct index terms for query tokens, in order."""
+        return list(dict.fromkeys(map(self.normalize, tokens)))
+
+    def counts(self, text: str | None, key: Hashable | None = None) -> dict[str, int]:
+        """Term frequencies of a text, memoized by ``key`` (e.g. a row id) or text.
+
+        A cached entry under ``key`` is only reused while the text is unchanged. The
+        returned dict is shared with the cache and must not be modified.
+        """
+        text = text or ""
+        if self.cache_size <= 0:
+            return dict(Counter(self.terms(text)))
+        cache_key = text if key is None else key
+        with self._lock:
+            entry = self._cache.get(cache_key)
+            if entry is not None and entry[0] == text:
+                self._cache.move_to_end(cache_key)
+                return entry[1]
+        counts = dict(Counter(self.terms(text)))
+        with self._lock:
+            self._cache[cache_key] = (text, counts)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return counts
+
+
+DEFAULT_ANALYZER = Analyzer()
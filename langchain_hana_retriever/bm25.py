@@ -2,20 +2,127 @@
 
 from __future__ import annotations
 
+import heapq
+import logging
+import math
+import threading
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import AbstractContextManager, contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
 from typing import Any
 
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForChainRun,
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForChainRun,
+    CallbackManagerForRetrieverRun,
+)
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
-from rank_bm25 import BM25Okapi
+from langchain_core.runnables import RunnableConfig
+from pydantic import PrivateAttr, model_validator
 
-from langchain_hana_retriever.utils import tokenize
+from langchain_hana_retriever.admission import (
+    AdmissionController,
+    aadmit,
+    admit,
+    apply_deadline,
+    deadline,
+)
+from langchain_hana_retriever.analysis import DEFAULT_ANALYZER, Analyzer
+from langchain_hana_retriever.cache import QueryCache, copy_documents
+from langchain_hana_retriever.executor import run_blocking
+from langchain_hana_retriever.filters import MetadataFilter, _batch_filter
+from langchain_hana_retriever.index import HANAPostingsIndex
+from langchain_hana_retriever.instrumentation import (
+    Instrumentation,
+    apublish,
+    count,
+    count_rows,
+    profile,
+    publish,
+    stage,
+)
+from langchain_hana_retriever.planner import QueryPlan, QueryPlanner
+from langchain_hana_retriever.pool import checkout
+from langchain_hana_retriever.replica import LocalIndexReplica
+from langchain_hana_retriever.scoring import (
+    BM25Scorer,
+    BM25Variant,
+    TermDocument,
+    TermMatrix,
+    top_k,
+)
+from langchain_hana_retriever.snapshot import IndexSnapshot
+from langchain_hana_retriever.stats import CorpusStats
+from langchain_hana_retriever.trigram import HANATrigramIndex
+
+logger = logging.getLogger(__name__)
+
+# Characters mapped to spaces so SQL can match whole words: whitespace and the
+# punctuation common in prose. The analyzer splits on any character that is not a
+# letter or digit; the list is short because every entry nests another REPLACE.
+_SEPARATORS = "\t\n\r.,;:!?()[]\"'/-_*#“”"
+
+# Candidate limit of the request being served, when lowered near its deadline
+_degraded_limit: ContextVar[int | None] = ContextVar("hana_retriever_degraded_limit", default=None)
 
 
 class HANABm25Retriever(BaseRetriever):
     """BM25 keyword retriever backed by SAP HANA Cloud.
 
-    Uses SQL LOCATE for candidate filtering, then scores with BM25Okapi in Python.
+    Uses SQL LOCATE for candidate filtering, then scores candidates with a vectorized
+    BM25 engine (``bm25_variant`` selects Okapi, BM25+ or BM25L).
+    When ``corpus_stats`` is set, IDF and average document length come from the whole
+    table instead of the candidate sample, and no BM25 model is built per query.
+    When ``postings_index`` is set, BM25 is computed inside HANA over the index side
+    tables instead of scanning the content column, and a ``trigram_index`` narrows the
+    LOCATE scan to rows containing every trigram of the query terms. An optional
+    ``cache`` serves repeated queries (same token set and parameters) without touching
+    the database.
+    With ``two_phase`` enabled, candidates are first scored from keys, word counts and
+    per-term whole-word occurrence counts computed in HANA, and only the top ``k`` rows
+    are fetched in full by ``id_column``. Setting ``fetch_size`` streams candidates in
+    chunks and keeps only a bounded heap of the best ``k``, so memory does not grow with
+    ``candidate_limit``. A ``planner`` picks query terms by document frequency (from
+    ``corpus_stats``), drops stop-like terms, orders candidates by matched-term count
+    and switches to AND when enough rows match all terms; ``include_plan`` adds the
+    chosen plan to each document's metadata under ``query_plan``. With a ``replica``,
+    queries are answered from an in-process inverted index once it has loaded, and
+    fall back to the SQL path while it warms up; an :class:`IndexSnapshot` opened from
+    disk serves the same purpose without any table scan. In-process indexes evaluate
+    queries with MaxScore pruning, skipping documents whose per-term score bounds
+    cannot reach the top ``k``; set ``pruning=False`` to score every posting (results
+    are identical either way).
+
+    Queries and documents go through the same ``analyzer``; statistics, indexes and
+    replicas must be built with an equal one. LOCATE filtering uses the query's
+    lowercased tokens, while scoring uses their stemmed and accent-folded terms.
+
+    A ``filter`` (HanaDB vector-store filter syntax over table columns, see
+    :class:`MetadataFilter`) is added to the candidate SQL as parameterized conditions,
+    so the ``candidate_limit`` budget is spent on matching rows only. A ``filter``
+    passed to ``invoke`` or ``batch`` is combined with the retriever's own by AND.
+    Replicas evaluate it in Python when all its columns are in ``metadata_columns``;
+    otherwise such queries use the SQL path.
+
+    With ``instrumentation``, each query or batch is profiled: time spent in
+    ``tokenize``, ``sql`` (statement execution), ``fetch``, ``analyze`` (candidate
+    tokenization), ``score``, ``replica`` and ``index`` stages, plus rows and bytes
+    fetched, candidates scored and postings skipped by pruning. Profiles are sent to
+    callback handlers as a ``hana_retriever_profile`` custom event, aggregated into
+    percentiles by :meth:`Instrumentation.stats`, and added to result metadata under
+    ``timings`` when ``include_timings`` is set.
+
+    An ``admission`` controller, usually shared by all retrievers on one database,
+    bounds concurrent requests and sheds excess load with :class:`LoadShedError`.
+    ``request_timeout`` gives each call a deadline (an enclosing :func:`deadline`, or a
+    hybrid retriever's, applies as well) that bounds queueing and becomes the query
+    timeout of every statement. With less than the controller's ``degrade_within``
+    seconds left, the request is served with ``degraded_candidate_limit`` candidates
+    (default a quarter of ``candidate_limit``, at least ``k``).
     """
 
     connection: Any
@@ -25,59 +132,697 @@ class HANABm25Retriever(BaseRetriever):
     k: int = 10
     candidate_limit: int = 50
     max_tokens_in_query: int = 5
+    k1: float = 1.5
+    b: float = 0.75
+    bm25_variant: BM25Variant = "okapi"
+    delta: float | None = None
+    corpus_stats: CorpusStats | None = None
+    postings_index: HANAPostingsIndex | None = None
+    cache: QueryCache | None = None
+    id_column: str | None = None
+    two_phase: bool = False
+    fetch_size: int | None = None
+    planner: QueryPlanner | None = None
+    include_plan: bool = False
+    replica: LocalIndexReplica | IndexSnapshot | None = None
+    pruning: bool = True
+    trigram_index: HANATrigramIndex | None = None
+    analyzer: Analyzer = DEFAULT_ANALYZER
+    filter: dict[str, Any] | None = None
+    instrumentation: Instrumentation | None = None
+    include_timings: bool = False
+    admission: AdmissionController | None = None
+    request_timeout: float | None = None
+    degraded_candidate_limit: int | None = None
 
     model_config = {"arbitrary_types_allowed": True}
 
+    _characters_saved: int = PrivateAttr(default=0)
+    _average_words: float | None = PrivateAttr(default=None)
+    _stats_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @model_validator(mode="after")
+    def _check_two_phase(self) -> HANABm25Retriever:
+        if self.two_phase and not self.id_column:
+            raise ValueError("two_phase requires id_column")
+        if self.replica is not None and (
+            self.replica.content_column != self.content_column
+            or self.replica.metadata_columns != self.metadata_columns
+        ):
+            raise ValueError("replica must store the retriever's content and metadata columns")
+        if self.replica is not None and self.bm25_variant != "okapi":
+            # Replica scoring and its MaxScore bounds are Okapi only
+            raise ValueError("replica requires bm25_variant='okapi'")
+        if self.trigram_index is not None and (
+            self.trigram_index.table_name != self.table_name
+            or self.trigram_index.content_column != self.content_column
+        ):
+            raise ValueError("trigram_index must index the retriever's table and content column")
+        if self.degraded_candidate_limit is not None and self.degraded_candidate_limit < 1:
+            raise ValueError("degraded_candidate_limit must be at least 1")
+        # Fail on malformed filters at construction rather than on the first query
+        MetadataFilter.coerce(self.filter)
+        for component in (self.corpus_stats, self.postings_index, self.replica):
+            if component is not None and component.analyzer != self.analyzer:
+                raise ValueError(
+                    f"{type(component).__name__} was built with {component.analyzer!r}, "
+                    f"but the retriever uses {self.analyzer!r}"
+                )
+        return self
+
+    @property
+    def characters_saved(self) -> int:
+        """Content characters not transferred thanks to two-phase retrieval, cumulative."""
+        return self._characters_saved
+
     def _get_relevant_documents(
         self,
         query: str,
         *,
         run_manager: CallbackManagerForRetrieverRun,
+        filter: dict[str, Any] | None = None,
     ) -> list[Document]:
-        tokens = tokenize(query)
+        with deadline(self.request_timeout), profile(self.instrumentation, "bm25") as record:
+            with admit(self.admission):
+                docs = self._search(query, filter)
+        publish(record, [docs], [run_manager], self.include_timings)
+        return docs
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        filter: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        with deadline(self.request_timeout), profile(self.instrumentation, "bm25") as record:
+            async with aadmit(self.admission):
+                docs = await run_blocking(self._search, query, filter)
+        await apublish(record, [docs], [run_manager], self.include_timings)
+        return docs
+
+    def batch(
+        self,
+        inputs: list[str],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[list[Document]]:
+        """Retrieve for several queries with a single candidate query to HANA.
+
+        A ``filter`` keyword argument applies to every query; other keyword arguments
+        raise :class:`TypeError`.
+        """
+        where = self._where(_batch_filter(kwargs))
+
+        def search_many(
+            queries: list[str], run_manager: list[CallbackManagerForChainRun]
+        ) -> list[Exception | list[Document]]:
+            with deadline(self.request_timeout), profile(self.instrumentation, "bm25") as record:
+                with admit(self.admission):
+                    results = self._search_many(queries, where)
+            publish(record, results, run_manager, self.include_timings)
+            return list(results)
+
+        return self._batch_with_config(
+            search_many,
+            inputs,
+            config,
+            return_exceptions=return_exceptions,
+            run_type="retriever",
+        )
+
+    async def abatch(
+        self,
+        inputs: list[str],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[list[Document]]:
+        """Async variant of :meth:`batch`."""
+
+        where = self._where(_batch_filter(kwargs))
+
+        async def search_many(
+            queries: list[str], run_manager: list[AsyncCallbackManagerForChainRun]
+        ) -> list[Exception | list[Document]]:
+            with deadline(self.request_timeout), profile(self.instrumentation, "bm25") as record:
+                async with aadmit(self.admission):
+                    results = await run_blocking(self._search_many, queries, where)
+            await apublish(record, results, run_manager, self.include_timings)
+            return list(results)
+
+        return await self._abatch_with_config(
+            search_many,
+            inputs,
+            config,
+            return_exceptions=return_exceptions,
+            run_type="retriever",
+        )
+
+    def _where(self, filter: dict[str, Any] | None) -> MetadataFilter | None:
+        return MetadataFilter.coerce(self.filter, filter)
+
+    def _search(self, query: str, filter: dict[str, Any] | None = None) -> list[Document]:
+        with self._stage("tokenize"):
+            tokens = self.analyzer.query_tokens(query)
         if not tokens:
             return []
+        where = self._where(filter)
+        with self._degradable():
+            if self.cache is None:
+                return self._retrieve(tokens, where)
+            docs = self.cache.get_or_compute(
+                self._cache_key(tokens, where), lambda: self._retrieve(tokens, where)
+            )
+        return copy_documents(docs)
+
+    def _search_many(
+        self, queries: list[str], where: MetadataFilter | None = None
+    ) -> list[list[Document]]:
+        with self._degradable():
+            return self._search_many_at_limit(queries, where)
+
+    def _search_many_at_limit(
+        self, queries: list[str], where: MetadataFilter | None
+    ) -> list[list[Document]]:
+        with self._stage("tokenize"):
+            token_lists = [self.analyzer.query_tokens(query) for query in queries]
+        results: list[list[Document]] = [[] for _ in queries]
+        pending: list[int] = []
+        for i, tokens in enumerate(token_lists):
+            if not tokens:
+                continue
+            if self.cache is not None:
+                cached = self.cache.get(self._cache_key(tokens, where))
+                if cached is not None:
+                    results[i] = copy_documents(cached)
+                    continue
+            pending.append(i)
+        if not pending:
+            return results
+
+        fetched = self._retrieve_many([token_lists[i] for i in pending], where)
+        for i, docs in zip(pending, fetched, strict=True):
+            if self.cache is not None:
+                self.cache.put(self._cache_key(token_lists[i], where), docs)
+                docs = copy_documents(docs)
+            results[i] = docs
+        return results
+
+    def _cache_key(self, tokens: list[str], where: MetadataFilter | None) -> tuple[Any, ...]:
+        # The table is part of the key: shards copied from one retriever share its cache
+        return (
+            self.table_name,
+            tuple(sorted(set(tokens))),
+            self.k,
+            self._candidate_limit(),
+            self.max_tokens_in_query,
+            self.two_phase,
+            self.bm25_variant,
+            self.fetch_size,
+            where.key if where is not None else None,
+        )
+
+    def _retrieve(self, tokens: list[str], where: MetadataFilter | None = None) -> list[Document]:
+        if self._use_replica(where):
+            assert self.replica is not None
+            terms = self.analyzer.query_terms(tokens)
+            accept = None if where is None else self._row_matcher(where)
+            with self._stage("replica"):
+                hits = self.replica.search(
+                    terms, self.k, accept=accept, prune=self.pruning, k1=self.k1, b=self.b
+                )
+            return [self._to_document(row, score) for row, score in hits]
+        if self.postings_index is not None:
+            terms = self.analyzer.query_terms(tokens)
+            with self._stage("index"):
+                rows = self.postings_index.search(
+                    terms,
+                    self._columns(),
+                    self.k,
+                    where=where,
+                    k1=self.k1,
+                    b=self.b,
+                    variant=self.bm25_variant,
+                    delta=self.delta,
+                )
+            count_rows(rows)
+            return [self._to_document(row[:-1], row[-1]) for row in rows]
+
+        plan = self._plan(tokens)
+        docs = self._retrieve_plan(plan, where)
+        if plan.strategy == "and" and len(docs) < self.k:
+            # The AND estimate was too optimistic: widen to OR
+            plan = self._widen(plan)
+            docs = self._retrieve_plan(plan, where)
+        return self._attach_plan(docs, plan)
+
+    def _use_replica(self, where: MetadataFilter | None) -> bool:
+        if self.replica is None or not self.replica.ready:
+            return False
+        # Rows in the replica only carry the metadata columns
+        return where is None or where.columns <= set(self.metadata_columns)
+
+    def _row_matcher(self, where: MetadataFilter) -> Any:
+        columns = self.metadata_columns
+        return lambda row: where.matches(dict(zip(columns, row[1:], strict=True)))
+
+    def _retrieve_plan(self, plan: QueryPlan, where: MetadataFilter | None) -> list[Document]:
+        if self.two_phase:
+            return self._retrieve_two_phase(plan, where)
+        if self.fetch_size:
+            return self._retrieve_streaming(plan, where)
+        rows = self._fetch_candidates(plan, where)
+        with self._stage("analyze"):
+            corpus = [self.analyzer.counts(row[0]) for row in rows]
+        return self._rank(self.analyzer.query_terms(plan.terms), rows, corpus)
+
+    def _fetch_candidates(
+        self, plan: QueryPlan, where: MetadataFilter | None
+    ) -> list[tuple[Any, ...]]:
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                apply_deadline(cursor)
+                with self._stage("sql"):
+                    cursor.execute(
+                        self._candidate_sql(plan, where), self._candidate_params(plan, where)
+                    )
+                with self._stage("fetch"):
+                    rows: list[tuple[Any, ...]] = cursor.fetchall()
+            finally:
+                cursor.close()
+        count_rows(rows)
+        return rows
+
+    def _widen(self, plan: QueryPlan) -> QueryPlan:
+        """Fall back from AND to OR when fewer than ``k`` rows match all terms."""
+        order = self.planner is not None and self.planner.order_by_matches
+        widened = replace(plan, strategy="or", order_by_matches=order and len(plan.terms) > 1)
+        return self._narrowed(widened)
+
+    def _retrieve_streaming(self, plan: QueryPlan, where: MetadataFilter | None) -> list[Document]:
+        """Score candidates chunk by chunk with ``fetchmany``, keeping a heap of the best k.
+
+        Uses ``corpus_stats`` when available; otherwise IDF and average length are
+        running statistics over the candidates seen so far, including the current chunk.
+        """
+        assert self.fetch_size
+        terms = self.analyzer.query_terms(plan.terms)
+        scorer = BM25Scorer(self.bm25_variant, k1=self.k1, b=self.b, delta=self.delta)
+        heap: list[tuple[float, int, tuple[Any, ...]]] = []
+        offset = 0
+        seen = 0
+        total_length = 0
+        doc_freqs = dict.fromkeys(terms, 0)
 
-        # Pick the longest tokens as proxy for distinctiveness
-        tokens = sorted(tokens, key=len, reverse=True)[: self.max_tokens_in_query]
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                apply_deadline(cursor)
+                with self._stage("sql"):
+                    cursor.execute(
+                        self._candidate_sql(plan, where), self._candidate_params(plan, where)
+                    )
+                while True:
+                    with self._stage("fetch"):
+                        rows = cursor.fetchmany(self.fetch_size)
+                    if not rows:
+                        break
+                    count_rows(rows)
+                    with self._stage("analyze"):
+                        corpus = [self.analyzer.counts(row[0]) for row in rows]
+                    with self._stage("score"):
+                        if self.corpus_stats is not None:
+                            idf: Any = self.corpus_stats.idf
+                            avgdl = self.corpus_stats.avgdl or None
+                        else:
+                            seen += len(corpus)
+                            total_length += sum(sum(doc.values()) for doc in corpus)
+                            for doc in corpus:
+                                for term in doc_freqs.keys() & doc.keys():
+                                    doc_freqs[term] += 1
+                            idf = {
+                                term: math.log(1.0 + (seen - df + 0.5) / (df + 0.5))
+                                for term, df in doc_freqs.items()
+                            }
+                            avgdl = total_length / seen or None
 
-        # Build SQL with LOCATE conditions
-        columns = [self.content_column] + self.metadata_columns
-        col_list = ", ".join(columns)
-        where_clauses = [
-            f"LOCATE(LOWER(TO_NVARCHAR({self.content_column})), ?) > 0" for _ in tokens
+                        scores = scorer.score(terms, corpus, idf=idf, avgdl=avgdl)
+                        # Only the chunk's own top k can enter the global top k
+                        for i in top_k(scores, self.k).tolist():
+                            # Ties favour earlier rows: the latest row is evicted first
+                            entry = (float(scores[i]), -(offset + i), rows[i])
+                            if len(heap) < self.k:
+                                heapq.heappush(heap, entry)
+                            elif entry[:2] > heap[0][:2]:
+                                heapq.heapreplace(heap, entry)
+                    count("candidates", len(rows))
+                    offset += len(rows)
+                    del rows, corpus
+            finally:
+                cursor.close()
+
+        ranked = sorted(heap, key=lambda entry: entry[:2], reverse=True)
+        return [self._to_document(row, score) for score, _, row in ranked]
+
+    def _retrieve_two_phase(self, plan: QueryPlan, where: MetadataFilter | None) -> list[Document]:
+        forms = self._term_forms(plan.terms)
+        terms = list(forms)
+        # Whole-word occurrences of each spelling of a term, counted on the words
+        # framed as " w1  w2 " so neighbouring matches do not share a space
+        framed = "(' ' || REPLACE(W.WORDS, ' ', '  ') || ' ')"
+        tfs = ", ".join(
+            " + ".join(
+                f"(LENGTH({framed}) - LENGTH(REPLACE({framed}, ?, ''))) / {len(form) + 2}"
+                for form in forms[term]
+            )
+            for term in terms
+        )
+        score_sql = (
+            f"SELECT W.{self.id_column}, W.CHARACTERS, {self._word_count_sql('W.WORDS')}, "
+            f"{tfs} FROM ("
+            f"SELECT {self.id_column}, LENGTH({self.content_column}) AS CHARACTERS, "
+            f"{self._words_sql()} AS WORDS "
+            f"FROM {self.table_name} "
+            f"WHERE {self._where_sql(plan, where)}"
+            f"{self._order_sql(plan)} "
+            f"LIMIT {self._candidate_limit()}"
+            f") W"
+        )
+        params = [f" {form} " for term in terms for form in forms[term]]
+
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                apply_deadline(cursor)
+                if self.corpus_stats is not None:
+                    avgdl = self.corpus_stats.avgdl or 1.0
+                else:
+                    avgdl = self._corpus_average_words(cursor)
+                # Phase one: keys, lengths and term frequencies only
+                with self._stage("sql"):
+                    cursor.execute(score_sql, params + self._candidate_params(plan, where))
+                with self._stage("fetch"):
+                    candidates = cursor.fetchall()
+                count_rows(candidates)
+                if not candidates:
+                    return []
+
+                with self._stage("score"):
+                    lengths = [row[1] or 0 for row in candidates]
+                    scores = self._score_frequencies(terms, candidates, avgdl)
+                    order = top_k(scores, self.k).tolist()
+                count("candidates", len(candidates))
+                keys = [candidates[i][0] for i in order]
+
+                # Phase two: full content and metadata for the winners only
+                placeholders = ", ".join("?" for _ in keys)
+                with self._stage("sql"):
+                    cursor.execute(
+                        f"SELECT {self.id_column}, {', '.join(self._columns())} "
+                        f"FROM {self.table_name} "
+                        f"WHERE {self.id_column} IN ({placeholders})",
+                        keys,
+                    )
+                with self._stage("fetch"):
+                    winners = cursor.fetchall()
+                count_rows(winners)
+                fetched = {row[0]: tuple(row[1:]) for row in winners}
+            finally:
+                cursor.close()
+
+        saved = sum(lengths) - sum(lengths[i] for i in order)
+        with self._stats_lock:
+            self._characters_saved += saved
+        logger.debug("two-phase retrieval skipped %d content characters", saved)
+
+        return [
+            self._to_document(fetched[candidates[i][0]], scores[i])
+            for i in order
+            if candidates[i][0] in fetched
         ]
-        where_sql = " OR ".join(where_clauses)
-        sql = (
-            f"SELECT {col_list} FROM {self.table_name} "
-            f"WHERE {where_sql} "
-            f"LIMIT {self.candidate_limit}"
+
+    def _term_forms(self, tokens: list[str]) -> dict[str, list[str]]:
+        """Spellings to count in SQL for each query term, keyed by term.
+
+        These are the query tokens and the plural forms the analyzer reduces to the
+        same term, so whole-word counts agree with the analyzer's term frequencies.
+        """
+        forms: dict[str, list[str]] = {}
+        for token in tokens:
+            term = self.analyzer.normalize(token)
+            candidates = [token, term, term + "s", term + "es", token + "s", token + "es"]
+            if term.endswith("y"):
+                candidates.append(term[:-1] + "ies")
+            if term.endswith("z"):
+                candidates.append(term[:-1] + "ces")
+            spellings = forms.setdefault(term, [])
+            for form in candidates:
+                if form not in spellings and self.analyzer.normalize(form) == term:
+                    spellings.append(form)
+        return forms
+
+    def _words_sql(self) -> str:
+        """Lowercased content with each run of separators turned into one space."""
+        text = f"LOWER(TO_NVARCHAR({self.content_column}))"
+        for char in _SEPARATORS:
+            literal = char.replace("'", "''")
+            text = f"REPLACE({text}, '{literal}', ' ')"
+        # Runs of spaces collapse to one: " " -> " ^A", drop "^A ", then drop "^A"
+        text = f"REPLACE(REPLACE({text}, ' ', ' ' || CHAR(1)), CHAR(1) || ' ', '')"
+        return f"TRIM(REPLACE({text}, CHAR(1), ''))"
+
+    @staticmethod
+    def _word_count_sql(words: str) -> str:
+        """Number of words in ``words`` (as built by :meth:`_words_sql`)."""
+        return (
+            f"CASE WHEN {words} = '' THEN 0 "
+            f"ELSE LENGTH({words}) - LENGTH(REPLACE({words}, ' ', '')) + 1 END"
+        )
+
+    def _corpus_average_words(self, cursor: Any) -> float:
+        """Average document length in words over the whole table, measured on first use."""
+        if self._average_words is None:
+            with self._stage("sql"):
+                cursor.execute(
+                    f"SELECT AVG(CAST({self._word_count_sql('W.WORDS')} AS DOUBLE)) "
+                    f"FROM (SELECT {self._words_sql()} AS WORDS FROM {self.table_name}) W"
+                )
+                row = cursor.fetchone()
+            self._average_words = float(row[0] or 0.0) or 1.0
+        return self._average_words
+
+    def _score_frequencies(
+        self, terms: list[str], candidates: list[tuple[Any, ...]], avgdl: float
+    ) -> np.ndarray:
+        """BM25 from term frequencies and word counts computed in HANA.
+
+        IDF comes from ``corpus_stats`` when set and from the candidates otherwise;
+        ``avgdl`` is the corpus-wide average document length.
+        """
+        vocabulary = {term: j for j, term in enumerate(terms)}
+        tf = np.array([row[3:] for row in candidates], dtype=np.float64).reshape(
+            len(candidates), len(terms)
         )
+        doc_len = np.array([row[2] or 0 for row in candidates], dtype=np.float64)
+        matrix = TermMatrix.from_dense(vocabulary, tf, doc_len)
+        idf: Callable[[str], float] | dict[str, float]
+        if self.corpus_stats is not None:
+            idf = self.corpus_stats.idf
+        else:
+            n = len(candidates)
+            doc_freqs = (tf > 0).sum(axis=0).tolist()
+            idf = {
+                term: math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+                for term, df in zip(terms, doc_freqs, strict=True)
+            }
+
+        scorer = BM25Scorer(self.bm25_variant, k1=self.k1, b=self.b, delta=self.delta)
+        return scorer.score_matrix(matrix, terms, idf=idf, avgdl=avgdl)
+
+    def _retrieve_many(
+        self, token_lists: list[list[str]], where: MetadataFilter | None = None
+    ) -> list[list[Document]]:
+        if (
+            self.postings_index is not None
+            or self.replica is not None
+            or self.two_phase
+            or self.fetch_size
+        ):
+            return [self._retrieve(tokens, where) for tokens in token_lists]
+
+        plans = [self._plan(tokens) for tokens in token_lists]
+
+        # One UNION ALL statement; each branch keeps its own LIMIT and is tagged with
+        # the index of the query it serves.
+        branches = [
+            f"SELECT * FROM ({self._candidate_sql(plan, where, tag=i)}) Q{i}"
+            for i, plan in enumerate(plans)
+        ]
+        params = [param for plan in plans for param in self._candidate_params(plan, where)]
 
-        cursor = self.connection.cursor()
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                apply_deadline(cursor)
+                with self._stage("sql"):
+                    cursor.execute(" UNION ALL ".join(branches), params)
+                with self._stage("fetch"):
+                    tagged_rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        count_rows(tagged_rows)
+
+        rows_by_query: list[list[tuple[Any, ...]]] = [[] for _ in plans]
+        for tagged in tagged_rows:
+            rows_by_query[tagged[0]].append(tuple(tagged[1:]))
+        for i, plan in enumerate(plans):
+            if plan.strategy == "and" and len(rows_by_query[i]) < self.k:
+                plans[i] = self._widen(plan)
+                rows_by_query[i] = self._fetch_candidates(plans[i], where)
+
+        # Rows matched by several queries are analyzed only once (memoized by text)
+        results = []
+        for plan, rows in zip(plans, rows_by_query, strict=True):
+            with self._stage("analyze"):
+                corpus = [self.analyzer.counts(row[0]) for row in rows]
+            terms = self.analyzer.query_terms(plan.terms)
+            results.append(self._attach_plan(self._rank(terms, rows, corpus), plan))
+        return results
+
+    def _stage(self, name: str) -> AbstractContextManager[Any]:
+        return stage(self.instrumentation, name)
+
+    @contextmanager
+    def _degradable(self) -> Iterator[None]:
+        """Serve the enclosed request with fewer candidates when its deadline is close."""
+        limit = None
+        if self.admission is not None and self.admission.near_deadline():
+            limit = self.degraded_candidate_limit or max(self.candidate_limit // 4, self.k)
+            if limit < self.candidate_limit:
+                self.admission.record_degraded("candidate_limit")
+            else:
+                limit = None
+        token = _degraded_limit.set(limit)
         try:
-            cursor.execute(sql, tokens)
-            rows = cursor.fetchall()
+            yield
         finally:
-            cursor.close()
+            _degraded_limit.reset(token)
+
+    def _candidate_limit(self) -> int:
+        return _degraded_limit.get() or self.candidate_limit
+
+    def _columns(self) -> list[str]:
+        return [self.content_column] + self.metadata_columns
+
+    def _plan(self, tokens: list[str]) -> QueryPlan:
+        if self.planner is not None:
+            plan = self.planner.plan(
+                tokens,
+                self._candidate_limit(),
+                self.corpus_stats,
+                normalize=self.analyzer.normalize,
+            )
+        else:
+            # Pick the longest tokens as proxy for distinctiveness
+            ordered = sorted(tokens, key=len, reverse=True)
+            plan = QueryPlan(
+                terms=ordered[: self.max_tokens_in_query],
+                dropped=ordered[self.max_tokens_in_query :],
+            )
+        return self._narrowed(plan)
+
+    def _narrowed(self, plan: QueryPlan) -> QueryPlan:
+        """Attach the trigram narrowing, so every statement built from ``plan`` shares it.
+
+        Narrowing depends on trigram frequencies, which other threads may update.
+        """
+        if self.trigram_index is None:
+            return plan
+        return replace(plan, narrowing=self.trigram_index.narrow_sql(plan.terms, plan.strategy))
+
+    def _locate_sql(self) -> str:
+        return f"LOCATE(LOWER(TO_NVARCHAR({self.content_column})), ?) > 0"
 
+    def _match_flag_sql(self) -> str:
+        return f"CASE WHEN {self._locate_sql()} THEN 1 ELSE 0 END"
+
+    def _where_sql(self, plan: QueryPlan, where: MetadataFilter | None) -> str:
+        joiner = " AND " if plan.strategy == "and" else " OR "
+        located = joiner.join(self._locate_sql() for _ in plan.terms)
+        if plan.narrowing is not None:
+            # LOCATE still verifies each narrowed row, so matching is unchanged
+            located = f"{plan.narrowing[0]} AND ({located})"
+        if where is None:
+            return located
+        return f"({located}) AND {where.sql}"
+
+    def _order_sql(self, plan: QueryPlan) -> str:
+        if not plan.order_by_matches:
+            return ""
+        matched = " + ".join(self._match_flag_sql() for _ in plan.terms)
+        return f" ORDER BY ({matched}) DESC"
+
+    def _candidate_sql(
+        self, plan: QueryPlan, where: MetadataFilter | None = None, tag: int | None = None
+    ) -> str:
+        """Build the LOCATE candidate query, optionally tagging rows with a query index."""
+        col_list = ", ".join(self._columns())
+        if tag is not None:
+            col_list = f"{int(tag)} AS QUERY_IDX, {col_list}"
+        return (
+            f"SELECT {col_list} FROM {self.table_name} "
+            f"WHERE {self._where_sql(plan, where)}"
+            f"{self._order_sql(plan)} "
+            f"LIMIT {self._candidate_limit()}"
+        )
+
+    def _candidate_params(self, plan: QueryPlan, where: MetadataFilter | None = None) -> list[Any]:
+        """Parameters for the WHERE clause (trigrams, terms, then filter), then ORDER BY."""
+        params: list[Any] = list(plan.narrowing[1]) if plan.narrowing is not None else []
+        params += plan.terms
+        if where is not None:
+            params += where.params
+        if plan.order_by_matches:
+            params += plan.terms
+        return params
+
+    def _attach_plan(self, docs: list[Document], plan: QueryPlan) -> list[Document]:
+        if self.include_plan:
+            for doc in docs:
+                doc.metadata["query_plan"] = plan.to_dict()
+        return docs
+
+    def _rank(
+        self, tokens: list[str], rows: list[tuple[Any, ...]], corpus: Sequence[TermDocument]
+    ) -> list[Document]:
         if not rows:
             return []
 
         # Score candidates with BM25
-        corpus = [tokenize(row[0]) for row in rows]
-        bm25 = BM25Okapi(corpus)
-        scores = bm25.get_scores(tokens)
+        scorer = BM25Scorer(self.bm25_variant, k1=self.k1, b=self.b, delta=self.delta)
+        with self._stage("score"):
+            if self.corpus_stats is not None:
+                scores = scorer.score(
+                    tokens,
+                    corpus,
+                    idf=self.corpus_stats.idf,
+                    avgdl=self.corpus_stats.avgdl or None,
+                )
+            else:
+                scores = scorer.score(tokens, corpus)
+            winners = top_k(scores, self.k)
+        count("candidates", len(rows))
 
-        # Pair rows with scores and sort
-        scored = sorted(zip(scores, rows), key=lambda x: x[0], reverse=True)
+        return [self._to_document(rows[i], scores[i]) for i in winners]
 
-        results: list[Document] = []
-        for score, row in scored[: self.k]:
-            metadata: dict[str, Any] = {}
-            for i, col_name in enumerate(self.metadata_columns):
-                metadata[col_name] = row[i + 1]
-            metadata["bm25_score"] = float(score)
-            results.append(Document(page_content=row[0], metadata=metadata))
-
-        return results
+    def _to_document(self, row: tuple[Any, ...], score: float) -> Document:
+        metadata: dict[str, Any] = {}
+        for i, col_name in enumerate(self.metadata_columns):
+            metadata[col_name] = row[i + 1]
+        metadata["bm25_score"] = float(score)
+        return Document(page_content=row[0], metadata=metadata)
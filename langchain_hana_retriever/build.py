@@ -0,0 +1,297 @@
+"""Parallel, resumable bulk build of the in-process index from partitioned table scans."""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import pickle
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from langchain_hana_retriever.analysis import Analyzer
+from langchain_hana_retriever.pool import HANAConnectionPool, checkout
+from langchain_hana_retriever.replica import LocalIndexReplica, ReplicaPartition
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = "manifest.pkl"
+# Bumped when the pickled partition layout changes
+_CHECKPOINT_FORMAT = 2
+
+
+@dataclass(frozen=True)
+class BuildProgress:
+    """Progress of a parallel build, reported after every finished partition."""
+
+    partitions_done: int
+    partitions_total: int
+    rows: int
+    elapsed: float
+
+
+def _analyze(analyzer: Analyzer, texts: list[str | None]) -> list[dict[str, int]]:
+    """Term counts per text; module-level so worker processes can unpickle it."""
+    return [dict(analyzer.counts(text)) for text in texts]
+
+
+class _InlineExecutor(Executor):
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future[Any]:
+        future: Future[Any] = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+class ParallelIndexBuilder:
+    """Fill a :class:`LocalIndexReplica` from key-range partitions scanned concurrently.
+
+    The table is split into ``partitions`` ranges of ``id_column`` with roughly equal
+    row counts. Each range is streamed with ``fetchmany`` on its own connection (when
+    the replica's connection is a :class:`HANAConnectionPool`; a plain connection is
+    shared one partition at a time) and its rows are tokenized in a
+    ``ProcessPoolExecutor``. Each partition is indexed on its own as soon as it is
+    tokenized (:meth:`LocalIndexReplica.partition`), keeping postings rather than
+    per-row term counts, and the partitions are merged in key order with
+    :meth:`LocalIndexReplica.load_partitions`.
+
+    With ``checkpoint_dir``, the partition bounds and every finished partition are
+    written to disk, so a build that failed on some partitions can be run again and only
+    fetches the missing ones. Delete the directory to start over.
+
+    Args:
+        replica: Replica to fill; its connection, table and columns are used.
+        partitions: Number of key ranges.
+        max_workers: Tokenizer processes; ``0`` tokenizes in the fetching threads.
+        fetch_workers: Concurrent partition scans (defaults to ``partitions`` with a
+            pool, 1 otherwise).
+        chunk_size: Rows per ``fetchmany`` call and per tokenizer task.
+        checkpoint_dir: Directory for resumable partition checkpoints.
+        progress: Called with a :class:`BuildProgress` after each partition.
+    """
+
+    def __init__(
+        self,
+        replica: LocalIndexReplica,
+        partitions: int = 8,
+        max_workers: int | None = None,
+        fetch_workers: int | None = None,
+        chunk_size: int = 1000,
+        checkpoint_dir: str | Path | None = None,
+        progress: Callable[[BuildProgress], None] | None = None,
+    ) -> None:
+        self.replica = replica
+        self.partitions = partitions
+        self.max_workers = max_workers
+        pooled = isinstance(replica.connection, HANAConnectionPool)
+        self.fetch_workers = fetch_workers or (partitions if pooled else 1)
+        self.chunk_size = chunk_size
+        self.checkpoint_dir = Path(checkpoint_dir) if checkpoint_dir else None
+        self.progress = progress
+        # A plain connection cannot serve concurrent cursors
+        self._connection_lock = nullcontext() if pooled else threading.Lock()
+
+    # -- Partitioning --------------------------------------------------------
+
+    def partition_bounds(self) -> list[Any]:
+        """Split keys into ranges of similar size; returns the ``partitions - 1`` cut keys."""
+        replica = self.replica
+        with checkout(replica.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT COUNT(*) FROM {replica.table_name}")
+                total = cursor.fetchone()[0]
+                step = max(math.ceil(total / self.partitions), 1)
+                cursor.execute(
+                    f"SELECT {replica.id_column} FROM ("
+                    f"SELECT {replica.id_column}, "
+                    f"ROW_NUMBER() OVER (ORDER BY {replica.id_column}) AS RN "
+                    f"FROM {replica.table_name}) R "
+                    f"WHERE RN > 1 AND MOD(RN - 1, ?) = 0 "
+                    f"ORDER BY RN",
+                    [step],
+                )
+                return [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+
+    def _partition_sql(self, bounds: list[Any], i: int) -> tuple[str, list[Any]]:
+        id_column = self.replica.id_column
+        clauses = []
+        params = []
+        if i > 0:
+            clauses.append(f"{id_column} >= ?")
+            params.append(bounds[i - 1])
+        if i < len(bounds):
+            clauses.append(f"{id_column} < ?")
+            params.append(bounds[i])
+        sql = self.replica._select_sql()
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return f"{sql} ORDER BY {id_column}", params
+
+    # -- Checkpoints ---------------------------------------------------------
+
+    def _load_manifest(self) -> list[Any] | None:
+        if self.checkpoint_dir is None:
+            return None
+        path = self.checkpoint_dir / _MANIFEST
+        if not path.exists():
+            return None
+        with open(path, "rb") as f:
+            manifest = pickle.load(f)
+        if manifest.get("format") != _CHECKPOINT_FORMAT:
+            raise ValueError(f"{self.checkpoint_dir} holds checkpoints of an older format")
+        if manifest["source"] != self._source():
+            raise ValueError(f"{self.checkpoint_dir} holds checkpoints of another build")
+        bounds: list[Any] = manifest["bounds"]
+        return bounds
+
+    def _source(self) -> tuple[Any, ...]:
+        replica = self.replica
+        return (
+            replica.table_name,
+            replica.id_column,
+            replica.content_column,
+            tuple(replica.metadata_columns),
+            replica.timestamp_column,
+        )
+
+    def _write(self, name: str, value: Any) -> None:
+        assert self.checkpoint_dir is not None
+        path = self.checkpoint_dir / name
+        tmp = path.with_name(name + ".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def _checkpoint(self, i: int) -> Path | None:
+        if self.checkpoint_dir is None:
+            return None
+        return self.checkpoint_dir / f"part-{i:05d}.pkl"
+
+    # -- Build ---------------------------------------------------------------
+
+    def build(self) -> LocalIndexReplica:
+        """Scan, tokenize and merge all partitions, then mark the replica loaded.
+
+        Raises:
+            RuntimeError: If some partitions failed. Finished partitions are kept in
+                ``checkpoint_dir`` for the next attempt.
+        """
+        started = time.monotonic()
+        bounds = self._load_manifest()
+        if bounds is None:
+            bounds = self.partition_bounds()
+            if self.checkpoint_dir is not None:
+                self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+                self._write(
+                    _MANIFEST,
+                    {"format": _CHECKPOINT_FORMAT, "source": self._source(), "bounds": bounds},
+                )
+        n_partitions = len(bounds) + 1
+
+        results: dict[int, ReplicaPartition] = {}
+        pending = []
+        for i in range(n_partitions):
+            checkpoint = self._checkpoint(i)
+            if checkpoint is not None and checkpoint.exists():
+                continue
+            pending.append(i)
+        done = n_partitions - len(pending)
+        rows_done = 0
+        errors: list[tuple[int, BaseException]] = []
+
+        tokenizers: Executor
+        if self.max_workers == 0:
+            tokenizers = _InlineExecutor()
+        else:
+            tokenizers = ProcessPoolExecutor(self.max_workers)
+        with tokenizers, ThreadPoolExecutor(self.fetch_workers) as fetchers:
+            futures = {
+                fetchers.submit(self._build_partition, bounds, i, tokenizers): i for i in pending
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    partition = future.result()
+                except Exception as e:
+                    logger.exception("partition %d of %s failed", i, self.replica.table_name)
+                    errors.append((i, e))
+                    continue
+                checkpoint = self._checkpoint(i)
+                if checkpoint is None:
+                    results[i] = partition
+                else:
+                    self._write(checkpoint.name, partition)
+                done += 1
+                rows_done += len(partition.rows)
+                report = BuildProgress(done, n_partitions, rows_done, time.monotonic() - started)
+                logger.info(
+                    "partition %d/%d of %s: %d rows",
+                    report.partitions_done,
+                    n_partitions,
+                    self.replica.table_name,
+                    len(partition.rows),
+                )
+                if self.progress is not None:
+                    self.progress(report)
+
+        if errors:
+            failed = sorted(i for i, _ in errors)
+            raise RuntimeError(f"partitions {failed} failed") from errors[0][1]
+
+        self.replica.load_partitions(self._partitions(n_partitions, results))
+        return self.replica
+
+    def _build_partition(self, bounds: list[Any], i: int, tokenizers: Executor) -> ReplicaPartition:
+        sql, params = self._partition_sql(bounds, i)
+        content_index = 2 if self.replica.timestamp_column else 1
+        rows: list[tuple[Any, ...]] = []
+        tasks = []
+        with self._connection_lock, checkout(self.replica.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    chunk = cursor.fetchmany(self.chunk_size)
+                    if not chunk:
+                        break
+                    chunk = [tuple(row) for row in chunk]
+                    rows.extend(chunk)
+                    tasks.append(
+                        tokenizers.submit(
+                            _analyze, self.replica.analyzer, [row[content_index] for row in chunk]
+                        )
+                    )
+            finally:
+                cursor.close()
+        counts = [doc_counts for task in tasks for doc_counts in task.result()]
+        return self.replica.partition(rows, counts)
+
+    def _partitions(
+        self, n_partitions: int, results: dict[int, ReplicaPartition]
+    ) -> Iterator[ReplicaPartition]:
+        """Partitions in key order, read from checkpoints one at a time and released."""
+        for i in range(n_partitions):
+            partition = results.pop(i, None)
+            if partition is None:
+                checkpoint = self._checkpoint(i)
+                assert checkpoint is not None
+                with open(checkpoint, "rb") as f:
+                    partition = pickle.load(f)
+            yield partition
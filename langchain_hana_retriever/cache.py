@@ -0,0 +1,238 @@
+"""LRU query result cache with TTL, version invalidation and single-flight coalescing."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.pool import checkout
+
+
+@dataclass(frozen=True)
+class CacheMetrics:
+    """Point-in-time snapshot of cache counters."""
+
+    size: int
+    hits: int
+    misses: int
+    coalesced: int
+    evictions: int
+    expirations: int
+    invalidations: int
+
+
+class QueryCache:
+    """Bounded LRU cache for retrieval results.
+
+    Entries expire after ``ttl`` seconds. When ``version_probe`` is given, it is called
+    at most every ``version_check_interval`` seconds and the whole cache is cleared when
+    the returned value changes (e.g. a row count or max timestamp of the table).
+    Concurrent lookups of the same missing key share a single computation.
+
+    Args:
+        maxsize: Maximum number of cached entries.
+        ttl: Seconds an entry stays valid; ``None`` disables expiry.
+        version_probe: Callable returning a value that changes when content changes.
+        version_check_interval: Minimum seconds between two probe calls.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float | None = 300.0,
+        version_probe: Callable[[], Hashable] | None = None,
+        version_check_interval: float = 5.0,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_probe = version_probe
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[Hashable, Future[Any]] = {}
+        self._version: Hashable = None
+        self._version_checked_at = float("-inf")
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        """Return the cached value for ``key`` or ``None``."""
+        self._check_version()
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store ``value`` under ``key``, evicting the least recently used entry if full."""
+        with self._lock:
+            self._store(key, value)
+
+    def discard(self, key: Hashable) -> None:
+        """Remove a single entry if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value or compute it once, even under concurrent callers."""
+        self._check_version()
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self._coalesced += 1
+        assert future is not None
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value=value)
+        return value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of :meth:`get_or_compute`."""
+        self._check_version()
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self._coalesced += 1
+        assert future is not None
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        try:
+            value = await compute()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value=value)
+        return value
+
+    def invalidate(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def metrics(self) -> CacheMetrics:
+        """Return a snapshot of cache counters."""
+        with self._lock:
+            return CacheMetrics(
+                size=len(self._entries),
+                hits=self._hits,
+                misses=self._misses,
+                coalesced=self._coalesced,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                invalidations=self._invalidations,
+            )
+
+    def _lookup(self, key: Hashable) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        stored_at, value = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self._expirations += 1
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _finish(
+        self,
+        key: Hashable,
+        future: Future[Any],
+        value: Any = None,
+        error: BaseException | None = None,
+    ) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None:
+                self._store(key, value)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def _check_version(self) -> None:
+        if self.version_probe is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._version_checked_at < self.version_check_interval:
+                return
+            self._version_checked_at = now
+        version = self.version_probe()
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self._entries.clear()
+                    self._invalidations += 1
+                self._version = version
+
+
+def table_version_probe(
+    connection: Any, table_name: str, timestamp_column: str | None = None
+) -> Callable[[], Hashable]:
+    """Build a version probe returning the row count (and max timestamp) of a table."""
+    columns = "COUNT(*)"
+    if timestamp_column:
+        columns += f", MAX({timestamp_column})"
+    sql = f"SELECT {columns} FROM {table_name}"
+
+    def probe() -> Hashable:
+        with checkout(connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql)
+                return tuple(cursor.fetchone())
+            finally:
+                cursor.close()
+
+    return probe
+
+
+def copy_documents(docs: list[Document]) -> list[Document]:
+    """Copy cached documents so callers can mutate metadata without affecting the cache."""
+    return [
+        Document(id=doc.id, page_content=doc.page_content, metadata=copy.deepcopy(doc.metadata))
+        for doc in docs
+    ]
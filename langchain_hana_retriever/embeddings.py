@@ -0,0 +1,261 @@
+"""Query-embedding cache: in-memory LRU with optional SQLite disk backing."""
+
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from langchain_hana_retriever.executor import on_worker, submit
+
+_MODEL_ATTRIBUTES = ("model", "model_name", "model_id", "deployment_name", "deployment")
+
+
+@dataclass(frozen=True)
+class EmbeddingCacheMetrics:
+    """Point-in-time snapshot of embedding cache counters."""
+
+    size: int
+    hits: int
+    disk_hits: int
+    misses: int
+    batches: int
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from memory or disk."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+
+def model_identity(embeddings: Any) -> str:
+    """Name an embedding model by class and model attribute (e.g. ``OpenAIEmbeddings:...``)."""
+    name = type(embeddings).__qualname__
+    for attribute in _MODEL_ATTRIBUTES:
+        value = getattr(embeddings, attribute, None)
+        if isinstance(value, str) and value:
+            return f"{name}:{value}"
+    return name
+
+
+def normalize_query(text: str) -> str:
+    """Unicode NFKC with surrounding and repeated whitespace collapsed.
+
+    Case is kept: embedding models are generally case-sensitive.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    """Cache of query embeddings keyed by model identity and normalized query text.
+
+    Lookups hit an in-memory LRU first, then the optional SQLite file at ``path``,
+    which survives restarts and can be shared by processes on one host. Vectors are
+    stored as float64, so cached values equal what the model returned.
+
+    :meth:`embed_queries` embeds each distinct miss of a batch once with ``embed_query``,
+    so cached vectors always match what :meth:`embed_query` would store. Set
+    ``batch_with_documents=True`` to embed all misses in one ``embed_documents`` call,
+    but only for symmetric models: models that embed queries differently from documents
+    (e.g. with an instruction prefix) would cache document vectors under query keys.
+
+    Args:
+        maxsize: Maximum number of embeddings kept in memory.
+        path: SQLite file for disk backing; ``None`` keeps the cache in memory only.
+        namespace: Model identity to use instead of :func:`model_identity`.
+        batch_with_documents: Embed batched misses with one ``embed_documents`` call.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        path: str | Path | None = None,
+        namespace: str | None = None,
+        batch_with_documents: bool = False,
+    ) -> None:
+        self.maxsize = maxsize
+        self.path = Path(path) if path else None
+        self.namespace = namespace
+        self.batch_with_documents = batch_with_documents
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._batches = 0
+        self._db: sqlite3.Connection | None = None
+        if self.path is not None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS EMBEDDINGS ("
+                "MODEL TEXT NOT NULL, QUERY TEXT NOT NULL, VECTOR BLOB NOT NULL, "
+                "PRIMARY KEY (MODEL, QUERY))"
+            )
+            self._db.commit()
+
+    def key(self, embeddings: Any, text: str) -> tuple[str, str]:
+        """Cache key of ``text`` embedded by ``embeddings``."""
+        return (self.namespace or model_identity(embeddings), normalize_query(text))
+
+    # -- Lookup --------------------------------------------------------------
+
+    def get(self, key: tuple[str, str]) -> list[float] | None:
+        """Return the cached vector for ``key`` (memory, then disk) or ``None``."""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return vector
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT VECTOR FROM EMBEDDINGS WHERE MODEL = ? AND QUERY = ?", key
+                ).fetchone()
+                if row is not None:
+                    vector = array("d", row[0]).tolist()
+                    self._remember(key, vector)
+                    self._disk_hits += 1
+                    return vector
+            self._misses += 1
+            return None
+
+    def put(self, key: tuple[str, str], vector: list[float]) -> None:
+        """Store ``vector`` in memory and, with disk backing, on disk."""
+        self.put_many([(key, vector)])
+
+    def put_many(self, items: list[tuple[tuple[str, str], list[float]]]) -> None:
+        """Store several vectors with one disk transaction."""
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, list(vector))
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO EMBEDDINGS VALUES (?, ?, ?)",
+                    [(*key, array("d", vector).tobytes()) for key, vector in items],
+                )
+                self._db.commit()
+
+    def _remember(self, key: tuple[str, str], vector: list[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    # -- Embedding -----------------------------------------------------------
+
+    def embed_query(self, embeddings: Any, text: str) -> list[float]:
+        """Embed ``text`` with ``embeddings`` unless a cached vector exists."""
+        key = self.key(embeddings, text)
+        vector = self.get(key)
+        if vector is None:
+            vector = list(embeddings.embed_query(text))
+            self.put(key, vector)
+        return vector
+
+    async def aembed_query(self, embeddings: Any, text: str) -> list[float]:
+        """Async variant of :meth:`embed_query`."""
+        key = self.key(embeddings, text)
+        vector = self.get(key)
+        if vector is None:
+            vector = list(await embeddings.aembed_query(text))
+            self.put(key, vector)
+        return vector
+
+    def embed_queries(self, embeddings: Any, texts: list[str]) -> list[list[float]]:
+        """Embed several queries, computing each distinct miss once.
+
+        Misses are embedded concurrently on the shared executor, or in one
+        ``embed_documents`` call with ``batch_with_documents``.
+        """
+        keys, vectors, missing = self._partition(embeddings, texts)
+        if missing:
+            miss_texts = [texts[missing[key][0]] for key in missing]
+            if self.batch_with_documents:
+                computed = embeddings.embed_documents(miss_texts)
+            elif on_worker() or len(miss_texts) == 1:
+                computed = [embeddings.embed_query(text) for text in miss_texts]
+            else:
+                futures = [submit(embeddings.embed_query, text) for text in miss_texts]
+                computed = [future.result() for future in futures]
+            self._fill(keys, vectors, missing, computed)
+        return vectors  # type: ignore[return-value]
+
+    async def aembed_queries(self, embeddings: Any, texts: list[str]) -> list[list[float]]:
+        """Async variant of :meth:`embed_queries`."""
+        keys, vectors, missing = self._partition(embeddings, texts)
+        if missing:
+            miss_texts = [texts[missing[key][0]] for key in missing]
+            if self.batch_with_documents:
+                computed = await embeddings.aembed_documents(miss_texts)
+            else:
+                computed = await asyncio.gather(
+                    *(embeddings.aembed_query(text) for text in miss_texts)
+                )
+            self._fill(keys, vectors, missing, computed)
+        return vectors  # type: ignore[return-value]
+
+    def _partition(
+        self, embeddings: Any, texts: list[str]
+    ) -> tuple[list[tuple[str, str]], list[list[float] | None], dict[tuple[str, str], list[int]]]:
+        keys = [self.key(embeddings, text) for text in texts]
+        vectors: list[list[float] | None] = [None] * len(texts)
+        # Misses in first-occurrence order; repeated queries are embedded once
+        missing: dict[tuple[str, str], list[int]] = {}
+        for i, key in enumerate(keys):
+            if key in missing:
+                missing[key].append(i)
+                continue
+            vectors[i] = self.get(key)
+            if vectors[i] is None:
+                missing[key] = [i]
+        return keys, vectors, missing
+
+    def _fill(
+        self,
+        keys: list[tuple[str, str]],
+        vectors: list[list[float] | None],
+        missing: dict[tuple[str, str], list[int]],
+        computed: list[list[float]],
+    ) -> None:
+        items = [(key, list(vector)) for key, vector in zip(missing, computed, strict=True)]
+        self.put_many(items)
+        for key, vector in items:
+            for i in missing[key]:
+                vectors[i] = vector
+        with self._lock:
+            self._batches += 1
+
+    # -- Maintenance ---------------------------------------------------------
+
+    def clear(self) -> None:
+        """Drop all cached embeddings, in memory and on disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM EMBEDDINGS")
+                self._db.commit()
+
+    def close(self) -> None:
+        """Close the disk backing; the in-memory cache stays usable."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def metrics(self) -> EmbeddingCacheMetrics:
+        """Return a snapshot of cache counters."""
+        with self._lock:
+            return EmbeddingCacheMetrics(
+                size=len(self._entries),
+                hits=self._hits,
+                disk_hits=self._disk_hits,
+                misses=self._misses,
+                batches=self._batches,
+            )
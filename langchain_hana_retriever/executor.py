@@ -0,0 +1,112 @@
+"""Bounded thread pool for blocking hdbcli calls."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WORKERS = 8
+
+_executor: ThreadPoolExecutor | None = None
+_nested_executor: ThreadPoolExecutor | None = None
+_max_workers = DEFAULT_MAX_WORKERS
+_lock = threading.Lock()
+_worker = threading.local()
+
+
+def _mark_worker(nested: bool = False) -> None:
+    _worker.active = True
+    _worker.nested = nested
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared executor used for blocking database calls."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_max_workers,
+                thread_name_prefix="hana-retriever",
+                initializer=_mark_worker,
+            )
+        return _executor
+
+
+def _get_nested_executor() -> ThreadPoolExecutor:
+    global _nested_executor
+    with _lock:
+        if _nested_executor is None:
+            _nested_executor = ThreadPoolExecutor(
+                max_workers=_max_workers,
+                thread_name_prefix="hana-retriever-nested",
+                initializer=_mark_worker,
+                initargs=(True,),
+            )
+        return _nested_executor
+
+
+def set_max_workers(max_workers: int) -> None:
+    """Resize the shared executor. Calls already running finish on the old pool."""
+    global _executor, _nested_executor, _max_workers
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    with _lock:
+        old = (_executor, _nested_executor)
+        _executor, _nested_executor, _max_workers = None, None, max_workers
+    for executor in old:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def on_worker() -> bool:
+    """Whether the calling thread is a worker of the shared executor (or of the nested one).
+
+    A worker that submits more calls and blocks on them holds a slot the calls may need,
+    so nested fan-out should run inline instead.
+    """
+    return getattr(_worker, "active", False)
+
+
+def submit(func: Callable[..., T], *args: Any, **kwargs: Any) -> Future[T]:
+    """Submit a call to the shared executor, running it in a copy of the caller's context."""
+    context = contextvars.copy_context()
+    return get_executor().submit(context.run, func, *args, **kwargs)
+
+
+def submit_nested(func: Callable[..., T], *args: Any, **kwargs: Any) -> Future[T]:
+    """Submit a fan-out call that may come from a worker of the shared executor.
+
+    Off the pool this is :func:`submit`. A shared-executor worker submits to a separate
+    executor of the same size, so it never waits on the slots it holds itself; a worker
+    of that executor runs the call inline and returns its completed future.
+    """
+    if not on_worker():
+        return submit(func, *args, **kwargs)
+    if not getattr(_worker, "nested", False):
+        context = contextvars.copy_context()
+        return _get_nested_executor().submit(context.run, func, *args, **kwargs)
+    future: Future[T] = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable on the shared executor without blocking the event loop.
+
+    Like :func:`asyncio.to_thread`, the call runs in a copy of the caller's context.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(context.run, func, *args, **kwargs)
+    )
@@ -0,0 +1,224 @@
+"""Metadata filters compiled to parameterized SQL and evaluated in Python."""
+
+from __future__ import annotations
+
+import json
+import operator
+import re
+from collections.abc import Callable, Mapping
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+# Plain (unquoted) HANA identifiers only: filter keys are interpolated into SQL
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_#$]*")
+
+_COMPARISONS: dict[str, tuple[str, Callable[[Any, Any], bool]]] = {
+    "$eq": ("=", operator.eq),
+    "$ne": ("<>", operator.ne),
+    "$gt": (">", operator.gt),
+    "$gte": (">=", operator.ge),
+    "$lt": ("<", operator.lt),
+    "$lte": ("<=", operator.le),
+}
+_SCALARS = (str, int, float, bool, Decimal, date)
+
+
+class MetadataFilter:
+    """A filter over table columns in the shape of HanaDB vector-store filters.
+
+    Keys are column names; a plain value means equality and several keys are combined
+    with AND::
+
+        {"TENANT": "acme", "YEAR": {"$gte": 2020}, "$or": [{"SOURCE": "a.pdf"},
+                                                         {"SOURCE": {"$in": ["b.pdf"]}}]}
+
+    Supported operators are ``$eq``, ``$ne``, ``$gt``, ``$gte``, ``$lt``, ``$lte``,
+    ``$in``, ``$nin``, ``$between`` (inclusive ``[low, high]``), ``$and`` and ``$or``.
+    Values are strings, numbers (including ``Decimal``), booleans, dates or datetimes.
+    Like SQL, a comparison with a missing or NULL value is never true, and a date or
+    datetime value compares with ISO-format strings and with the other temporal type.
+
+    Attributes:
+        spec: The filter dict.
+        sql: Parenthesized WHERE condition with ``?`` placeholders.
+        params: Values for the placeholders, in order.
+        columns: Columns the filter refers to.
+
+    Raises:
+        ValueError: On unknown operators, invalid column names or malformed values.
+    """
+
+    def __init__(self, spec: Mapping[str, Any]) -> None:
+        self.spec = dict(spec)
+        self.columns: set[str] = set()
+        self.params: list[Any] = []
+        self.sql = self._compile(self.spec)
+        self._match = self._matcher(self.spec)
+        self._key = json.dumps(self.spec, sort_keys=True, default=str)
+
+    @classmethod
+    def coerce(cls, *specs: Mapping[str, Any] | MetadataFilter | None) -> MetadataFilter | None:
+        """Combine filters (dicts or compiled) with AND, ignoring ``None`` and empty ones."""
+        parts = [s.spec if isinstance(s, MetadataFilter) else dict(s) for s in specs if s]
+        if not parts:
+            return None
+        return cls(parts[0] if len(parts) == 1 else {"$and": parts})
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, MetadataFilter) and self._key == other._key
+
+    def __hash__(self) -> int:
+        return hash(self._key)
+
+    def __repr__(self) -> str:
+        return f"MetadataFilter({self._key})"
+
+    @property
+    def key(self) -> str:
+        """Canonical JSON form, usable in cache keys."""
+        return self._key
+
+    def matches(self, values: Mapping[str, Any]) -> bool:
+        """Evaluate the filter on a row given as ``{column: value}``."""
+        return self._match(values)
+
+    # -- SQL -----------------------------------------------------------------
+
+    def _compile(self, spec: Mapping[str, Any]) -> str:
+        if not isinstance(spec, Mapping) or not spec:
+            raise ValueError(f"filter must be a non-empty dict, got {spec!r}")
+        clauses = []
+        for key, value in spec.items():
+            if key in ("$and", "$or"):
+                if not isinstance(value, list) or not value:
+                    raise ValueError(f"{key} expects a non-empty list of filters")
+                joiner = " AND " if key == "$and" else " OR "
+                clauses.append("(" + joiner.join(self._compile(sub) for sub in value) + ")")
+            elif key.startswith("$"):
+                raise ValueError(f"unsupported filter operator {key!r}")
+            else:
+                clauses.append(self._compile_column(key, value))
+        return clauses[0] if len(clauses) == 1 else "(" + " AND ".join(clauses) + ")"
+
+    def _compile_column(self, column: str, condition: Any) -> str:
+        if not _IDENTIFIER.fullmatch(column):
+            raise ValueError(f"invalid filter column {column!r}")
+        self.columns.add(column)
+        if not isinstance(condition, Mapping):
+            condition = {"$eq": condition}
+        clauses = []
+        for op, value in condition.items():
+            if op in _COMPARISONS:
+                self.params.append(_scalar(op, value))
+                clauses.append(f"{column} {_COMPARISONS[op][0]} ?")
+            elif op in ("$in", "$nin"):
+                values = [_scalar(op, v) for v in _sequence(op, value)]
+                if not values:
+                    # Nothing is in an empty list; everything non-NULL is outside it
+                    clauses.append("1 = 0" if op == "$in" else f"{column} IS NOT NULL")
+                    continue
+                self.params.extend(values)
+                negate = "NOT " if op == "$nin" else ""
+                clauses.append(f"{column} {negate}IN ({', '.join('?' for _ in values)})")
+            elif op == "$between":
+                bounds = _sequence(op, value)
+                if len(bounds) != 2:
+                    raise ValueError("$between expects [low, high]")
+                self.params.extend(_scalar(op, v) for v in bounds)
+                clauses.append(f"{column} BETWEEN ? AND ?")
+            else:
+                raise ValueError(f"unsupported filter operator {op!r}")
+        if not clauses:
+            raise ValueError(f"empty condition for column {column!r}")
+        return "(" + " AND ".join(clauses) + ")"
+
+    # -- Python --------------------------------------------------------------
+
+    def _matcher(self, spec: Mapping[str, Any]) -> Callable[[Mapping[str, Any]], bool]:
+        tests: list[Callable[[Mapping[str, Any]], bool]] = []
+        for key, value in spec.items():
+            if key == "$and":
+                tests.append(_all_of([self._matcher(sub) for sub in value]))
+            elif key == "$or":
+                tests.append(_any_of([self._matcher(sub) for sub in value]))
+            else:
+                condition = value if isinstance(value, Mapping) else {"$eq": value}
+                tests.extend(_column_test(key, op, arg) for op, arg in condition.items())
+        return _all_of(tests)
+
+
+def _all_of(
+    tests: list[Callable[[Mapping[str, Any]], bool]],
+) -> Callable[[Mapping[str, Any]], bool]:
+    return lambda row: all(t(row) for t in tests)
+
+
+def _any_of(
+    tests: list[Callable[[Mapping[str, Any]], bool]],
+) -> Callable[[Mapping[str, Any]], bool]:
+    return lambda row: any(t(row) for t in tests)
+
+
+def _batch_filter(kwargs: Mapping[str, Any]) -> dict[str, Any] | None:
+    """The ``filter`` passed to a batch call; other keywords are rejected, as in invoke."""
+    unexpected = sorted(set(kwargs) - {"filter"})
+    if unexpected:
+        raise TypeError(f"unexpected batch keyword arguments: {', '.join(unexpected)}")
+    filter: dict[str, Any] | None = kwargs.get("filter")
+    return filter
+
+
+def _column_test(column: str, op: str, arg: Any) -> Callable[[Mapping[str, Any]], bool]:
+    def test(row: Mapping[str, Any]) -> bool:
+        value = row.get(column)
+        if value is None:
+            return False
+        try:
+            if op in _COMPARISONS:
+                return bool(_COMPARISONS[op][1](*_comparable(value, arg)))
+            if op == "$in":
+                return any(operator.eq(*_comparable(value, v)) for v in arg)
+            if op == "$nin":
+                return not any(operator.eq(*_comparable(value, v)) for v in arg)
+            (above, low), (below, high) = (_comparable(value, bound) for bound in arg)
+            return bool(low <= above and below <= high)
+        except TypeError:
+            # Incomparable types (e.g. a string against a number) do not match
+            return False
+
+    return test
+
+
+def _comparable(value: Any, arg: Any) -> tuple[Any, Any]:
+    """A row value and a filter argument in types Python can compare as SQL would.
+
+    Against a date or datetime value, an ISO-format string argument is parsed, and a
+    date is taken as midnight when compared with a datetime.
+    """
+    if not isinstance(value, date):
+        return value, arg
+    if isinstance(arg, str):
+        try:
+            arg = datetime.fromisoformat(arg)
+        except ValueError:
+            return value, arg
+    if isinstance(arg, datetime) and not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    elif isinstance(value, datetime) and isinstance(arg, date) and not isinstance(arg, datetime):
+        arg = datetime.combine(arg, datetime.min.time())
+    return value, arg
+
+
+def _scalar(op: str, value: Any) -> Any:
+    if not isinstance(value, _SCALARS):
+        raise ValueError(
+            f"{op} expects a string, number, boolean, date or datetime, got {value!r}"
+        )
+    return value
+
+
+def _sequence(op: str, value: Any) -> list[Any]:
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"{op} expects a list, got {value!r}")
+    return list(value)
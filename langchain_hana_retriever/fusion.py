@@ -0,0 +1,138 @@
+"""Rank fusion of several ranked document lists by document identity."""
+
+from __future__ import annotations
+
+import heapq
+import math
+from collections.abc import Callable, Hashable, Sequence
+from typing import Any, Literal
+
+from langchain_core.documents import Document
+
+FusionMethod = Literal["rrf", "combsum", "combmnz"]
+Normalization = Literal["minmax", "zscore", "none"]
+Identity = str | Callable[[Document], Hashable] | None
+
+
+def document_identity(doc: Document, identity: Identity = None) -> Hashable:
+    """Key under which ``doc`` is merged across lists.
+
+    ``identity`` is a metadata field (e.g. a primary key column) or a callable. When
+    it is ``None`` or the field is missing, ``doc.id`` is used if set, then the page
+    content (Python caches a string's hash, so each chunk is hashed at most once).
+    """
+    if callable(identity):
+        return identity(doc)
+    if identity is not None:
+        value = doc.metadata.get(identity)
+        if value is not None:
+            return ("key", value)
+    if doc.id is not None:
+        return ("id", doc.id)
+    return ("content", doc.page_content)
+
+
+def normalize_scores(scores: list[float], normalization: Normalization) -> list[float]:
+    """Rescale one list's scores: min-max to ``[0, 1]`` or z-scores; ``"none"`` keeps them."""
+    if normalization == "none" or not scores:
+        return scores
+    if normalization == "minmax":
+        low, high = min(scores), max(scores)
+        if high == low:
+            return [1.0] * len(scores)
+        return [(s - low) / (high - low) for s in scores]
+    mean = sum(scores) / len(scores)
+    std = math.sqrt(sum((s - mean) ** 2 for s in scores) / len(scores))
+    if std == 0:
+        return [0.0] * len(scores)
+    return [(s - mean) / std for s in scores]
+
+
+def fuse(
+    ranked_lists: Sequence[Sequence[Document]],
+    k: int,
+    weights: Sequence[float] | None = None,
+    method: FusionMethod = "rrf",
+    rrf_k: int = 60,
+    normalization: Normalization = "minmax",
+    score_keys: Sequence[str | None] | None = None,
+    identity: Identity = None,
+    sources: Sequence[str] | None = None,
+    annotate: bool = True,
+) -> list[Document]:
+    """Fuse ranked lists into the top ``k`` documents.
+
+    ``"rrf"`` sums ``weight / (rrf_k + rank)``. ``"combsum"`` sums the weighted,
+    normalized scores of each list; ``"combmnz"`` multiplies that sum by the number of
+    lists the document appears in. Scores are read from ``doc.metadata[score_keys[i]]``;
+    lists without a score key (or documents without the field) score by negative rank.
+
+    Only the ``k`` winners are materialized: with ``annotate``, each is a copy of the
+    first-seen document carrying ``fusion_score`` and ``fusion_ranks`` (1-based rank
+    per source name) in its metadata; otherwise the original documents are returned.
+    Ties keep first-seen order.
+
+    Args:
+        ranked_lists: Best-first document lists, one per source.
+        k: Number of results.
+        weights: Weight per list (default 1.0 each).
+        method: ``"rrf"``, ``"combsum"`` or ``"combmnz"``.
+        rrf_k: RRF rank offset.
+        normalization: Score normalization per list for CombSUM/CombMNZ.
+        score_keys: Metadata field holding each list's score.
+        identity: Metadata field or callable identifying a document across lists.
+        sources: Names of the lists used in ``fusion_ranks`` (default ``"0"``, ``"1"``...).
+        annotate: Write fused score and per-source ranks into result metadata.
+    """
+    n_lists = len(ranked_lists)
+    weights = list(weights) if weights is not None else [1.0] * n_lists
+    score_keys = list(score_keys) if score_keys is not None else [None] * n_lists
+    sources = list(sources) if sources is not None else [str(i) for i in range(n_lists)]
+    if not len(weights) == len(score_keys) == len(sources) == n_lists:
+        raise ValueError("weights, score_keys and sources must have one entry per list")
+    if method not in ("rrf", "combsum", "combmnz"):
+        raise ValueError(f"unknown fusion method: {method!r}")
+
+    # Per identity: [fused score, first-seen order, first document, {source: rank}]
+    entries: dict[Hashable, list[Any]] = {}
+    for docs, weight, score_key, source in zip(
+        ranked_lists, weights, score_keys, sources, strict=True
+    ):
+        if method == "rrf":
+            contributions = [weight / (rrf_k + rank) for rank in range(1, len(docs) + 1)]
+        else:
+            raw = [_raw_score(doc, score_key, rank) for rank, doc in enumerate(docs)]
+            contributions = [weight * s for s in normalize_scores(raw, normalization)]
+        for rank, (doc, contribution) in enumerate(zip(docs, contributions, strict=True), 1):
+            key = document_identity(doc, identity)
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = [contribution, len(entries), doc, {source: rank}]
+            else:
+                entry[0] += contribution
+                # A document repeated within one list keeps its best rank
+                entry[3].setdefault(source, rank)
+
+    if method == "combmnz":
+        for entry in entries.values():
+            entry[0] *= len(entry[3])
+
+    winners = heapq.nlargest(k, entries.values(), key=lambda e: (e[0], -e[1]))
+    if not annotate:
+        return [entry[2] for entry in winners]
+    return [
+        Document(
+            id=doc.id,
+            page_content=doc.page_content,
+            metadata={**doc.metadata, "fusion_score": score, "fusion_ranks": ranks},
+        )
+        for score, _, doc, ranks in winners
+    ]
+
+
+def _raw_score(doc: Document, score_key: str | None, rank: int) -> float:
+    if score_key is not None:
+        value = doc.metadata.get(score_key)
+        if value is not None:
+            return float(value)
+    return float(-rank)
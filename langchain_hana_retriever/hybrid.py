@@ -2,40 +2,1027 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
 from typing import Any
 
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForChainRun,
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForChainRun,
+    CallbackManagerForRetrieverRun,
+)
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableConfig
+from pydantic import PrivateAttr, model_validator
 
-from langchain_hana_retriever.utils import reciprocal_rank_fusion
+from langchain_hana_retriever.admission import (
+    AdmissionController,
+    aadmit,
+    admit,
+    apply_deadline,
+    deadline,
+    time_left,
+)
+from langchain_hana_retriever.analysis import DEFAULT_ANALYZER, Analyzer
+from langchain_hana_retriever.cache import QueryCache, copy_documents
+from langchain_hana_retriever.embeddings import EmbeddingCache, normalize_query
+from langchain_hana_retriever.executor import on_worker, run_blocking, submit
+from langchain_hana_retriever.filters import MetadataFilter, _batch_filter
+from langchain_hana_retriever.fusion import FusionMethod, Normalization, fuse
+from langchain_hana_retriever.instrumentation import (
+    Instrumentation,
+    apublish,
+    count,
+    count_rows,
+    profile,
+    publish,
+    stage,
+)
+from langchain_hana_retriever.pool import checkout
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Leg:
+    name: str
+    retriever: Any  # None for the vector store
+    weight: float
+    timeout: float | None
+    score_key: str | None
+
+
+class _Source:
+    """A cache-key part that compares a leg's source by identity.
+
+    It holds the source, so a collected retriever's ``id`` cannot be reused by a new
+    one while a cache entry still names it.
+    """
+
+    __slots__ = ("source",)
+
+    def __init__(self, source: Any) -> None:
+        self.source = source
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Source) and other.source is self.source
+
+    def __hash__(self) -> int:
+        return id(self.source)
 
 
 class HANAHybridRetriever(BaseRetriever):
-    """Hybrid retriever that merges vector similarity and BM25 keyword results via RRF.
+    """Hybrid retriever that fuses vector similarity and BM25 keyword results.
 
     Uses a HanaDB vector store for semantic search and HANABm25Retriever for keyword
-    search, then fuses results using Reciprocal Rank Fusion.
+    search, then fuses results (Reciprocal Rank Fusion by default). Alternatively,
+    ``retrievers`` lists any number of retrievers to fuse, with per-retriever
+    ``weights``, ``timeouts`` and ``sources`` names. All legs run concurrently; a leg
+    that exceeds its timeout is dropped and the other legs' results are returned.
+    An optional ``cache`` serves repeated queries; degraded results are never cached.
+
+    Fusion (see :func:`~langchain_hana_retriever.fusion.fuse`) merges documents by
+    ``id_key`` (a metadata field such as a primary key), falling back to document id
+    and then content. ``fusion`` selects ``"rrf"``, ``"combsum"`` or ``"combmnz"``
+    with ``normalization`` of each leg's ``score_keys`` score (``bm25_score`` for the
+    keyword leg); results carry ``fusion_score`` and per-source ``fusion_ranks``.
+
+    A ``filter`` (the retriever's own, AND-combined with one passed to ``invoke`` or
+    ``batch``) is forwarded to every leg: as ``filter=`` to the vector store's
+    similarity search and to the retrievers, which push it into their SQL.
+    Filter keys must therefore name columns all legs understand.
+
+    With ``single_statement``, the query is embedded once and both legs run as one SQL
+    statement on the keyword retriever's connection: the vector top ``k`` (ranked by
+    ``COSINE_SIMILARITY`` or ``L2DISTANCE`` per the store's distance strategy) UNION ALL
+    the keyword candidates, each row tagged with its leg. Keyword candidates are scored
+    with BM25 and both lists are fused from that single result set. The vector store
+    and keyword retriever must use the same table; leg timeouts do not apply.
+
+    With an ``embedding_cache``, query embeddings are looked up (and stored) there and
+    the vector leg calls ``similarity_search_by_vector``, so repeated questions skip the
+    embedding model. In ``batch``, each query is embedded inside its vector search, so
+    misses are embedded concurrently and count against ``vector_timeout``.
+
+    ``vector_k`` sets how many results the vector leg returns (default ``k``), so it
+    can oversample before fusion keeps the best ``k``; the keyword leg returns its
+    retriever's own ``k``. With ``cascade``, the keyword leg runs first and its BM25
+    score margin (best score over second best) decides the vector leg: skipped when the
+    margin is at least ``skip_margin`` (typically exact identifiers or error codes), run
+    with ``shallow_k`` results when it is at least ``shallow_margin``, and run with
+    ``vector_k`` results otherwise. Without a margin (no keyword matched, only one did,
+    or the second scored zero) a lone keyword hit may be weak, so the vector leg runs
+    with ``vector_k`` results too. Each result carries the decision, margin and vector depth
+    under ``cascade`` metadata; :attr:`cascade_counts` and instrumentation counters
+    (``cascade_skip``, ``cascade_shallow``, ``cascade_deep``) tally decisions.
+
+    With ``instrumentation``, each query or batch is profiled with one stage per leg
+    (named as in ``fusion_ranks``), ``embed`` and ``fusion``, and ``sql``, ``fetch``,
+    ``analyze`` and ``score`` in single-statement mode. Retriever legs profile their own
+    internals when they have instrumentation too. Profiles reach callbacks and
+    ``include_timings`` metadata as for :class:`HANABm25Retriever`.
+
+    Leg timeouts are enforced in two places: the caller stops waiting for a leg once its
+    timeout passes, and the leg runs under a matching deadline, so retriever legs that
+    honour it (such as :class:`HANABm25Retriever`) have HANA cancel their statements.
+    Cancelling the leg's future only prevents a leg that has not started yet; a running
+    vector store search cannot be interrupted and finishes in the background.
+
+    An ``admission`` controller holds one slot per call (legs sharing the controller run
+    in it) and ``request_timeout`` sets a deadline that caps every leg timeout and
+    reaches the legs' statements. With less than the controller's ``degrade_within``
+    seconds left, only the leg named by ``degraded_leg`` runs; such results are never
+    cached.
     """
 
-    vector_store: Any
-    keyword_retriever: Any  # HANABm25Retriever (Any to allow mocking)
+    vector_store: Any = None
+    keyword_retriever: Any = None  # HANABm25Retriever (Any to allow mocking)
     alpha: float = 0.5
     k: int = 10
+    vector_timeout: float | None = None
+    keyword_timeout: float | None = None
+    retrievers: list[Any] | None = None
+    weights: list[float] | None = None
+    timeouts: list[float | None] | None = None
+    sources: list[str] | None = None
+    fusion: FusionMethod = "rrf"
+    normalization: Normalization = "minmax"
+    rrf_k: int = 60
+    score_keys: list[str | None] | None = None
+    id_key: str | None = None
+    cache: QueryCache | None = None
+    filter: dict[str, Any] | None = None
+    single_statement: bool = False
+    embedding_cache: EmbeddingCache | None = None
+    instrumentation: Instrumentation | None = None
+    include_timings: bool = False
+    vector_k: int | None = None
+    cascade: bool = False
+    skip_margin: float = 3.0
+    shallow_margin: float = 1.5
+    shallow_k: int | None = None
+    admission: AdmissionController | None = None
+    request_timeout: float | None = None
+    degraded_leg: str | None = None
 
     model_config = {"arbitrary_types_allowed": True}
 
+    _cascade_counts: Counter[str] = PrivateAttr(default_factory=Counter)
+    _counts_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @model_validator(mode="after")
+    def _check_legs(self) -> HANAHybridRetriever:
+        classic = self.vector_store is not None or self.keyword_retriever is not None
+        if self.retrievers is not None:
+            if classic:
+                raise ValueError("pass either retrievers or vector_store and keyword_retriever")
+            if not self.retrievers:
+                raise ValueError("retrievers must not be empty")
+            if self.single_statement or self.embedding_cache is not None:
+                raise ValueError(
+                    "single_statement and embedding_cache need vector_store and keyword_retriever"
+                )
+        elif self.vector_store is None or self.keyword_retriever is None:
+            raise ValueError("vector_store and keyword_retriever are required without retrievers")
+        n_legs = len(self._legs())
+        for name in ("weights", "timeouts", "sources", "score_keys"):
+            value = getattr(self, name)
+            if value is not None and len(value) != n_legs:
+                raise ValueError(f"{name} must have one entry per leg ({n_legs})")
+        if self.cascade:
+            if self.retrievers is not None or self.single_statement:
+                raise ValueError(
+                    "cascade needs vector_store and keyword_retriever without single_statement"
+                )
+            if self.shallow_margin > self.skip_margin:
+                raise ValueError("shallow_margin must not exceed skip_margin")
+        if self.degraded_leg is not None and self.degraded_leg not in {
+            leg.name for leg in self._legs()
+        }:
+            raise ValueError(f"degraded_leg {self.degraded_leg!r} does not name a leg")
+        if self.single_statement:
+            self._check_single_statement()
+        return self
+
+    def _check_single_statement(self) -> None:
+        keyword = self.keyword_retriever
+        if _unquote(self.vector_store.table_name) != _unquote(keyword.table_name):
+            raise ValueError("single_statement requires both legs to search the same table")
+        if keyword.two_phase or keyword.fetch_size or keyword.postings_index or keyword.replica:
+            raise ValueError(
+                "single_statement requires a keyword retriever on the LOCATE path "
+                "(no two_phase, fetch_size, postings_index or replica)"
+            )
+
+    @property
+    def cascade_counts(self) -> dict[str, int]:
+        """Number of cascade decisions by kind (``skip``, ``shallow``, ``deep``), cumulative."""
+        with self._counts_lock:
+            return dict(self._cascade_counts)
+
+    def _legs(self) -> list[_Leg]:
+        """The retrievers to fuse; ``retriever=None`` stands for the vector store."""
+        if self.retrievers is None:
+            legs = [
+                _Leg("vector", None, self.alpha, self.vector_timeout, None),
+                _Leg(
+                    "keyword",
+                    self.keyword_retriever,
+                    1 - self.alpha,
+                    self.keyword_timeout,
+                    "bm25_score",
+                ),
+            ]
+        else:
+            legs = [
+                _Leg(f"retriever_{i}", retriever, 1.0, None, None)
+                for i, retriever in enumerate(self.retrievers)
+            ]
+        for attribute, field in (
+            ("weight", self.weights),
+            ("timeout", self.timeouts),
+            ("name", self.sources),
+            ("score_key", self.score_keys),
+        ):
+            for leg, value in zip(legs, field or (), strict=False):
+                setattr(leg, attribute, value)
+        return legs
+
     def _get_relevant_documents(
         self,
         query: str,
         *,
         run_manager: CallbackManagerForRetrieverRun,
+        filter: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        where = MetadataFilter.coerce(self.filter, filter)
+        with deadline(self.request_timeout), profile(self.instrumentation, "hybrid") as record:
+            with admit(self.admission):
+                docs = self._cached_search(query, where)
+        publish(record, [docs], [run_manager], self.include_timings)
+        return docs
+
+    def _cached_search(self, query: str, where: MetadataFilter | None) -> list[Document]:
+        key = self._cache_key(query, where)
+        if self.cache is None or key is None:
+            return self._search(query, where)[0]
+
+        degraded = False
+
+        def compute() -> list[Document]:
+            nonlocal degraded
+            docs, degraded = self._search(query, where)
+            return docs
+
+        docs = self.cache.get_or_compute(key, compute)
+        if degraded:
+            self.cache.discard(key)
+        return copy_documents(docs)
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        filter: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        where = MetadataFilter.coerce(self.filter, filter)
+        with deadline(self.request_timeout), profile(self.instrumentation, "hybrid") as record:
+            async with aadmit(self.admission):
+                docs = await self._acached_search(query, where)
+        await apublish(record, [docs], [run_manager], self.include_timings)
+        return docs
+
+    async def _acached_search(self, query: str, where: MetadataFilter | None) -> list[Document]:
+        key = self._cache_key(query, where)
+        if self.cache is None or key is None:
+            return (await self._asearch(query, where))[0]
+
+        degraded = False
+
+        async def compute() -> list[Document]:
+            nonlocal degraded
+            docs, degraded = await self._asearch(query, where)
+            return docs
+
+        docs = await self.cache.aget_or_compute(key, compute)
+        if degraded:
+            self.cache.discard(key)
+        return copy_documents(docs)
+
+    def _search(
+        self, query: str, where: MetadataFilter | None = None
+    ) -> tuple[list[Document], bool]:
+        """Run all legs concurrently; return fused results and whether a leg was dropped."""
+        skipped = self._skipped_legs()
+        if self.single_statement and not skipped:
+            return self._search_single(query, where), False
+        if self.cascade and not skipped:
+            return self._search_cascade(query, where)
+        start = time.monotonic()
+        kwargs = self._filter_kwargs(where)
+        legs = self._legs()
+        futures = [
+            None if leg.name in skipped else self._submit(self._run_leg, leg, query, kwargs)
+            for leg in legs
+        ]
+        results: list[list[Document] | None] = [
+            [] if future is None else self._collect(leg.name, future, leg.timeout, start)
+            for leg, future in zip(legs, futures, strict=True)
+        ]
+        degraded = bool(skipped) or any(docs is None for docs in results)
+        return self._fuse([docs or [] for docs in results]), degraded
+
+    async def _asearch(
+        self, query: str, where: MetadataFilter | None = None
+    ) -> tuple[list[Document], bool]:
+        skipped = self._skipped_legs()
+        if self.single_statement and not skipped:
+            return await run_blocking(self._search_single, query, where), False
+        if self.cascade and not skipped:
+            return await self._asearch_cascade(query, where)
+        kwargs = self._filter_kwargs(where)
+        legs = self._legs()
+        results = await asyncio.gather(
+            *(
+                _skipped()
+                if leg.name in skipped
+                else self._acollect(leg.name, self._arun_leg(leg, query, kwargs), leg.timeout)
+                for leg in legs
+            )
+        )
+        degraded = bool(skipped) or any(docs is None for docs in results)
+        return self._fuse([docs or [] for docs in results]), degraded
+
+    def _run_leg(
+        self, leg: _Leg, query: str, kwargs: dict[str, Any], depth: int | None = None
     ) -> list[Document]:
-        vector_results = self.vector_store.similarity_search(query, k=self.k)
-        keyword_results = self.keyword_retriever.invoke(query)
+        with deadline(leg.timeout), self._stage(leg.name):
+            if leg.retriever is None:
+                return self._vector_search(query, kwargs, depth)
+            docs: list[Document] = leg.retriever.invoke(query, **kwargs)
+            return docs
+
+    async def _arun_leg(
+        self, leg: _Leg, query: str, kwargs: dict[str, Any], depth: int | None = None
+    ) -> list[Document]:
+        with deadline(leg.timeout), self._stage(leg.name):
+            if leg.retriever is None:
+                return await self._avector_search(query, kwargs, depth)
+            docs: list[Document] = await leg.retriever.ainvoke(query, **kwargs)
+            return docs
+
+    def _stage(self, name: str) -> AbstractContextManager[Any]:
+        return stage(self.instrumentation, name)
+
+    def _skipped_legs(self) -> frozenset[str]:
+        """Legs left out of this request because its deadline is close."""
+        if (
+            self.admission is None
+            or self.degraded_leg is None
+            or not self.admission.near_deadline()
+        ):
+            return frozenset()
+        self.admission.record_degraded(f"{self.degraded_leg}_only")
+        return frozenset(leg.name for leg in self._legs() if leg.name != self.degraded_leg)
+
+    def _submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Future[Any]:
+        """Run a leg on the shared executor, or inline when already on one of its workers.
+
+        A worker blocking on legs queued behind it could starve the pool, as when one
+        hybrid retriever is a leg of another.
+        """
+        if not on_worker():
+            return submit(func, *args, **kwargs)
+        future: Future[Any] = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def _timed(self, leg: _Leg, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with deadline(leg.timeout), self._stage(leg.name):
+            return func(*args, **kwargs)
+
+    def _cache_key(self, query: str, where: MetadataFilter | None) -> tuple[Any, ...] | None:
+        # The keyword analyzer decides which queries are the same for the keyword leg,
+        # but other legs see the text itself, so the normalized query is kept too.
+        # Everything that changes the fused result, down to each leg's source, is
+        # part of the key
+        analyzer = getattr(self.keyword_retriever, "analyzer", None)
+        if not isinstance(analyzer, Analyzer):
+            analyzer = DEFAULT_ANALYZER
+        terms = analyzer.query_terms(analyzer.query_tokens(query))
+        if not terms:
+            return None
+        return (
+            tuple(sorted(terms)),
+            normalize_query(query),
+            self.k,
+            self.fusion,
+            self.rrf_k,
+            self.normalization,
+            self.id_key,
+            self.single_statement,
+            self.vector_k,
+            self.cascade,
+            self.skip_margin,
+            self.shallow_margin,
+            self.shallow_k,
+            tuple(
+                (leg.name, leg.weight, leg.score_key, self._source_key(leg.retriever))
+                for leg in self._legs()
+            ),
+            where.key if where else None,
+        )
 
-        return reciprocal_rank_fusion(
-            ranked_lists=[vector_results, keyword_results],
-            weights=[self.alpha, 1 - self.alpha],
-            k=self.k,
+    def _source_key(self, retriever: Any) -> tuple[Any, ...]:
+        """Identity and result-size settings of a leg's retriever (or the vector store)."""
+        if retriever is None:
+            return (_Source(self.vector_store), getattr(self.vector_store, "table_name", None))
+        candidate_limit = getattr(retriever, "_candidate_limit", None)
+        return (
+            _Source(retriever),
+            getattr(retriever, "table_name", None),
+            getattr(retriever, "k", None),
+            candidate_limit() if callable(candidate_limit) else None,
         )
+
+    @staticmethod
+    def _filter_kwargs(where: MetadataFilter | None) -> dict[str, Any]:
+        # Legs are called without the keyword when unfiltered, as before
+        return {} if where is None else {"filter": where.spec}
+
+    def batch(
+        self,
+        inputs: list[str],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[list[Document]]:
+        """Retrieve for several queries, batching each retriever leg into one call.
+
+        A ``filter`` keyword argument applies to every query; other keyword arguments
+        raise :class:`TypeError`.
+        """
+        where = MetadataFilter.coerce(self.filter, _batch_filter(kwargs))
+
+        def search_many(
+            queries: list[str], run_manager: list[CallbackManagerForChainRun]
+        ) -> list[Exception | list[Document]]:
+            with deadline(self.request_timeout), profile(self.instrumentation, "hybrid") as record:
+                with admit(self.admission):
+                    results = self._search_many(queries, where)
+            publish(record, results, run_manager, self.include_timings)
+            return list(results)
+
+        return self._batch_with_config(
+            search_many,
+            inputs,
+            config,
+            return_exceptions=return_exceptions,
+            run_type="retriever",
+        )
+
+    async def abatch(
+        self,
+        inputs: list[str],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[list[Document]]:
+        """Async variant of :meth:`batch`."""
+        where = MetadataFilter.coerce(self.filter, _batch_filter(kwargs))
+
+        async def search_many(
+            queries: list[str], run_manager: list[AsyncCallbackManagerForChainRun]
+        ) -> list[Exception | list[Document]]:
+            with deadline(self.request_timeout), profile(self.instrumentation, "hybrid") as record:
+                async with aadmit(self.admission):
+                    results = await self._asearch_many(queries, where)
+            await apublish(record, results, run_manager, self.include_timings)
+            return list(results)
+
+        return await self._abatch_with_config(
+            search_many,
+            inputs,
+            config,
+            return_exceptions=return_exceptions,
+            run_type="retriever",
+        )
+
+    def _search_many(
+        self, queries: list[str], where: MetadataFilter | None = None
+    ) -> list[list[Document]]:
+        skipped = self._skipped_legs()
+        if self.single_statement and not skipped:
+            if self.embedding_cache is not None:
+                # Warm the cache with one batched call; each statement then hits it
+                with self._stage("embed"):
+                    self.embedding_cache.embed_queries(self.vector_store.embedding, queries)
+            return [self._search_single(query, where) for query in queries]
+        if self.cascade and not skipped:
+            return self._search_many_cascade(queries, where)
+        start = time.monotonic()
+        kwargs = self._filter_kwargs(where)
+        legs = self._legs()
+
+        # Retriever legs run as one batch each; the vector store is searched per query
+        futures = [
+            None
+            if leg.name in skipped or leg.retriever is None
+            else self._submit(self._timed, leg, leg.retriever.batch, queries, **kwargs)
+            for leg in legs
+        ]
+        per_leg: list[list[list[Document]]] = []
+        for leg, future in zip(legs, futures, strict=True):
+            if leg.name in skipped:
+                per_leg.append([[] for _ in queries])
+            elif future is None:
+                depths: list[int | None] = [None] * len(queries)
+                collected = self._vector_searches(leg, queries, kwargs, depths, start)
+                per_leg.append([docs or [] for docs in collected])
+            else:
+                batch = self._collect(leg.name, future, leg.timeout, start)
+                per_leg.append(batch if batch is not None else [[] for _ in queries])
+        return [self._fuse([docs[i] for docs in per_leg]) for i in range(len(queries))]
+
+    async def _asearch_many(
+        self, queries: list[str], where: MetadataFilter | None = None
+    ) -> list[list[Document]]:
+        skipped = self._skipped_legs()
+        if self.single_statement and not skipped:
+            return await run_blocking(self._search_many, queries, where)
+        if self.cascade and not skipped:
+            return await self._asearch_many_cascade(queries, where)
+        kwargs = self._filter_kwargs(where)
+
+        async def timed(name: str, awaitable: Awaitable[Any]) -> Any:
+            with self._stage(name):
+                return await awaitable
+
+        async def vector_batch(leg: _Leg) -> list[list[Document]]:
+            collected = await self._avector_searches(leg, queries, kwargs, [None] * len(queries))
+            return [docs or [] for docs in collected]
+
+        async def retriever_batch(leg: _Leg) -> list[list[Document]]:
+            batch = await self._acollect(
+                leg.name, timed(leg.name, leg.retriever.abatch(queries, **kwargs)), leg.timeout
+            )
+            return batch if batch is not None else [[] for _ in queries]
+
+        async def skipped_batch() -> list[list[Document]]:
+            return [[] for _ in queries]
+
+        per_leg = await asyncio.gather(
+            *(
+                skipped_batch()
+                if leg.name in skipped
+                else vector_batch(leg)
+                if leg.retriever is None
+                else retriever_batch(leg)
+                for leg in self._legs()
+            )
+        )
+        return [self._fuse([docs[i] for docs in per_leg]) for i in range(len(queries))]
+
+    def _vector_depth(self) -> int:
+        return self.vector_k or self.k
+
+    def _vector_search(
+        self, query: str, kwargs: dict[str, Any], depth: int | None = None
+    ) -> list[Document]:
+        k = depth or self._vector_depth()
+        docs: list[Document]
+        if self.embedding_cache is None:
+            docs = self.vector_store.similarity_search(query, k=k, **kwargs)
+            return docs
+        with self._stage("embed"):
+            vector = self.embedding_cache.embed_query(self.vector_store.embedding, query)
+        docs = self.vector_store.similarity_search_by_vector(vector, k=k, **kwargs)
+        return docs
+
+    async def _avector_search(
+        self, query: str, kwargs: dict[str, Any], depth: int | None = None
+    ) -> list[Document]:
+        k = depth or self._vector_depth()
+        docs: list[Document]
+        if self.embedding_cache is None:
+            docs = await self.vector_store.asimilarity_search(query, k=k, **kwargs)
+            return docs
+        with self._stage("embed"):
+            vector = await self.embedding_cache.aembed_query(self.vector_store.embedding, query)
+        docs = await self.vector_store.asimilarity_search_by_vector(vector, k=k, **kwargs)
+        return docs
+
+    # -- Cascade -------------------------------------------------------------
+
+    def _cascade_decision(self, keyword_docs: list[Document] | None) -> dict[str, Any]:
+        """Choose the vector leg's depth from the keyword leg's score margin.
+
+        ``keyword_docs`` is ``None`` when the keyword leg timed out; the vector leg then
+        runs at full depth, as when there is no margin to judge by.
+        """
+        score_key = self._legs()[1].score_key or "bm25_score"
+        scores = [doc.metadata.get(score_key, 0.0) for doc in (keyword_docs or [])[:2]]
+        margin = scores[0] / scores[1] if len(scores) == 2 and scores[1] > 0 else None
+        if margin is None:
+            decision = "deep"
+        elif margin >= self.skip_margin:
+            decision = "skip"
+        elif margin >= self.shallow_margin:
+            decision = "shallow"
+        else:
+            decision = "deep"
+        depth = {
+            "skip": 0,
+            "shallow": self.shallow_k or max(self.k // 2, 1),
+            "deep": self._vector_depth(),
+        }[decision]
+        with self._counts_lock:
+            self._cascade_counts[decision] += 1
+        count(f"cascade_{decision}", 1)
+        return {"decision": decision, "margin": margin, "vector_k": depth}
+
+    def _cascade_fuse(
+        self,
+        vector_docs: list[Document] | None,
+        keyword_docs: list[Document] | None,
+        decision: dict[str, Any],
+    ) -> list[Document]:
+        docs = self._fuse([vector_docs or [], keyword_docs or []])
+        for doc in docs:
+            doc.metadata["cascade"] = dict(decision)
+        return docs
+
+    def _search_cascade(
+        self, query: str, where: MetadataFilter | None
+    ) -> tuple[list[Document], bool]:
+        kwargs = self._filter_kwargs(where)
+        vector, keyword = self._legs()
+        keyword_docs = self._collect(
+            keyword.name,
+            self._submit(self._run_leg, keyword, query, kwargs),
+            keyword.timeout,
+            time.monotonic(),
+        )
+        decision = self._cascade_decision(keyword_docs)
+        vector_docs: list[Document] | None = []
+        if decision["vector_k"]:
+            vector_docs = self._collect(
+                vector.name,
+                self._submit(self._run_leg, vector, query, kwargs, decision["vector_k"]),
+                vector.timeout,
+                time.monotonic(),
+            )
+        degraded = keyword_docs is None or vector_docs is None
+        return self._cascade_fuse(vector_docs, keyword_docs, decision), degraded
+
+    async def _asearch_cascade(
+        self, query: str, where: MetadataFilter | None
+    ) -> tuple[list[Document], bool]:
+        kwargs = self._filter_kwargs(where)
+        vector, keyword = self._legs()
+        keyword_docs = await self._acollect(
+            keyword.name, self._arun_leg(keyword, query, kwargs), keyword.timeout
+        )
+        decision = self._cascade_decision(keyword_docs)
+        vector_docs: list[Document] | None = []
+        if decision["vector_k"]:
+            vector_docs = await self._acollect(
+                vector.name,
+                self._arun_leg(vector, query, kwargs, decision["vector_k"]),
+                vector.timeout,
+            )
+        degraded = keyword_docs is None or vector_docs is None
+        return self._cascade_fuse(vector_docs, keyword_docs, decision), degraded
+
+    def _search_many_cascade(
+        self, queries: list[str], where: MetadataFilter | None
+    ) -> list[list[Document]]:
+        kwargs = self._filter_kwargs(where)
+        vector, keyword = self._legs()
+        batch = self._collect(
+            keyword.name,
+            self._submit(self._timed, keyword, keyword.retriever.batch, queries, **kwargs),
+            keyword.timeout,
+            time.monotonic(),
+        )
+        keyword_results = batch if batch is not None else [None] * len(queries)
+        decisions = [self._cascade_decision(docs) for docs in keyword_results]
+        needed = [i for i, decision in enumerate(decisions) if decision["vector_k"]]
+        collected = self._vector_searches(
+            vector,
+            [queries[i] for i in needed],
+            kwargs,
+            [decisions[i]["vector_k"] for i in needed],
+            time.monotonic(),
+        )
+        vector_results = dict(zip(needed, collected, strict=True))
+        return [
+            self._cascade_fuse(vector_results.get(i, []), keyword_results[i], decisions[i])
+            for i in range(len(queries))
+        ]
+
+    async def _asearch_many_cascade(
+        self, queries: list[str], where: MetadataFilter | None
+    ) -> list[list[Document]]:
+        kwargs = self._filter_kwargs(where)
+        vector, keyword = self._legs()
+
+        async def timed_batch() -> list[list[Document]]:
+            with self._stage(keyword.name):
+                results: list[list[Document]] = await keyword.retriever.abatch(queries, **kwargs)
+            return results
+
+        batch = await self._acollect(keyword.name, timed_batch(), keyword.timeout)
+        keyword_results = batch if batch is not None else [None] * len(queries)
+        decisions = [self._cascade_decision(docs) for docs in keyword_results]
+        needed = [i for i, decision in enumerate(decisions) if decision["vector_k"]]
+        collected = await self._avector_searches(
+            vector,
+            [queries[i] for i in needed],
+            kwargs,
+            [decisions[i]["vector_k"] for i in needed],
+        )
+        vector_results = dict(zip(needed, collected, strict=True))
+        return [
+            self._cascade_fuse(vector_results.get(i, []), keyword_results[i], decisions[i])
+            for i in range(len(queries))
+        ]
+
+    def _vector_searches(
+        self,
+        leg: _Leg,
+        queries: list[str],
+        kwargs: dict[str, Any],
+        depths: list[int | None],
+        start: float,
+    ) -> list[list[Document] | None]:
+        """Search the vector store once per query; ``None`` marks a search that timed out.
+
+        Each search embeds its own query, so cache misses are embedded concurrently and
+        count against the leg's timeout. A cache that batches with ``embed_documents``
+        embeds all misses in one call first, under the same timeout.
+        """
+        if self.embedding_cache is None or not self.embedding_cache.batch_with_documents:
+            futures = [
+                self._submit(self._run_leg, leg, query, kwargs, depth)
+                for query, depth in zip(queries, depths, strict=True)
+            ]
+            return [self._collect(leg.name, future, leg.timeout, start) for future in futures]
+        embedded = self._submit(self._timed, leg, self._embed_queries, queries)
+        vectors = self._collect(leg.name, embedded, leg.timeout, start)
+        if vectors is None:
+            return [None] * len(queries)
+        search = self.vector_store.similarity_search_by_vector
+        futures = [
+            self._submit(
+                self._timed, leg, search, vector, k=depth or self._vector_depth(), **kwargs
+            )
+            for vector, depth in zip(vectors, depths, strict=True)
+        ]
+        return [self._collect(leg.name, future, leg.timeout, start) for future in futures]
+
+    async def _avector_searches(
+        self,
+        leg: _Leg,
+        queries: list[str],
+        kwargs: dict[str, Any],
+        depths: list[int | None],
+    ) -> list[list[Document] | None]:
+        """Async variant of :meth:`_vector_searches`."""
+        results: list[list[Document] | None]
+        if self.embedding_cache is None or not self.embedding_cache.batch_with_documents:
+            results = await asyncio.gather(
+                *(
+                    self._acollect(leg.name, self._arun_leg(leg, query, kwargs, depth), leg.timeout)
+                    for query, depth in zip(queries, depths, strict=True)
+                )
+            )
+            return results
+        start = time.monotonic()
+        vectors = await self._acollect(leg.name, self._aembed_queries(leg, queries), leg.timeout)
+        if vectors is None:
+            return [None] * len(queries)
+        remaining = (
+            None if leg.timeout is None else max(leg.timeout - (time.monotonic() - start), 0)
+        )
+        search = self.vector_store.asimilarity_search_by_vector
+
+        async def timed(vector: list[float], depth: int | None) -> list[Document]:
+            with deadline(leg.timeout), self._stage(leg.name):
+                docs: list[Document] = await search(
+                    vector, k=depth or self._vector_depth(), **kwargs
+                )
+                return docs
+
+        results = await asyncio.gather(
+            *(
+                self._acollect(leg.name, timed(vector, depth), remaining)
+                for vector, depth in zip(vectors, depths, strict=True)
+            )
+        )
+        return results
+
+    def _embed_queries(self, queries: list[str]) -> list[list[float]]:
+        assert self.embedding_cache is not None
+        with self._stage("embed"):
+            return self.embedding_cache.embed_queries(self.vector_store.embedding, queries)
+
+    async def _aembed_queries(self, leg: _Leg, queries: list[str]) -> list[list[float]]:
+        assert self.embedding_cache is not None
+        with deadline(leg.timeout), self._stage(leg.name), self._stage("embed"):
+            return await self.embedding_cache.aembed_queries(self.vector_store.embedding, queries)
+
+    def _embed_query(self, query: str) -> list[float]:
+        with self._stage("embed"):
+            if self.embedding_cache is None:
+                vector: list[float] = self.vector_store.embedding.embed_query(query)
+                return vector
+            return self.embedding_cache.embed_query(self.vector_store.embedding, query)
+
+    # -- Single statement ----------------------------------------------------
+
+    def single_statement_sql(self, plan: Any, where: MetadataFilter | None = None) -> str:
+        """Build the combined statement for a keyword ``plan``.
+
+        Rows are ``(LEG, RNK, SCORE, content, vector metadata, *keyword metadata)``; LEG is
+        0 for vector hits (ranked in RNK by distance, SCORE the similarity or distance)
+        and 1 for keyword candidates (RNK and SCORE NULL). Parameters are the query
+        vector followed by :meth:`single_statement_params`.
+        """
+        return f"{self._vector_leg_sql(where)} UNION ALL {self._keyword_leg_sql(plan, where)}"
+
+    def single_statement_params(self, plan: Any, where: MetadataFilter | None = None) -> list[Any]:
+        """Parameters after the query vector: vector-leg filter, then keyword leg."""
+        params: list[Any] = list(where.params) if where is not None else []
+        params.extend(self.keyword_retriever._candidate_params(plan, self._keyword_where(where)))
+        return params
+
+    def _keyword_where(self, where: MetadataFilter | None) -> MetadataFilter | None:
+        """The keyword leg's filter: ``where`` AND the keyword retriever's own, as in invoke."""
+        return MetadataFilter.coerce(self.keyword_retriever.filter, where)
+
+    def _vector_leg_sql(self, where: MetadataFilter | None) -> str:
+        store = self.vector_store
+        keyword = self.keyword_retriever
+        function, order = _distance_sql(store.distance_strategy)
+        vector_type = getattr(store, "vector_column_type", None) or "REAL_VECTOR"
+        content = f'"{_unquote(store.content_column)}"'
+        metadata = f'"{_unquote(store.metadata_column)}"'
+        extra = "".join(f", {column}" for column in keyword.metadata_columns)
+        filtered = f" WHERE {where.sql}" if where is not None else ""
+        return (
+            f"SELECT 0 AS LEG, ROW_NUMBER() OVER (ORDER BY SCORE {order}) AS RNK, SCORE, "
+            f"{content}, {metadata}{extra} FROM ("
+            f"SELECT {content}, {metadata}{extra}, "
+            f'{function}("{_unquote(store.vector_column)}", TO_{vector_type}(?)) AS SCORE '
+            f"FROM {keyword.table_name}{filtered} "
+            f"ORDER BY SCORE {order} LIMIT {int(self._vector_depth())}) V"
+        )
+
+    def _keyword_leg_sql(self, plan: Any, where: MetadataFilter | None) -> str:
+        keyword = self.keyword_retriever
+        extra = "".join(f", {column}" for column in keyword.metadata_columns)
+        return (
+            f"SELECT * FROM (SELECT 1 AS LEG, CAST(NULL AS INTEGER) AS RNK, "
+            f"CAST(NULL AS DOUBLE) AS SCORE, {keyword.content_column}, "
+            f"CAST(NULL AS NCLOB){extra} FROM {keyword.table_name} "
+            f"WHERE {keyword._where_sql(plan, self._keyword_where(where))}"
+            f"{keyword._order_sql(plan)} "
+            f"LIMIT {keyword._candidate_limit()}) K"
+        )
+
+    def _search_single(self, query: str, where: MetadataFilter | None) -> list[Document]:
+        keyword = self.keyword_retriever
+        keyword_where = self._keyword_where(where)
+        embedding = self._embed_query(query)
+        params: list[Any] = ["[" + ",".join(map(str, embedding)) + "]"]
+        params += where.params if where is not None else []
+
+        # Without keyword tokens only the vector leg runs, as in the two-leg mode
+        tokens = keyword.analyzer.query_tokens(query)
+        with keyword._degradable():
+            plan = keyword._plan(tokens) if tokens else None
+            if plan is None:
+                sql = self._vector_leg_sql(where)
+            else:
+                sql = self.single_statement_sql(plan, where)
+                params += keyword._candidate_params(plan, keyword_where)
+
+            with checkout(keyword.connection) as conn:
+                cursor = conn.cursor()
+                try:
+                    apply_deadline(cursor)
+                    with self._stage("sql"):
+                        cursor.execute(sql, params)
+                    with self._stage("fetch"):
+                        rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+            count_rows(rows)
+
+            vector_rows = sorted((row for row in rows if row[0] == 0), key=lambda row: row[1])
+            vector_results = [_vector_document(row[3], row[4]) for row in vector_rows]
+            if plan is None:
+                return self._fuse([vector_results, []])
+
+            candidates = [(row[3], *row[5:]) for row in rows if row[0] == 1]
+            if plan.strategy == "and" and len(candidates) < keyword.k:
+                # Same AND-to-OR fallback as the keyword retriever, at one extra round trip
+                plan = keyword._widen(plan)
+                candidates = keyword._fetch_candidates(plan, keyword_where)
+        with self._stage("analyze"):
+            corpus = [keyword.analyzer.counts(row[0]) for row in candidates]
+        terms = keyword.analyzer.query_terms(plan.terms)
+        with self._stage("score"):
+            ranked = keyword._rank(terms, candidates, corpus)
+        keyword_results = keyword._attach_plan(ranked, plan)
+        return self._fuse([vector_results, keyword_results])
+
+    def _fuse(self, ranked_lists: list[list[Document]]) -> list[Document]:
+        legs = self._legs()
+        with self._stage("fusion"):
+            return fuse(
+                ranked_lists,
+                k=self.k,
+                weights=[leg.weight for leg in legs],
+                method=self.fusion,
+                rrf_k=self.rrf_k,
+                normalization=self.normalization,
+                score_keys=[leg.score_key for leg in legs],
+                identity=self.id_key,
+                sources=[leg.name for leg in legs],
+            )
+
+    @staticmethod
+    def _collect(leg: str, future: Future[Any], timeout: float | None, start: float) -> Any | None:
+        remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0.0)
+        remaining = _within_deadline(remaining)
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            # Only stops a leg still queued; a running one is bounded by its own deadline
+            future.cancel()
+            logger.warning(
+                "%s leg timed out after %.3fs; continuing without it",
+                leg,
+                time.monotonic() - start,
+            )
+            return None
+
+    @staticmethod
+    async def _acollect(leg: str, awaitable: Awaitable[Any], timeout: float | None) -> Any | None:
+        timeout = _within_deadline(timeout)
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s leg timed out after %.3fs; continuing without it", leg, timeout)
+            return None
+
+
+def _within_deadline(timeout: float | None) -> float | None:
+    """Shorten a leg timeout to the time left before the request deadline."""
+    left = time_left()
+    if left is None:
+        return timeout
+    left = max(left, 0.0)
+    return left if timeout is None else min(timeout, left)
+
+
+async def _skipped() -> list[Document]:
+    return []
+
+
+def _unquote(name: str) -> str:
+    return name.strip('"')
+
+
+def _distance_sql(strategy: Any) -> tuple[str, str]:
+    """SQL function and sort direction for a HanaDB ``DistanceStrategy``."""
+    name = getattr(strategy, "name", str(strategy)).upper()
+    if name == "COSINE":
+        return "COSINE_SIMILARITY", "DESC"
+    if name in ("EUCLIDEAN_DISTANCE", "EUCLIDEAN", "L2"):
+        return "L2DISTANCE", "ASC"
+    raise ValueError(f"unsupported distance strategy for single_statement: {strategy!r}")
+
+
+def _vector_document(content: str, metadata: str | None) -> Document:
+    # HanaDB stores metadata as a JSON document
+    return Document(page_content=content, metadata=json.loads(metadata) if metadata else {})
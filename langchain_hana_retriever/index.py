@@ -0,0 +1,409 @@
+"""Persistent BM25 inverted index stored in SAP HANA side tables."""
+
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+from langchain_hana_retriever.admission import apply_deadline
+from langchain_hana_retriever.analysis import DEFAULT_ANALYZER, Analyzer
+from langchain_hana_retriever.filters import MetadataFilter
+from langchain_hana_retriever.pool import checkout
+from langchain_hana_retriever.scoring import _DEFAULT_DELTA, BM25Variant
+
+_IN_CHUNK = 500
+# Width of the TERM columns; longer terms are left out of the postings
+MAX_TERM_LENGTH = 256
+
+
+def _chunks(items: Sequence[Any], size: int = _IN_CHUNK) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _placeholders(n: int) -> str:
+    return ", ".join("?" for _ in range(n))
+
+
+class HANAPostingsIndex:
+    """BM25 postings and term statistics kept in side tables next to a content table.
+
+    Three tables are maintained, named after ``table_name`` unless overridden:
+
+    - ``<table>_BM25_POSTINGS`` (TERM, DOC_KEY, TF, DOC_LEN): one row per term per document.
+    - ``<table>_BM25_TERMS`` (TERM, DF): document frequency per term.
+    - ``<table>_BM25_META`` (DOC_COUNT, TOTAL_LENGTH): corpus size and total length.
+
+    BM25 is then computed by a single aggregated query over the postings of the query
+    terms, so no LOCATE scan over the content column is needed. Terms come from
+    ``analyzer``, which must match the retriever's. Terms longer than
+    ``MAX_TERM_LENGTH`` characters (e.g. base64 blobs) are not indexed, though they
+    still count toward document length. Documents left without postings are not
+    counted in the corpus statistics, since nothing could remove them again. ``k1``
+    and ``b`` are defaults for :meth:`search`; a retriever passes its own scoring
+    parameters.
+
+    Maintenance methods run in one transaction each, so an update never leaves
+    documents missing from the index; this needs a connection without autocommit.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        table_name: str,
+        id_column: str,
+        content_column: str = "VEC_TEXT",
+        index_prefix: str | None = None,
+        id_type: str = "NVARCHAR(255)",
+        k1: float = 1.5,
+        b: float = 0.75,
+        analyzer: Analyzer = DEFAULT_ANALYZER,
+    ) -> None:
+        prefix = index_prefix or table_name
+        self.connection = connection
+        self.table_name = table_name
+        self.id_column = id_column
+        self.content_column = content_column
+        self.id_type = id_type
+        self.k1 = float(k1)
+        self.b = float(b)
+        self.analyzer = analyzer
+        self.postings_table = f"{prefix}_BM25_POSTINGS"
+        self.terms_table = f"{prefix}_BM25_TERMS"
+        self.meta_table = f"{prefix}_BM25_META"
+
+    # -- DDL -----------------------------------------------------------------
+
+    def create(self) -> None:
+        """Create the side tables (without data)."""
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"CREATE TABLE {self.postings_table} ("
+                    f"TERM NVARCHAR({MAX_TERM_LENGTH}), DOC_KEY {self.id_type}, "
+                    f"TF INTEGER, DOC_LEN INTEGER)"
+                )
+                cursor.execute(
+                    f"CREATE INDEX {self.postings_table}_TERM_IDX ON {self.postings_table} (TERM)"
+                )
+                cursor.execute(
+                    f"CREATE INDEX {self.postings_table}_KEY_IDX ON {self.postings_table} (DOC_KEY)"
+                )
+                cursor.execute(
+                    f"CREATE TABLE {self.terms_table} "
+                    f"(TERM NVARCHAR({MAX_TERM_LENGTH}) PRIMARY KEY, DF INTEGER)"
+                )
+                cursor.execute(
+                    f"CREATE TABLE {self.meta_table} (DOC_COUNT BIGINT, TOTAL_LENGTH BIGINT)"
+                )
+                cursor.execute(f"INSERT INTO {self.meta_table} VALUES (0, 0)")
+            finally:
+                cursor.close()
+            conn.commit()
+
+    def drop(self) -> None:
+        """Drop the side tables."""
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                for table in (self.postings_table, self.terms_table, self.meta_table):
+                    cursor.execute(f"DROP TABLE {table}")
+            finally:
+                cursor.close()
+            conn.commit()
+
+    # -- Build and maintenance -----------------------------------------------
+
+    def build(self, batch_size: int = 1000) -> None:
+        """Rebuild the index from scratch by streaming the content table."""
+        with checkout(self.connection) as conn:
+            self._build(conn, batch_size)
+
+    def _build(self, conn: Any, batch_size: int) -> None:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DELETE FROM {self.postings_table}")
+            cursor.execute(f"DELETE FROM {self.terms_table}")
+            cursor.execute(f"UPDATE {self.meta_table} SET DOC_COUNT = 0, TOTAL_LENGTH = 0")
+        finally:
+            cursor.close()
+
+        doc_freqs: Counter[str] = Counter()
+        doc_count = 0
+        total_length = 0
+
+        read_cursor = conn.cursor()
+        write_cursor = conn.cursor()
+        try:
+            read_cursor.execute(
+                f"SELECT {self.id_column}, {self.content_column} FROM {self.table_name}"
+            )
+            while True:
+                rows = read_cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                postings: list[tuple[str, Any, int, int]] = []
+                for key, text in rows:
+                    counts, doc_len = self._counts(key, text)
+                    if not counts:
+                        continue
+                    doc_count += 1
+                    total_length += doc_len
+                    doc_freqs.update(counts.keys())
+                    postings.extend((term, key, tf, doc_len) for term, tf in counts.items())
+                if postings:
+                    write_cursor.executemany(
+                        f"INSERT INTO {self.postings_table} VALUES (?, ?, ?, ?)", postings
+                    )
+
+            terms = list(doc_freqs.items())
+            for chunk in _chunks(terms, batch_size):
+                write_cursor.executemany(f"INSERT INTO {self.terms_table} VALUES (?, ?)", chunk)
+            write_cursor.execute(
+                f"UPDATE {self.meta_table} SET DOC_COUNT = ?, TOTAL_LENGTH = ?",
+                [doc_count, total_length],
+            )
+        finally:
+            read_cursor.close()
+            write_cursor.close()
+        conn.commit()
+
+    def _counts(self, key: Any, text: str | None) -> tuple[dict[str, int], int]:
+        """Indexable term counts of one document, and its length over all terms."""
+        counts = self.analyzer.counts(text, key=key)
+        doc_len = sum(counts.values())
+        return {t: tf for t, tf in counts.items() if len(t) <= MAX_TERM_LENGTH}, doc_len
+
+    def add_documents(self, documents: Iterable[tuple[Any, str | None]]) -> None:
+        """Index new documents given as ``(key, text)`` pairs."""
+        documents = list(documents)
+        if not documents:
+            return
+        with checkout(self.connection) as conn, _transaction(conn):
+            self._add(conn, documents)
+
+    def _add(self, conn: Any, documents: list[tuple[Any, str | None]]) -> None:
+        if not documents:
+            return
+        postings: list[tuple[str, Any, int, int]] = []
+        doc_freqs: Counter[str] = Counter()
+        doc_count = 0
+        total_length = 0
+        for key, text in documents:
+            counts, doc_len = self._counts(key, text)
+            if not counts:
+                continue
+            doc_count += 1
+            total_length += doc_len
+            doc_freqs.update(counts.keys())
+            postings.extend((term, key, tf, doc_len) for term, tf in counts.items())
+        cursor = conn.cursor()
+        try:
+            if postings:
+                cursor.executemany(
+                    f"INSERT INTO {self.postings_table} VALUES (?, ?, ?, ?)", postings
+                )
+            self._apply_df_deltas(cursor, doc_freqs)
+            cursor.execute(
+                f"UPDATE {self.meta_table} SET DOC_COUNT = DOC_COUNT + ?, "
+                f"TOTAL_LENGTH = TOTAL_LENGTH + ?",
+                [doc_count, total_length],
+            )
+        finally:
+            cursor.close()
+
+    def delete_documents(self, keys: Iterable[Any]) -> None:
+        """Remove documents from the index by key."""
+        keys = list(keys)
+        if not keys:
+            return
+        with checkout(self.connection) as conn, _transaction(conn):
+            self._delete(conn, keys)
+
+    def _delete(self, conn: Any, keys: list[Any]) -> None:
+        doc_freqs: Counter[str] = Counter()
+        doc_lengths: dict[Any, int] = {}
+        cursor = conn.cursor()
+        try:
+            for chunk in _chunks(keys):
+                cursor.execute(
+                    f"SELECT DOC_KEY, TERM, DOC_LEN FROM {self.postings_table} "
+                    f"WHERE DOC_KEY IN ({_placeholders(len(chunk))})",
+                    list(chunk),
+                )
+                for key, term, doc_len in cursor.fetchall():
+                    doc_freqs[term] -= 1
+                    doc_lengths[key] = doc_len
+            if not doc_lengths:
+                return
+
+            for chunk in _chunks(keys):
+                cursor.execute(
+                    f"DELETE FROM {self.postings_table} "
+                    f"WHERE DOC_KEY IN ({_placeholders(len(chunk))})",
+                    list(chunk),
+                )
+            self._apply_df_deltas(cursor, doc_freqs)
+            cursor.execute(f"DELETE FROM {self.terms_table} WHERE DF <= 0")
+            cursor.execute(
+                f"UPDATE {self.meta_table} SET DOC_COUNT = DOC_COUNT - ?, "
+                f"TOTAL_LENGTH = TOTAL_LENGTH - ?",
+                [len(doc_lengths), sum(doc_lengths.values())],
+            )
+        finally:
+            cursor.close()
+
+    def update_documents(self, documents: Iterable[tuple[Any, str | None]]) -> None:
+        """Re-index changed documents given as ``(key, text)`` pairs."""
+        documents = list(documents)
+        if not documents:
+            return
+        with checkout(self.connection) as conn, _transaction(conn):
+            self._delete(conn, [key for key, _ in documents])
+            self._add(conn, documents)
+
+    def sync_documents(self, keys: Iterable[Any]) -> None:
+        """Bring the index in line with the content table for the given keys.
+
+        Rows that still exist are re-indexed (covering inserts and updates); keys that
+        no longer exist in the content table are removed from the index.
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        found: list[tuple[Any, str | None]] = []
+        with checkout(self.connection) as conn, _transaction(conn):
+            cursor = conn.cursor()
+            try:
+                for chunk in _chunks(keys):
+                    cursor.execute(
+                        f"SELECT {self.id_column}, {self.content_column} "
+                        f"FROM {self.table_name} "
+                        f"WHERE {self.id_column} IN ({_placeholders(len(chunk))})",
+                        list(chunk),
+                    )
+                    found.extend(cursor.fetchall())
+            finally:
+                cursor.close()
+            self._delete(conn, keys)
+            self._add(conn, found)
+
+    def _apply_df_deltas(self, cursor: Any, deltas: Counter[str]) -> None:
+        terms = [term for term, delta in deltas.items() if delta]
+        existing: set[str] = set()
+        for chunk in _chunks(terms):
+            cursor.execute(
+                f"SELECT TERM FROM {self.terms_table} WHERE TERM IN ({_placeholders(len(chunk))})",
+                list(chunk),
+            )
+            existing.update(row[0] for row in cursor.fetchall())
+        updates = [(deltas[term], term) for term in terms if term in existing]
+        inserts = [(term, deltas[term]) for term in terms if term not in existing]
+        if updates:
+            cursor.executemany(f"UPDATE {self.terms_table} SET DF = DF + ? WHERE TERM = ?", updates)
+        if inserts:
+            cursor.executemany(f"INSERT INTO {self.terms_table} VALUES (?, ?)", inserts)
+
+    # -- Query ---------------------------------------------------------------
+
+    def search_sql(
+        self,
+        n_terms: int,
+        columns: list[str],
+        k: int,
+        where: MetadataFilter | None = None,
+        k1: float | None = None,
+        b: float | None = None,
+        variant: BM25Variant = "okapi",
+        delta: float | None = None,
+    ) -> str:
+        """Build the aggregated BM25 query for ``n_terms`` query terms.
+
+        The statement scores documents over the postings of the query terms, keeps the
+        top ``k`` and joins them back to the content table to return ``columns`` plus
+        the score as the last column. With ``where``, only documents whose row matches
+        the filter are scored, so the top ``k`` is taken among them. ``k1``, ``b``,
+        ``variant`` and ``delta`` follow :class:`BM25Scorer` with corpus-wide IDF;
+        ``k1`` and ``b`` default to the index's own.
+        """
+        if variant not in _DEFAULT_DELTA:
+            raise ValueError(f"unknown BM25 variant: {variant!r}")
+        k1 = float(self.k1 if k1 is None else k1)
+        b = float(self.b if b is None else b)
+        delta = float(_DEFAULT_DELTA[variant] if delta is None else delta)
+        idf = "LN(1 + (m.DOC_COUNT - t.DF + 0.5) / (t.DF + 0.5))"
+        length_norm = (
+            f"(1 - {b} + {b} * COALESCE("
+            f"CAST(p.DOC_LEN AS DOUBLE) * m.DOC_COUNT / NULLIF(m.TOTAL_LENGTH, 0), 1))"
+        )
+        if variant == "okapi":
+            tf_score = f"p.TF * ({k1} + 1) / (p.TF + {k1} * {length_norm})"
+        elif variant == "plus":
+            tf_score = f"({delta} + p.TF * ({k1} + 1) / (p.TF + {k1} * {length_norm}))"
+        else:
+            ctd = f"(p.TF / {length_norm})"
+            tf_score = f"({k1} + 1) * ({ctd} + {delta}) / ({k1} + {ctd} + {delta})"
+        term_score = f"{idf} * {tf_score}"
+        col_list = ", ".join(f"c.{col}" for col in columns)
+        restrict = ""
+        if where is not None:
+            restrict = (
+                f" AND p.DOC_KEY IN (SELECT {self.id_column} FROM {self.table_name} "
+                f"WHERE {where.sql})"
+            )
+        return (
+            f"SELECT {col_list}, s.SCORE FROM ("
+            f"SELECT p.DOC_KEY, SUM({term_score}) AS SCORE "
+            f"FROM {self.postings_table} p "
+            f"JOIN {self.terms_table} t ON t.TERM = p.TERM "
+            f"CROSS JOIN {self.meta_table} m "
+            f"WHERE p.TERM IN ({_placeholders(n_terms)}){restrict} "
+            f"GROUP BY p.DOC_KEY "
+            f"ORDER BY SCORE DESC "
+            f"LIMIT {int(k)}"
+            f") s JOIN {self.table_name} c ON c.{self.id_column} = s.DOC_KEY "
+            f"ORDER BY s.SCORE DESC"
+        )
+
+    def search(
+        self,
+        tokens: list[str],
+        columns: list[str],
+        k: int,
+        where: MetadataFilter | None = None,
+        k1: float | None = None,
+        b: float | None = None,
+        variant: BM25Variant = "okapi",
+        delta: float | None = None,
+    ) -> list[tuple[Any, ...]]:
+        """Return the top ``k`` rows for ``tokens`` as ``(*columns, score)`` tuples.
+
+        Scoring parameters are as in :meth:`search_sql`.
+        """
+        tokens = [token for token in tokens if len(token) <= MAX_TERM_LENGTH]
+        if not tokens:
+            return []
+        params = list(tokens) + (where.params if where is not None else [])
+        sql = self.search_sql(len(tokens), columns, k, where, k1, b, variant, delta)
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                apply_deadline(cursor)
+                cursor.execute(sql, params)
+                return list(cursor.fetchall())
+            finally:
+                cursor.close()
+
+
+@contextmanager
+def _transaction(conn: Any) -> Iterator[None]:
+    """Commit the enclosed statements together, or roll them back on failure."""
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
@@ -0,0 +1,286 @@
+"""Per-stage latency instrumentation: query profiles, span hooks and percentiles."""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from langchain_core.documents import Document
+
+PROFILE_EVENT = "hana_retriever_profile"
+
+SpanHook = Callable[[str, dict[str, Any]], AbstractContextManager[Any]]
+
+# The innermost open profile and the stages open in it, per thread or task. Copied
+# contexts (asyncio tasks, run_blocking) share the profile of their parent.
+_profile: ContextVar[QueryProfile | None] = ContextVar("hana_retriever_profile", default=None)
+_open_stages: ContextVar[frozenset[str]] = ContextVar(
+    "hana_retriever_open_stages", default=frozenset()
+)
+
+
+@dataclass(frozen=True)
+class StageStats:
+    """Latency of one stage over the recent sample window, in seconds."""
+
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+@dataclass
+class QueryProfile:
+    """Stage timings (seconds) and counters of one query or batch.
+
+    A stage entered several times (chunks, batch members, concurrent legs) is summed,
+    so stage times can add up to more than the wall-clock ``total``.
+    """
+
+    name: str
+    timings: dict[str, float] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+    total: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def add_count(self, name: str, n: int) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> dict[str, Any]:
+        """JSON-friendly breakdown in milliseconds, as attached to metadata and events."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "total_ms": round(self.total * 1000, 3),
+                "stages_ms": {stage: round(t * 1000, 3) for stage, t in self.timings.items()},
+                "counters": dict(self.counters),
+            }
+
+
+class Instrumentation:
+    """Collects per-stage timings and counters of retriever queries.
+
+    Each query (or batch) runs inside a :meth:`profile`; code paths mark stages such
+    as ``sql``, ``fetch``, ``analyze`` and ``score`` with :meth:`stage` and report
+    fetched rows and bytes and scored candidates through :func:`count`. Closed
+    profiles feed a sliding window of samples per stage (and per profile name for the
+    total), from which :meth:`stats` reports p50/p95/p99. A stage re-entered in the
+    same flow (e.g. scoring wrapped by a caller that also times scoring) is counted
+    once.
+
+    ``span_hook`` is called as ``span_hook(name, attributes)`` for each profile and
+    stage and must return a context manager, which makes it a drop-in for
+    OpenTelemetry's ``tracer.start_as_current_span``. When the object it yields has
+    ``set_attribute``, the profile's counters and total are set on it before it ends.
+
+    One instance may be shared by several retrievers; stages are charged to the
+    innermost open profile.
+
+    Args:
+        span_hook: Optional tracing hook, see above.
+        window: Number of recent samples kept per stage for percentiles.
+    """
+
+    def __init__(self, span_hook: SpanHook | None = None, window: int = 1024) -> None:
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.span_hook = span_hook
+        self.window = window
+
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque[float]] = {}
+        self._counters: dict[str, int] = {}
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[QueryProfile]:
+        """Open a profile for one query or batch; it becomes the target of stages."""
+        profile = QueryProfile(name)
+        token = _profile.set(profile)
+        stages_token = _open_stages.set(frozenset())
+        start = time.perf_counter()
+        try:
+            with self._span(name) as span:
+                try:
+                    yield profile
+                finally:
+                    profile.total = time.perf_counter() - start
+                    if hasattr(span, "set_attribute"):
+                        span.set_attribute("total_ms", profile.total * 1000)
+                        for counter, value in profile.counters.items():
+                            span.set_attribute(counter, value)
+        finally:
+            _open_stages.reset(stages_token)
+            _profile.reset(token)
+            self._record(profile)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage into the open profile, or on its own outside any profile."""
+        open_stages = _open_stages.get()
+        if name in open_stages:
+            yield
+            return
+        token = _open_stages.set(open_stages | {name})
+        profile = _profile.get()
+        start = time.perf_counter()
+        try:
+            with self._span(name if profile is None else f"{profile.name}.{name}"):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            _open_stages.reset(token)
+            if profile is not None:
+                profile.add_time(name, elapsed)
+            else:
+                self._observe({name: elapsed}, {})
+
+    def stats(self) -> dict[str, StageStats]:
+        """Latency percentiles per stage (and per profile name for totals)."""
+        with self._lock:
+            windows = {name: sorted(samples) for name, samples in self._samples.items()}
+        return {
+            name: StageStats(
+                count=len(samples),
+                mean=sum(samples) / len(samples),
+                p50=_percentile(samples, 50),
+                p95=_percentile(samples, 95),
+                p99=_percentile(samples, 99),
+                max=samples[-1],
+            )
+            for name, samples in windows.items()
+            if samples
+        }
+
+    def counters(self) -> dict[str, int]:
+        """Cumulative counters (rows, bytes, candidates...) over all profiles."""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        """Drop all samples and counters."""
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+
+    def _span(self, name: str) -> AbstractContextManager[Any]:
+        if self.span_hook is None:
+            return nullcontext()
+        return self.span_hook(name, {"component": "langchain_hana_retriever"})
+
+    def _record(self, profile: QueryProfile) -> None:
+        with profile._lock:
+            timings = {**profile.timings, profile.name: profile.total}
+            counters = dict(profile.counters)
+        self._observe(timings, counters)
+
+    def _observe(self, timings: dict[str, float], counters: dict[str, int]) -> None:
+        with self._lock:
+            for name, seconds in timings.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                samples.append(seconds)
+            for name, value in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+
+def stage(instrumentation: Instrumentation | None, name: str) -> AbstractContextManager[Any]:
+    """:meth:`Instrumentation.stage`, or a no-op without instrumentation."""
+    return nullcontext() if instrumentation is None else instrumentation.stage(name)
+
+
+def profile(
+    instrumentation: Instrumentation | None, name: str
+) -> AbstractContextManager[QueryProfile | None]:
+    """:meth:`Instrumentation.profile`, or a no-op yielding ``None`` without instrumentation."""
+    return nullcontext() if instrumentation is None else instrumentation.profile(name)
+
+
+def active() -> bool:
+    """Whether a profile is open, i.e. counters are being collected."""
+    return _profile.get() is not None
+
+
+def count(name: str, n: int) -> None:
+    """Add ``n`` to a counter of the open profile; a no-op outside one."""
+    current = _profile.get()
+    if current is not None:
+        current.add_count(name, n)
+
+
+def count_rows(rows: Sequence[Sequence[Any]]) -> None:
+    """Count fetched rows and the UTF-8 bytes of their text and binary values."""
+    current = _profile.get()
+    if current is None:
+        return
+    size = 0
+    for row in rows:
+        for value in row:
+            if isinstance(value, str):
+                size += len(value.encode("utf-8"))
+            elif isinstance(value, (bytes, bytearray, memoryview)):
+                size += len(value)
+    current.add_count("rows", len(rows))
+    current.add_count("bytes", size)
+
+
+def publish(
+    record: QueryProfile | None,
+    results: list[list[Document]],
+    run_managers: Sequence[Any],
+    attach: bool,
+) -> None:
+    """Send a closed profile to LangChain callbacks and optionally into result metadata.
+
+    Callback handlers receive it through ``on_custom_event`` as :data:`PROFILE_EVENT`.
+    """
+    if record is None:
+        return
+    data = record.to_dict()
+    for run_manager in run_managers:
+        run_manager.get_child().on_custom_event(PROFILE_EVENT, data, run_id=run_manager.run_id)
+    if attach:
+        _attach(data, results)
+
+
+async def apublish(
+    record: QueryProfile | None,
+    results: list[list[Document]],
+    run_managers: Sequence[Any],
+    attach: bool,
+) -> None:
+    """Async variant of :func:`publish`."""
+    if record is None:
+        return
+    data = record.to_dict()
+    for run_manager in run_managers:
+        await run_manager.get_child().on_custom_event(
+            PROFILE_EVENT, data, run_id=run_manager.run_id
+        )
+    if attach:
+        _attach(data, results)
+
+
+def _attach(data: dict[str, Any], results: list[list[Document]]) -> None:
+    for docs in results:
+        for doc in docs:
+            doc.metadata["timings"] = data
+
+
+def _percentile(ordered: list[float], percent: float) -> float:
+    # Nearest-rank percentile of an ascending list
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
@@ -0,0 +1,130 @@
+"""Selectivity-aware planning of the LOCATE candidate query."""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from typing import Any, Literal
+
+from langchain_hana_retriever.analysis import ENGLISH_STOPWORDS, SPANISH_STOPWORDS
+from langchain_hana_retriever.stats import CorpusStats
+
+DEFAULT_STOPWORDS: frozenset[str] = ENGLISH_STOPWORDS | SPANISH_STOPWORDS
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Terms and strategy chosen for the candidate SQL.
+
+    Attributes:
+        terms: Terms sent to SQL, most selective first.
+        dropped: Query terms left out (stopwords, too frequent or over the limit).
+        strategy: ``"or"`` matches any term; ``"and"`` requires all terms.
+        order_by_matches: Whether SQL orders candidates by number of matched terms
+            before applying LIMIT.
+        estimated_matches: Estimated row count matching all terms, if known.
+        narrowing: Trigram condition and its parameters, computed once per plan by
+            the retriever so the candidate SQL and its parameters always agree.
+    """
+
+    terms: list[str]
+    dropped: list[str]
+    strategy: Literal["or", "and"] = "or"
+    order_by_matches: bool = False
+    estimated_matches: float | None = None
+    narrowing: tuple[str, list[Any]] | None = field(default=None, compare=False, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        plan = asdict(self)
+        del plan["narrowing"]
+        return plan
+
+
+class QueryPlanner:
+    """Chooses which query terms to send to SQL and how to combine them.
+
+    With corpus statistics, terms are ranked by document frequency (rarest first),
+    stopwords and terms occurring in more than ``max_df_ratio`` of the documents are
+    dropped, and the AND of all terms is used when its estimated size (assuming term
+    independence) is at least ``and_min_matches`` (default: the candidate limit).
+    Without statistics, term length is used as a proxy for selectivity.
+
+    Args:
+        max_terms: Maximum number of terms sent to SQL.
+        max_df_ratio: Drop terms present in a larger fraction of documents.
+        stopwords: Terms never sent to SQL.
+        order_by_matches: Order candidates by matched-term count before LIMIT.
+        and_min_matches: Minimum estimated AND-set size to use the AND strategy.
+    """
+
+    def __init__(
+        self,
+        max_terms: int = 5,
+        max_df_ratio: float = 0.5,
+        stopwords: frozenset[str] = DEFAULT_STOPWORDS,
+        order_by_matches: bool = True,
+        and_min_matches: int | None = None,
+    ) -> None:
+        self.max_terms = max_terms
+        self.max_df_ratio = max_df_ratio
+        self.stopwords = stopwords
+        self.order_by_matches = order_by_matches
+        self.and_min_matches = and_min_matches
+
+    def plan(
+        self,
+        tokens: list[str],
+        candidate_limit: int,
+        stats: CorpusStats | None = None,
+        normalize: Callable[[str], str] | None = None,
+    ) -> QueryPlan:
+        """Plan the candidate query for the (deduplicated) query ``tokens``.
+
+        ``normalize`` maps a token to the term under which ``stats`` counts it (the
+        analyzer's stemming and accent folding).
+        """
+        kept = [t for t in tokens if t not in self.stopwords]
+        dropped = [t for t in tokens if t in self.stopwords]
+        has_stats = stats is not None and stats.doc_count > 0
+
+        def df(token: str) -> int:
+            assert stats is not None
+            return stats.doc_freqs.get(normalize(token) if normalize else token, 0)
+
+        if has_stats:
+            assert stats is not None
+            n = stats.doc_count
+            frequent = [t for t in kept if df(t) / n > self.max_df_ratio]
+            kept = [t for t in kept if t not in frequent]
+            dropped += frequent
+            kept.sort(key=df)
+        else:
+            kept.sort(key=len, reverse=True)
+
+        if not kept:
+            # Never plan an empty query: fall back to the most selective dropped term
+            fallback = min(tokens, key=df) if has_stats else max(tokens, key=len)
+            kept = [fallback]
+            dropped.remove(fallback)
+
+        dropped += kept[self.max_terms :]
+        terms = kept[: self.max_terms]
+
+        strategy: Literal["or", "and"] = "or"
+        estimated = None
+        if has_stats and len(terms) > 1:
+            assert stats is not None
+            n = stats.doc_count
+            estimated = n * math.prod(df(t) / n for t in terms)
+            threshold = self.and_min_matches or candidate_limit
+            if estimated >= threshold:
+                strategy = "and"
+
+        return QueryPlan(
+            terms=terms,
+            dropped=dropped,
+            strategy=strategy,
+            order_by_matches=self.order_by_matches and strategy == "or" and len(terms) > 1,
+            estimated_matches=estimated,
+        )
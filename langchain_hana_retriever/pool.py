@@ -0,0 +1,237 @@
+"""Thread-safe connection pool for hdbcli connections."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+@dataclass(frozen=True)
+class PoolMetrics:
+    """Point-in-time snapshot of pool usage."""
+
+    size: int
+    in_use: int
+    idle: int
+    checkouts: int
+    waits: int
+    wait_time: float
+    timeouts: int
+    reconnects: int
+
+
+class HANAConnectionPool:
+    """Bounded pool of DB-API connections shared across threads.
+
+    Accepted anywhere a ``connection`` is: retrievers and index builders check out a
+    connection per operation and return it afterwards. Idle connections are validated
+    before reuse once they have been idle longer than ``health_check_interval``, and
+    connections that fail the check are replaced.
+
+    Args:
+        factory: Zero-argument callable returning a new connection.
+        min_size: Connections opened eagerly when the pool is created.
+        max_size: Upper bound on open connections.
+        checkout_timeout: Default seconds to wait for a free connection.
+        health_check_sql: Statement used to validate a connection.
+        health_check_interval: Idle seconds after which a connection is validated.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        checkout_timeout: float = 30.0,
+        health_check_sql: str = "SELECT 1 FROM DUMMY",
+        health_check_interval: float = 30.0,
+    ) -> None:
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("require 0 <= min_size <= max_size and max_size >= 1")
+        self.factory = factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_sql = health_check_sql
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle: list[tuple[Any, float]] = []
+        self._size = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._closed = False
+
+        for _ in range(min_size):
+            self._idle.append((factory(), time.monotonic()))
+            self._size += 1
+
+    @classmethod
+    def from_params(cls, **kwargs: Any) -> HANAConnectionPool:
+        """Create a pool of ``hdbcli.dbapi.connect`` connections.
+
+        Pool options (``min_size``, ``max_size``, ...) are taken from ``kwargs``; the
+        remaining keyword arguments are passed to ``hdbcli.dbapi.connect``.
+        """
+        import hdbcli.dbapi
+
+        pool_options = {
+            name: kwargs.pop(name)
+            for name in (
+                "min_size",
+                "max_size",
+                "checkout_timeout",
+                "health_check_sql",
+                "health_check_interval",
+            )
+            if name in kwargs
+        }
+        return cls(lambda: hdbcli.dbapi.connect(**kwargs), **pool_options)
+
+    def acquire(self, timeout: float | None = None) -> Any:
+        """Check out a connection, waiting up to ``timeout`` seconds for one to free up."""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        conn: Any = None
+        idle_since = 0.0
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("connection pool is closed")
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeoutError(
+                        f"no connection available within {timeout:.3f}s "
+                        f"({self._in_use}/{self.max_size} in use)"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self._waits += 1
+                self._wait_time += time.monotonic() - start
+            self._in_use += 1
+            self._checkouts += 1
+
+        try:
+            if conn is None:
+                conn = self.factory()
+            elif time.monotonic() - idle_since > self.health_check_interval and not (
+                self._is_healthy(conn)
+            ):
+                self._close_quietly(conn)
+                conn = self.factory()
+                with self._cond:
+                    self._reconnects += 1
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """Return a connection to the pool, or close it when ``discard`` is set."""
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout: float | None = None) -> Iterator[Any]:
+        """Check out a connection for the duration of a ``with`` block.
+
+        If the block raises, the connection is validated and discarded when unhealthy.
+        """
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=not self._is_healthy(conn))
+            raise
+        else:
+            self.release(conn)
+
+    def metrics(self) -> PoolMetrics:
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            return PoolMetrics(
+                size=self._size,
+                in_use=self._in_use,
+                idle=len(self._idle),
+                checkouts=self._checkouts,
+                waits=self._waits,
+                wait_time=self._wait_time,
+                timeouts=self._timeouts,
+                reconnects=self._reconnects,
+            )
+
+    def close(self) -> None:
+        """Close idle connections; checked-out connections are closed on release."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn: Any) -> bool:
+        try:
+            is_connected = getattr(conn, "isconnected", None)
+            if is_connected is not None and not is_connected():
+                return False
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self.health_check_sql)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _close_quietly(conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+@contextmanager
+def checkout(connection: Any) -> Iterator[Any]:
+    """Yield a DB-API connection from either a pool or a plain connection."""
+    if isinstance(connection, HANAConnectionPool):
+        with connection.connection() as conn:
+            yield conn
+    else:
+        yield connection
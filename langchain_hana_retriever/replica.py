@@ -0,0 +1,687 @@
+"""In-process BM25 inverted index replicated from a SAP HANA table."""
+
+from __future__ import annotations
+
+import logging
+import math
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Callable, Hashable, Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from langchain_hana_retriever.analysis import DEFAULT_ANALYZER, Analyzer
+from langchain_hana_retriever.index import _chunks, _placeholders
+from langchain_hana_retriever.instrumentation import count
+from langchain_hana_retriever.pool import checkout
+from langchain_hana_retriever.scoring import (
+    TermPostings,
+    bm25_term_scores,
+    bm25_upper_bound,
+    maxscore_top_k,
+    top_k,
+)
+from langchain_hana_retriever.snapshot import write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Compact once tombstoned documents exceed this fraction of all document slots
+_COMPACT_RATIO = 0.25
+
+
+@dataclass(frozen=True)
+class ReplicaMetrics:
+    """Point-in-time snapshot of replica size and freshness.
+
+    ``sync_lag`` is the number of seconds since the last successful load or sync,
+    ``None`` before the first load completes. ``memory_bytes`` covers the postings and
+    document arrays plus keys, row payloads and the term dictionary, the latter three
+    estimated with ``sys.getsizeof``.
+    """
+
+    ready: bool
+    documents: int
+    terms: int
+    postings: int
+    memory_bytes: int
+    watermark: Any
+    sync_lag: float | None
+    syncs: int
+    sync_errors: int
+
+
+@dataclass
+class ReplicaPartition:
+    """Rows of one key range indexed on their own, ready to merge into a replica.
+
+    Created by :meth:`LocalIndexReplica.partition` and merged, in order, by
+    :meth:`LocalIndexReplica.load_partitions`. Document ids in ``postings`` are
+    positions in ``keys``, ``rows`` and ``doc_len``.
+    """
+
+    keys: list[Any]
+    rows: list[tuple[Any, ...]]
+    doc_len: array[int]
+    postings: dict[str, tuple[array[int], array[int]]]
+    watermark: Any
+
+
+@dataclass(frozen=True)
+class _DocumentView:
+    """Copies of per-document state that queries score against outside the lock."""
+
+    doc_len: np.ndarray
+    alive: np.ndarray | None
+    rows: tuple[tuple[Any, ...] | None, ...]
+    doc_count: int
+    avgdl: float
+
+
+class LocalIndexReplica:
+    """Compact in-memory BM25 index over a HANA table, kept current with delta syncs.
+
+    The table is streamed once with ``fetchmany`` into array-backed postings keyed by
+    integer term ids, with per-document lengths and the row payload needed to build
+    documents (content followed by ``metadata_columns``). Queries are then answered
+    entirely in-process with Okapi BM25 over corpus-wide statistics. Queries copy what
+    they need under the lock and score outside it, so syncs do not wait for them; the
+    per-document copies are shared by all queries until the next change.
+
+    When ``timestamp_column`` is set, :meth:`sync` fetches rows changed since the
+    highest timestamp seen and re-indexes them; :meth:`start` runs the initial load and
+    periodic syncs on a daemon thread. Timestamps cannot reveal deleted rows, so
+    call :meth:`delete_documents` or the full key scan :meth:`reconcile` for those.
+
+    Args:
+        connection: HANA connection or :class:`HANAConnectionPool`.
+        table_name: Table to replicate.
+        id_column: Primary key column.
+        content_column: Column containing document text.
+        metadata_columns: Additional columns kept for document metadata.
+        timestamp_column: Change timestamp column used for delta sync.
+        k1: BM25 term frequency saturation (default for :meth:`search`).
+        b: BM25 length normalization (default for :meth:`search`).
+        batch_size: Rows per ``fetchmany`` call.
+        analyzer: Text analysis, matching the retriever's.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        table_name: str,
+        id_column: str,
+        content_column: str = "VEC_TEXT",
+        metadata_columns: Iterable[str] = (),
+        timestamp_column: str | None = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        batch_size: int = 1000,
+        analyzer: Analyzer = DEFAULT_ANALYZER,
+    ) -> None:
+        self.connection = connection
+        self.table_name = table_name
+        self.id_column = id_column
+        self.content_column = content_column
+        self.metadata_columns = list(metadata_columns)
+        self.timestamp_column = timestamp_column
+        self.k1 = k1
+        self.b = b
+        self.batch_size = batch_size
+        self.analyzer = analyzer
+
+        self._lock = threading.RLock()
+        self._ready = False
+        self._reset()
+        self._watermark: Any = None
+        self._synced_at: float | None = None
+        self._syncs = 0
+        self._sync_errors = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _reset(self) -> None:
+        self._term_ids: dict[str, int] = {}
+        self._postings: list[tuple[array[int], array[int]]] = []
+        # Per-term highest frequency and shortest document, for pruning bounds
+        self._max_tf: list[int] = []
+        self._min_len: list[int] = []
+        self._doc_len: array[int] = array("i")
+        self._alive = bytearray()
+        self._keys: list[Any] = []
+        self._rows: list[tuple[Any, ...] | None] = []
+        self._key_to_doc: dict[Any, int] = {}
+        self._doc_count = 0
+        self._total_length = 0
+        self._dead = 0
+        # Keys, row payloads and terms, as estimated by sys.getsizeof
+        self._object_bytes = 0
+        self._view: _DocumentView | None = None
+
+    # -- Loading and sync ----------------------------------------------------
+
+    @property
+    def ready(self) -> bool:
+        """Whether the initial load has completed."""
+        return self._ready
+
+    def _select_sql(self) -> str:
+        columns = [self.id_column]
+        if self.timestamp_column:
+            columns.append(self.timestamp_column)
+        columns += [self.content_column, *self.metadata_columns]
+        return f"SELECT {', '.join(columns)} FROM {self.table_name}"
+
+    def load(self) -> None:
+        """Stream the whole table and replace the index contents."""
+        started = time.monotonic()
+        with self._lock:
+            self._reset()
+            watermark = None
+            with checkout(self.connection) as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(self._select_sql())
+                    while True:
+                        rows = cursor.fetchmany(self.batch_size)
+                        if not rows:
+                            break
+                        watermark, _ = self._apply_rows(rows, watermark)
+                finally:
+                    cursor.close()
+            self._mark_loaded(watermark)
+        logger.info(
+            "replicated %d documents from %s in %.2fs",
+            self._doc_count,
+            self.table_name,
+            time.monotonic() - started,
+        )
+
+    def partition(
+        self, rows: Sequence[tuple[Any, ...]], counts: Sequence[Mapping[str, int]] | None = None
+    ) -> ReplicaPartition:
+        """Index rows in ``_select_sql`` column order on their own, leaving the replica as is.
+
+        ``counts`` are the rows' term counts when already computed (e.g. in worker
+        processes). Safe to call from several threads at once.
+        """
+        offset = 2 if self.timestamp_column else 1
+        part = ReplicaPartition(keys=[], rows=[], doc_len=array("i"), postings={}, watermark=None)
+        for doc, row in enumerate(rows):
+            payload = tuple(row[offset:])
+            if self.timestamp_column:
+                ts = row[1]
+                if ts is not None and (part.watermark is None or ts > part.watermark):
+                    part.watermark = ts
+            doc_counts = (
+                counts[doc] if counts is not None else self.analyzer.counts(payload[0], key=row[0])
+            )
+            for term, tf in doc_counts.items():
+                postings = part.postings.get(term)
+                if postings is None:
+                    postings = part.postings[term] = (array("i"), array("i"))
+                postings[0].append(doc)
+                postings[1].append(tf)
+            part.keys.append(row[0])
+            part.rows.append(payload)
+            part.doc_len.append(sum(doc_counts.values()))
+        return part
+
+    def load_partitions(self, partitions: Iterable[ReplicaPartition]) -> None:
+        """Replace the index contents with ``partitions``, appended in iteration order.
+
+        Postings are concatenated per term, so no row is analyzed again; each partition
+        can be dropped once merged. A key that occurs again replaces its earlier row.
+        """
+        with self._lock:
+            self._reset()
+            watermark = None
+            for part in partitions:
+                self._merge_partition(part)
+                if part.watermark is not None and (watermark is None or part.watermark > watermark):
+                    watermark = part.watermark
+            self._mark_loaded(watermark)
+
+    def _merge_partition(self, part: ReplicaPartition) -> None:
+        for key in part.keys:
+            old = self._key_to_doc.get(key)
+            if old is not None:
+                self._tombstone(old)
+        base = len(self._keys)
+        part_len = np.frombuffer(part.doc_len, dtype=np.int32)
+        for term, (doc_ids, tfs) in part.postings.items():
+            ids = np.frombuffer(doc_ids, dtype=np.int32)
+            max_tf = int(np.frombuffer(tfs, dtype=np.int32).max())
+            min_len = int(part_len[ids].min())
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._postings)
+                self._postings.append((array("i"), array("i")))
+                self._max_tf.append(max_tf)
+                self._min_len.append(min_len)
+                self._object_bytes += sys.getsizeof(term)
+            else:
+                self._max_tf[term_id] = max(self._max_tf[term_id], max_tf)
+                self._min_len[term_id] = min(self._min_len[term_id], min_len)
+            self._postings[term_id][0].frombytes((ids + base).astype(np.int32).tobytes())
+            self._postings[term_id][1].extend(tfs)
+        self._key_to_doc.update(zip(part.keys, range(base, base + len(part.keys)), strict=True))
+        self._keys.extend(part.keys)
+        self._rows.extend(part.rows)
+        self._doc_len.extend(part.doc_len)
+        self._alive.extend(b"\x01" * len(part.keys))
+        self._doc_count += len(part.keys)
+        self._total_length += int(part_len.sum())
+        self._object_bytes += sum(map(sys.getsizeof, part.keys)) + sum(map(_row_size, part.rows))
+        self._view = None
+
+    def _mark_loaded(self, watermark: Any) -> None:
+        with self._lock:
+            self._watermark = watermark
+            self._synced_at = time.monotonic()
+            self._ready = True
+
+    def sync(self) -> int:
+        """Re-index rows changed since the last load or sync; returns the row count.
+
+        Rows with a timestamp equal to the watermark are fetched again, so rows
+        committed with the same timestamp after the previous sync are not missed; those
+        already indexed unchanged are skipped and not counted.
+        """
+        if not self.timestamp_column:
+            raise ValueError("sync requires timestamp_column")
+        if not self._ready:
+            self.load()
+            return self._doc_count
+
+        sql = self._select_sql()
+        params: list[Any] = []
+        if self._watermark is not None:
+            sql += f" WHERE {self.timestamp_column} >= ?"
+            params.append(self._watermark)
+        changed = 0
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    with self._lock:
+                        self._watermark, indexed = self._apply_rows(rows, self._watermark)
+                    changed += indexed
+            finally:
+                cursor.close()
+        with self._lock:
+            self._synced_at = time.monotonic()
+            self._syncs += 1
+            self._maybe_compact()
+        return changed
+
+    def reconcile(self) -> int:
+        """Drop documents whose keys no longer exist in the table; returns the count."""
+        present: set[Any] = set()
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {self.id_column} FROM {self.table_name}")
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    present.update(row[0] for row in rows)
+            finally:
+                cursor.close()
+        with self._lock:
+            missing = [key for key in self._key_to_doc if key not in present]
+        self.delete_documents(missing)
+        return len(missing)
+
+    def sync_documents(self, keys: Iterable[Any]) -> None:
+        """Re-read the given keys from the table, re-indexing or dropping each."""
+        keys = list(keys)
+        found: list[tuple[Any, ...]] = []
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                for chunk in _chunks(keys):
+                    cursor.execute(
+                        f"{self._select_sql()} "
+                        f"WHERE {self.id_column} IN ({_placeholders(len(chunk))})",
+                        list(chunk),
+                    )
+                    found.extend(cursor.fetchall())
+            finally:
+                cursor.close()
+        with self._lock:
+            self._apply_rows(found, self._watermark)
+            seen = {row[0] for row in found}
+            self.delete_documents(key for key in keys if key not in seen)
+
+    def delete_documents(self, keys: Iterable[Any]) -> None:
+        """Remove documents from the replica by key."""
+        with self._lock:
+            for key in keys:
+                doc = self._key_to_doc.pop(key, None)
+                if doc is not None:
+                    self._tombstone(doc)
+            self._maybe_compact()
+
+    def start(self, interval: float = 60.0) -> None:
+        """Load (if needed) and then sync every ``interval`` seconds on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="hana-replica-sync", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stop the background sync thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                if not self._ready:
+                    self.load()
+                elif self.timestamp_column:
+                    self.sync()
+            except Exception:
+                with self._lock:
+                    self._sync_errors += 1
+                logger.exception("replica sync of %s failed", self.table_name)
+            self._stop.wait(interval)
+
+    def _apply_rows(
+        self,
+        rows: Iterable[tuple[Any, ...]],
+        watermark: Any,
+        counts: Iterable[Mapping[str, int]] | None = None,
+    ) -> tuple[Any, int]:
+        """Index rows in ``_select_sql`` column order, optionally with precomputed counts.
+
+        Rows identical to the indexed version (such as rows at the watermark, which
+        every sync fetches again) are left as they are. Returns the new watermark and
+        the number of rows indexed.
+        """
+        offset = 2 if self.timestamp_column else 1
+        counts_iter = iter(counts) if counts is not None else None
+        indexed = 0
+        for row in rows:
+            key = row[0]
+            if self.timestamp_column:
+                ts = row[1]
+                if ts is not None and (watermark is None or ts > watermark):
+                    watermark = ts
+            payload = tuple(row[offset:])
+            doc_counts = next(counts_iter) if counts_iter is not None else None
+            old = self._key_to_doc.get(key)
+            if old is not None:
+                if self._rows[old] == payload:
+                    continue
+                self._tombstone(old)
+            self._key_to_doc[key] = self._add(key, payload, doc_counts)
+            indexed += 1
+        return watermark, indexed
+
+    def _add(
+        self, key: Any, payload: tuple[Any, ...], counts: Mapping[str, int] | None = None
+    ) -> int:
+        doc = len(self._keys)
+        if counts is None:
+            counts = self.analyzer.counts(payload[0], key=key)
+        length = sum(counts.values())
+        for term, tf in counts.items():
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                term_id = self._term_ids[term] = len(self._postings)
+                self._postings.append((array("i"), array("i")))
+                self._max_tf.append(tf)
+                self._min_len.append(length)
+                self._object_bytes += sys.getsizeof(term)
+            doc_ids, tfs = self._postings[term_id]
+            doc_ids.append(doc)
+            tfs.append(tf)
+            if tf > self._max_tf[term_id]:
+                self._max_tf[term_id] = tf
+            if length < self._min_len[term_id]:
+                self._min_len[term_id] = length
+        self._keys.append(key)
+        self._rows.append(payload)
+        self._doc_len.append(length)
+        self._alive.append(1)
+        self._doc_count += 1
+        self._total_length += length
+        self._object_bytes += sys.getsizeof(key) + _row_size(payload)
+        self._view = None
+        return doc
+
+    def _tombstone(self, doc: int) -> None:
+        if not self._alive[doc]:
+            return
+        self._alive[doc] = 0
+        self._object_bytes -= _row_size(self._rows[doc])
+        self._rows[doc] = None
+        self._doc_count -= 1
+        self._total_length -= self._doc_len[doc]
+        self._dead += 1
+        self._view = None
+
+    def _maybe_compact(self) -> None:
+        if self._dead and self._dead > _COMPACT_RATIO * len(self._keys):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rebuild postings without tombstoned documents, renumbering document ids."""
+        alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        new_ids = np.cumsum(alive) - 1
+        doc_len = np.frombuffer(self._doc_len, dtype=np.int32)
+        postings: list[tuple[array[int], array[int]]] = []
+        max_tf: list[int] = []
+        min_len: list[int] = []
+        term_ids: dict[str, int] = {}
+        for term, term_id in self._term_ids.items():
+            doc_ids = np.frombuffer(self._postings[term_id][0], dtype=np.int32)
+            tfs = np.frombuffer(self._postings[term_id][1], dtype=np.int32)
+            keep = alive[doc_ids]
+            if not keep.any():
+                continue
+            term_ids[term] = len(postings)
+            postings.append(
+                (
+                    array("i", new_ids[doc_ids[keep]].astype(np.int32).tobytes()),
+                    array("i", tfs[keep].tobytes()),
+                )
+            )
+            max_tf.append(int(tfs[keep].max()))
+            min_len.append(int(doc_len[doc_ids[keep]].min()))
+        live = np.flatnonzero(alive).tolist()
+        self._term_ids = term_ids
+        self._postings = postings
+        self._max_tf = max_tf
+        self._min_len = min_len
+        self._keys = [self._keys[d] for d in live]
+        self._rows = [self._rows[d] for d in live]
+        self._doc_len = array("i", [self._doc_len[d] for d in live])
+        self._alive = bytearray(b"\x01" * len(live))
+        self._key_to_doc = {key: d for d, key in enumerate(self._keys)}
+        self._dead = 0
+        self._object_bytes = (
+            sum(map(sys.getsizeof, self._keys))
+            + sum(map(_row_size, self._rows))
+            + sum(map(sys.getsizeof, self._term_ids))
+        )
+        self._view = None
+
+    def save_snapshot(self, path: str | Path, source_version: Hashable = None) -> None:
+        """Write the replica to a memory-mappable snapshot file.
+
+        Pass the :func:`~langchain_hana_retriever.cache.table_version_probe` result taken
+        before :meth:`load` as ``source_version`` so stale snapshots can be detected.
+        """
+        with self._lock:
+            if self._dead:
+                self._compact()
+            write_snapshot(
+                path,
+                {term: self._postings[term_id] for term, term_id in self._term_ids.items()},
+                self._doc_len,
+                self._keys,
+                self._rows,  # type: ignore[arg-type]
+                table_name=self.table_name,
+                content_column=self.content_column,
+                metadata_columns=self.metadata_columns,
+                k1=self.k1,
+                b=self.b,
+                timestamp_column=self.timestamp_column,
+                analyzer=self.analyzer,
+                source_version=source_version,
+            )
+
+    # -- Query ---------------------------------------------------------------
+
+    def idf(self, term: str) -> float:
+        """Non-negative BM25 IDF over the replicated corpus."""
+        with self._lock:
+            term_id = self._term_ids.get(term)
+            df = 0 if term_id is None else self._live_df(term_id)
+            return math.log(1.0 + (self._doc_count - df + 0.5) / (df + 0.5))
+
+    def _live_df(self, term_id: int) -> int:
+        doc_ids = np.frombuffer(self._postings[term_id][0], dtype=np.int32)
+        alive = np.frombuffer(self._alive, dtype=np.uint8)
+        return int(alive[doc_ids].sum())
+
+    def search(
+        self,
+        tokens: list[str],
+        k: int,
+        accept: Callable[[tuple[Any, ...]], bool] | None = None,
+        prune: bool = True,
+        k1: float | None = None,
+        b: float | None = None,
+    ) -> list[tuple[tuple[Any, ...], float]]:
+        """Return up to ``k`` ``(row, score)`` pairs for the query ``tokens``, best first.
+
+        ``accept``, if given, is called with the row of each matching document and
+        excludes it from the results when it returns false. With ``prune``, documents
+        that cannot reach the top ``k`` are skipped using per-term score bounds (see
+        :func:`~langchain_hana_retriever.scoring.maxscore_top_k`); results are the same
+        as with exhaustive scoring. ``k1`` and ``b`` default to the replica's own; a
+        retriever passes its scoring parameters.
+        """
+        k1 = self.k1 if k1 is None else k1
+        b = self.b if b is None else b
+        with self._lock:
+            if not tokens or self._doc_count == 0:
+                return []
+            view = self._document_view()
+            alive = view.alive
+            terms: list[TermPostings] = []
+            for term in dict.fromkeys(tokens):
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    continue
+                # Copies: the arrays keep growing while this query scores
+                doc_ids = np.frombuffer(self._postings[term_id][0], dtype=np.int32).copy()
+                tfs = np.frombuffer(self._postings[term_id][1], dtype=np.int32).copy()
+                df = len(doc_ids) if alive is None else int(alive[doc_ids].sum())
+                if df == 0:
+                    continue
+                idf = math.log(1.0 + (view.doc_count - df + 0.5) / (df + 0.5))
+                bound = bm25_upper_bound(
+                    idf, self._max_tf[term_id], self._min_len[term_id], view.avgdl, k1, b
+                )
+                terms.append(TermPostings(doc_ids, tfs, idf, bound))
+
+        doc_len, avgdl, rows = view.doc_len, view.avgdl, view.rows
+        if prune:
+            matches = None
+            if accept is not None:
+
+                def matches(docs: np.ndarray) -> np.ndarray:
+                    return np.array([accept(rows[d]) for d in docs.tolist()], dtype=bool)
+
+            docs, scores, skipped = maxscore_top_k(
+                terms, doc_len, avgdl, k1, b, k, alive=alive, accept=matches
+            )
+            count("postings_skipped", skipped)
+            return [
+                (rows[d], score) for d, score in zip(docs.tolist(), scores.tolist(), strict=True)
+            ]
+
+        all_scores = np.zeros(len(rows))
+        for posting in terms:
+            doc_ids, tf = posting.doc_ids, posting.tfs
+            if alive is not None:
+                keep = alive[doc_ids]
+                doc_ids, tf = doc_ids[keep], tf[keep]
+            # Each document appears once per term, so fancy-index addition is safe
+            all_scores[doc_ids] += bm25_term_scores(
+                posting.idf, tf.astype(np.float64), doc_len[doc_ids], avgdl, k1, b
+            )
+        matched = np.flatnonzero(all_scores > 0)
+        if accept is not None:
+            matched = np.array([d for d in matched.tolist() if accept(rows[d])], dtype=np.intp)
+        order = top_k(all_scores[matched], k)
+        return [(rows[d], float(all_scores[d])) for d in matched[order].tolist()]
+
+    def _document_view(self) -> _DocumentView:
+        """Per-document state as of now, copied once per change; call under the lock."""
+        if self._view is None:
+            self._view = _DocumentView(
+                doc_len=np.frombuffer(self._doc_len, dtype=np.int32).copy(),
+                alive=(
+                    np.frombuffer(self._alive, dtype=np.uint8).astype(bool) if self._dead else None
+                ),
+                rows=tuple(self._rows),
+                doc_count=self._doc_count,
+                avgdl=self._total_length / self._doc_count or 1.0,
+            )
+        return self._view
+
+    def metrics(self) -> ReplicaMetrics:
+        """Return a snapshot of index size and sync freshness."""
+        with self._lock:
+            postings = sum(len(doc_ids) for doc_ids, _ in self._postings)
+            memory = (
+                sum(d.itemsize * len(d) + t.itemsize * len(t) for d, t in self._postings)
+                + self._doc_len.itemsize * len(self._doc_len)
+                + len(self._alive)
+                + sum(
+                    map(
+                        sys.getsizeof,
+                        (self._keys, self._rows, self._term_ids, self._key_to_doc, self._postings),
+                    )
+                )
+                + self._object_bytes
+            )
+            lag = None if self._synced_at is None else time.monotonic() - self._synced_at
+            return ReplicaMetrics(
+                ready=self._ready,
+                documents=self._doc_count,
+                terms=len(self._term_ids),
+                postings=postings,
+                memory_bytes=memory,
+                watermark=self._watermark,
+                sync_lag=lag,
+                syncs=self._syncs,
+                sync_errors=self._sync_errors,
+            )
+
+
+def _row_size(row: tuple[Any, ...] | None) -> int:
+    """Approximate size of a row payload: the tuple and each of its values."""
+    if row is None:
+        return 0
+    return sys.getsizeof(row) + sum(map(sys.getsizeof, row))
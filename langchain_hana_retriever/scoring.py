@@ -0,0 +1,414 @@
+"""Vectorized BM25 scoring over sparse term-document matrices."""
+
+from __future__ import annotations
+
+import math
+from collections import Counter
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+from itertools import chain
+from typing import Literal
+
+import numpy as np
+
+BM25Variant = Literal["okapi", "plus", "l"]
+
+# A document as its list of terms or as term counts
+TermDocument = list[str] | Mapping[str, int]
+
+_DEFAULT_DELTA: dict[str, float] = {"okapi": 0.0, "plus": 1.0, "l": 0.5}
+
+
+@dataclass(frozen=True)
+class TermMatrix:
+    """CSR-style encoding of candidate documents restricted to a query vocabulary.
+
+    Row ``d`` holds the entries ``indptr[d]:indptr[d + 1]`` of ``indices`` (term ids into
+    ``vocabulary``) and ``data`` (term frequencies). ``doc_len`` holds full document
+    lengths, including terms outside the vocabulary.
+    """
+
+    vocabulary: dict[str, int]
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    doc_len: np.ndarray
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_len)
+
+    @classmethod
+    def encode(cls, documents: Sequence[TermDocument], vocabulary: dict[str, int]) -> TermMatrix:
+        """Encode documents, keeping only terms present in ``vocabulary``.
+
+        Each document is either its list of terms or a ``term -> count`` mapping.
+        """
+        indptr = np.zeros(len(documents) + 1, dtype=np.int64)
+        indices: list[int] = []
+        data: list[int] = []
+        doc_len = np.empty(len(documents), dtype=np.float64)
+        terms = list(vocabulary.items())
+        for d, doc in enumerate(documents):
+            if isinstance(doc, Mapping):
+                doc_len[d] = sum(doc.values())
+                counts = [doc.get(term, 0) for term, _ in terms]
+            else:
+                doc_len[d] = len(doc)
+                # Query vocabularies are tiny, so a C-level count per term beats hashing
+                # every token of the document.
+                counts = [doc.count(term) for term, _ in terms]
+            for (_, term_id), tf in zip(terms, counts, strict=True):
+                if tf:
+                    indices.append(term_id)
+                    data.append(tf)
+            indptr[d + 1] = len(indices)
+        return cls(
+            vocabulary=vocabulary,
+            indptr=indptr,
+            indices=np.asarray(indices, dtype=np.int64),
+            data=np.asarray(data, dtype=np.float64),
+            doc_len=doc_len,
+        )
+
+    @classmethod
+    def from_dense(
+        cls, vocabulary: dict[str, int], tf: np.ndarray, doc_len: np.ndarray
+    ) -> TermMatrix:
+        """Encode a ``documents x vocabulary`` array of term frequencies."""
+        present = tf > 0
+        indptr = np.zeros(len(tf) + 1, dtype=np.int64)
+        np.cumsum(present.sum(axis=1), out=indptr[1:])
+        return cls(
+            vocabulary=vocabulary,
+            indptr=indptr,
+            indices=np.nonzero(present)[1].astype(np.int64),
+            data=tf[present].astype(np.float64),
+            doc_len=np.asarray(doc_len, dtype=np.float64),
+        )
+
+    def row_ids(self) -> np.ndarray:
+        """Document id of every stored entry."""
+        return np.repeat(np.arange(self.n_docs), np.diff(self.indptr))
+
+
+class BM25Scorer:
+    """BM25 scoring engine with Okapi, BM25+ and BM25L variants.
+
+    Without external statistics, IDF and average length are computed over the candidate
+    documents with the same formulas as ``rank_bm25`` (so ``okapi`` reproduces
+    ``BM25Okapi`` exactly). Pass ``idf`` and ``avgdl`` to score with corpus-wide
+    statistics instead. BM25+ adds ``delta`` only for terms present in the document.
+
+    Args:
+        variant: ``"okapi"``, ``"plus"`` or ``"l"``.
+        k1: Term frequency saturation.
+        b: Length normalization.
+        delta: Lower-bound shift for BM25+ and BM25L (defaults 1.0 and 0.5).
+        epsilon: Okapi IDF floor as a fraction of the average IDF.
+    """
+
+    def __init__(
+        self,
+        variant: BM25Variant = "okapi",
+        k1: float = 1.5,
+        b: float = 0.75,
+        delta: float | None = None,
+        epsilon: float = 0.25,
+    ) -> None:
+        if variant not in _DEFAULT_DELTA:
+            raise ValueError(f"unknown BM25 variant: {variant!r}")
+        self.variant = variant
+        self.k1 = k1
+        self.b = b
+        self.delta = _DEFAULT_DELTA[variant] if delta is None else delta
+        self.epsilon = epsilon
+
+    def score(
+        self,
+        query: list[str],
+        documents: Sequence[TermDocument],
+        idf: Mapping[str, float] | Callable[[str], float] | None = None,
+        avgdl: float | None = None,
+    ) -> np.ndarray:
+        """Score tokenized documents against a query.
+
+        Args:
+            query: Query terms; repeated terms count repeatedly.
+            documents: Terms (or term counts) of each candidate document.
+            idf: IDF per term, as a mapping or callable. Computed from ``documents``
+                when omitted.
+            avgdl: Average document length. Computed from ``documents`` when omitted.
+
+        Returns:
+            Array of scores in document order.
+        """
+        vocabulary: dict[str, int] = {}
+        for term in query:
+            vocabulary.setdefault(term, len(vocabulary))
+        matrix = TermMatrix.encode(documents, vocabulary)
+        return self.score_matrix(matrix, query, documents, idf=idf, avgdl=avgdl)
+
+    def score_matrix(
+        self,
+        matrix: TermMatrix,
+        query: list[str],
+        documents: Sequence[TermDocument] | None = None,
+        idf: Mapping[str, float] | Callable[[str], float] | None = None,
+        avgdl: float | None = None,
+    ) -> np.ndarray:
+        """Score an already encoded matrix; see :meth:`score`."""
+        n_docs = matrix.n_docs
+        if n_docs == 0:
+            return np.zeros(0)
+        if avgdl is None or avgdl <= 0:
+            avgdl = float(matrix.doc_len.mean()) or 1.0
+
+        idf_vec = self._idf_vector(matrix, idf, documents)
+        # Query term multiplicity, as rank_bm25 sums once per query token
+        weights = np.zeros(len(matrix.vocabulary))
+        for term in query:
+            weights[matrix.vocabulary[term]] += 1.0
+
+        rows = matrix.row_ids()
+        tf = matrix.data
+        length_norm = 1 - self.b + self.b * matrix.doc_len[rows] / avgdl
+        k1 = self.k1
+        if self.variant == "okapi":
+            term_scores = tf * (k1 + 1) / (tf + k1 * length_norm)
+        elif self.variant == "plus":
+            term_scores = self.delta + tf * (k1 + 1) / (k1 * length_norm + tf)
+        else:
+            ctd = tf / length_norm
+            term_scores = (k1 + 1) * (ctd + self.delta) / (k1 + ctd + self.delta)
+
+        contributions = idf_vec[matrix.indices] * weights[matrix.indices] * term_scores
+        return np.bincount(rows, weights=contributions, minlength=n_docs)
+
+    def _idf_vector(
+        self,
+        matrix: TermMatrix,
+        idf: Mapping[str, float] | Callable[[str], float] | None,
+        documents: Sequence[TermDocument] | None,
+    ) -> np.ndarray:
+        terms = sorted(matrix.vocabulary, key=matrix.vocabulary.__getitem__)
+        if isinstance(idf, Mapping):
+            return np.array([idf.get(t, 0.0) for t in terms], dtype=np.float64)
+        if idf is not None:
+            return np.array([idf(t) for t in terms], dtype=np.float64)
+
+        n = matrix.n_docs
+        df = np.bincount(matrix.indices, minlength=len(terms)).astype(np.float64)
+        if self.variant == "okapi":
+            values = np.log(n - df + 0.5) - np.log(df + 0.5)
+            if (values < 0).any():
+                values = np.where(values < 0, self.epsilon * self._average_idf(documents), values)
+        elif self.variant == "plus":
+            values = np.log(n + 1) - np.log(np.maximum(df, 1.0))
+        else:
+            values = np.log(n + 1) - np.log(df + 0.5)
+        # Terms absent from every candidate contribute nothing
+        return np.where(df > 0, values, 0.0)
+
+    @staticmethod
+    def _average_idf(documents: Sequence[TermDocument] | None) -> float:
+        """Average Okapi IDF over the whole candidate vocabulary, as in rank_bm25."""
+        if not documents:
+            return 0.0
+        n = len(documents)
+        df = Counter(chain.from_iterable(map(set, documents)))
+        return sum(math.log(n - f + 0.5) - math.log(f + 0.5) for f in df.values()) / len(df)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first, ties broken by position.
+
+    Uses a partial partition instead of a full sort, so cost is linear in the number
+    of candidates plus ``k log k``.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[: k - len(above)]
+    selected = np.concatenate([above, ties])
+    return selected[np.lexsort((selected, -scores[selected]))]
+
+
+def bm25_term_scores(
+    idf: float, tf: np.ndarray, doc_len: np.ndarray, avgdl: float, k1: float, b: float
+) -> np.ndarray:
+    """Okapi BM25 contribution of one term to each document in its postings."""
+    norm = 1 - b + b * doc_len / avgdl
+    return idf * tf * (k1 + 1) / (tf + k1 * norm)
+
+
+def bm25_upper_bound(
+    idf: float, max_tf: int, min_len: int, avgdl: float, k1: float, b: float
+) -> float:
+    """Largest contribution a term can make: its highest frequency in its shortest document.
+
+    The Okapi term score grows with frequency and shrinks with length, so bounds from a
+    superset of the live postings (e.g. including deleted documents) remain valid.
+    """
+    norm = 1 - b + b * min_len / avgdl
+    return idf * max_tf * (k1 + 1) / (max_tf + k1 * norm)
+
+
+@dataclass(frozen=True)
+class TermPostings:
+    """One query term's postings for :func:`maxscore_top_k`.
+
+    ``doc_ids`` are ascending and ``upper_bound`` is at least the term's contribution to
+    any of them, e.g. from :func:`bm25_upper_bound`.
+    """
+
+    doc_ids: np.ndarray
+    tfs: np.ndarray
+    idf: float
+    upper_bound: float
+
+
+# Relative margin on pruning decisions, so rounding can never drop a top-k document
+_PRUNE_SLACK = 1e-9
+
+
+def _kth_largest(values: np.ndarray, k: int) -> float:
+    if len(values) < k:
+        return 0.0
+    return float(-np.partition(-values, k - 1)[k - 1])
+
+
+def _accepted(
+    docs: np.ndarray, accept: Callable[[np.ndarray], np.ndarray], verdicts: np.ndarray
+) -> np.ndarray:
+    """Mask of accepted ``docs``, calling ``accept`` only for documents not seen before."""
+    unknown = np.unique(docs[verdicts[docs] == 0])
+    if len(unknown):
+        verdicts[unknown] = np.where(accept(unknown), 1, 2)
+    mask: np.ndarray = verdicts[docs] == 1
+    return mask
+
+
+def _threshold(
+    docs: np.ndarray,
+    values: np.ndarray,
+    k: int,
+    accept: Callable[[np.ndarray], np.ndarray] | None,
+    verdicts: np.ndarray,
+) -> float:
+    """A lower bound on the ``k``-th best score: the ``k``-th best accepted value."""
+    if len(docs) < k:
+        return 0.0
+    if accept is None:
+        return _kth_largest(values, k)
+    # Only the best few documents are checked; fewer than k accepted gives no bound
+    n = min(4 * k, len(values))
+    top = np.argpartition(-values, n - 1)[:n]
+    return _kth_largest(values[top][_accepted(docs[top], accept, verdicts)], k)
+
+
+def _probe(term: TermPostings, docs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Mask of ``docs`` (ascending) present in the term's postings, and their frequencies."""
+    if len(term.doc_ids) == 0 or len(docs) == 0:
+        return np.zeros(len(docs), dtype=bool), np.zeros(0, dtype=term.tfs.dtype)
+    idx = np.minimum(np.searchsorted(term.doc_ids, docs), len(term.doc_ids) - 1)
+    hit = term.doc_ids[idx] == docs
+    return hit, term.tfs[idx[hit]]
+
+
+def maxscore_top_k(
+    terms: Sequence[TermPostings],
+    doc_len: np.ndarray,
+    avgdl: float,
+    k1: float,
+    b: float,
+    k: int,
+    alive: np.ndarray | None = None,
+    accept: Callable[[np.ndarray], np.ndarray] | None = None,
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """Top ``k`` documents by BM25 with MaxScore dynamic pruning.
+
+    Terms are visited by decreasing upper bound. Their postings are scored in full
+    only while the bounds of the remaining terms could still lift an unseen document
+    to the current ``k``-th best partial score; once they cannot, the remaining
+    (typically frequent, low-IDF) terms are only probed by binary search for the
+    surviving candidates, and candidates whose partial score plus remaining bounds
+    falls below the threshold are dropped. The few documents left are rescored in
+    query order, so scores and tie order equal exhaustive term-at-a-time scoring
+    followed by :func:`top_k` over ascending document ids.
+
+    Args:
+        terms: Postings of the distinct query terms, in query order.
+        doc_len: Length of every document slot.
+        avgdl: Average document length.
+        k1: Term frequency saturation.
+        b: Length normalization.
+        k: Number of documents to return.
+        alive: Mask of live document slots; postings of others are ignored.
+        accept: Called with ascending document ids, returns the mask of those that may
+            be returned. Only called for documents that could reach the top ``k``.
+
+    Returns:
+        ``(doc_ids, scores, skipped)``, best first, where ``skipped`` counts postings
+        that were never scored.
+    """
+    empty = np.zeros(0, dtype=np.intp)
+    if k <= 0 or not terms:
+        return empty, np.zeros(0), 0
+    order = sorted(range(len(terms)), key=lambda i: -terms[i].upper_bound)
+    # remaining[p]: sum of the bounds of the terms visited from position p on
+    remaining = [0.0] * (len(order) + 1)
+    for pos in range(len(order) - 1, -1, -1):
+        remaining[pos] = remaining[pos + 1] + terms[order[pos]].upper_bound
+
+    partial = np.zeros(len(doc_len))
+    verdicts = np.zeros(len(doc_len) if accept is not None else 0, dtype=np.int8)
+    theta = 0.0
+    pos = 0
+    # Essential terms: any document in them may still reach the top k
+    while pos < len(order) and not remaining[pos] < theta * (1 - _PRUNE_SLACK):
+        term = terms[order[pos]]
+        doc_ids, tfs = term.doc_ids, term.tfs
+        if alive is not None:
+            keep = alive[doc_ids]
+            doc_ids, tfs = doc_ids[keep], tfs[keep]
+        partial[doc_ids] += bm25_term_scores(
+            term.idf, tfs.astype(np.float64), doc_len[doc_ids], avgdl, k1, b
+        )
+        # Partial scores only grow, so any k of them bound the final k-th best from below
+        theta = max(theta, _threshold(doc_ids, partial[doc_ids], k, accept, verdicts))
+        pos += 1
+
+    candidates = np.flatnonzero(partial > 0)
+    skipped = 0
+    for p in range(pos, len(order)):
+        # Non-essential terms: probe only the candidates that can still make the cut
+        bound = partial[candidates] + remaining[p]
+        candidates = candidates[bound >= theta * (1 - _PRUNE_SLACK)]
+        if accept is not None and p == pos:
+            candidates = candidates[_accepted(candidates, accept, verdicts)]
+        term = terms[order[p]]
+        hit, tf = _probe(term, candidates)
+        docs = candidates[hit]
+        partial[docs] += bm25_term_scores(
+            term.idf, tf.astype(np.float64), doc_len[docs], avgdl, k1, b
+        )
+        skipped += len(term.doc_ids) - len(docs)
+    if accept is not None and pos == len(order):
+        candidates = candidates[_accepted(candidates, accept, verdicts)]
+    theta = max(theta, _kth_largest(partial[candidates], k))
+    candidates = candidates[partial[candidates] >= theta * (1 - _PRUNE_SLACK)]
+
+    # Rescore in query order so floating-point sums match exhaustive evaluation
+    scores = np.zeros(len(candidates))
+    for term in terms:
+        hit, tf = _probe(term, candidates)
+        scores[hit] += bm25_term_scores(
+            term.idf, tf.astype(np.float64), doc_len[candidates[hit]], avgdl, k1, b
+        )
+    top = top_k(scores, k)
+    return candidates[top], scores[top], skipped
@@ -0,0 +1,391 @@
+"""Sharded BM25 retrieval: fan out over tables or partitions and merge the top k."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import time
+from collections.abc import Sequence
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import AbstractContextManager
+from itertools import islice
+from typing import Any
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForChainRun,
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForChainRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableConfig
+from pydantic import model_validator
+
+from langchain_hana_retriever.admission import deadline
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.executor import submit_nested
+from langchain_hana_retriever.filters import MetadataFilter, _batch_filter
+from langchain_hana_retriever.instrumentation import (
+    Instrumentation,
+    apublish,
+    profile,
+    publish,
+    stage,
+)
+from langchain_hana_retriever.stats import CorpusStats
+
+logger = logging.getLogger(__name__)
+
+# Retriever fields built from one table, which from_tables does not copy to other tables
+_TABLE_COMPONENTS = ("trigram_index", "postings_index", "replica", "corpus_stats")
+
+
+class HANAShardedRetriever(BaseRetriever):
+    """BM25 retriever over a corpus split across tables, schemas or partitions.
+
+    Each shard is a :class:`HANABm25Retriever` (see :meth:`from_tables` and
+    :meth:`from_partitions`). A query runs on all shards concurrently, each on its own
+    connection or pool, and the per-shard top ``k`` lists are merged into the global
+    top ``k`` with a k-way heap merge on ``bm25_score``. Documents carry the name of
+    their shard under ``shard``.
+
+    Scores of different shards are only comparable when computed with the same
+    statistics: with ``corpus_stats`` (e.g. from :meth:`scan_corpus_stats`) every
+    shard scores with the same corpus-wide IDF and average length. Without it, each
+    shard uses its own statistics, or its candidates' if it has none. Shards with a
+    ``postings_index`` or a ``replica`` score from those structures' statistics.
+
+    A shard that does not answer within ``shard_timeout`` seconds is skipped: results
+    come from the other shards and every document lists the skipped shards under
+    ``skipped_shards``. Each shard call also runs under a ``shard_timeout`` deadline,
+    which bounds its statements on HANA. Called from a worker of the shared executor
+    (e.g. as a leg of :class:`HANAHybridRetriever`), shards fan out on a separate
+    executor rather than queueing behind that worker. A ``filter`` passed to ``invoke``
+    or ``batch`` is forwarded to every shard.
+
+    With ``instrumentation``, queries are profiled with one stage per shard and a
+    ``merge`` stage, as for :class:`HANABm25Retriever`.
+    """
+
+    shards: list[HANABm25Retriever]
+    shard_names: list[str] | None = None
+    k: int = 10
+    corpus_stats: CorpusStats | None = None
+    shard_timeout: float | None = None
+    instrumentation: Instrumentation | None = None
+    include_timings: bool = False
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @model_validator(mode="after")
+    def _check_shards(self) -> HANAShardedRetriever:
+        if not self.shards:
+            raise ValueError("shards must not be empty")
+        if self.shard_names is not None and len(self.shard_names) != len(self.shards):
+            raise ValueError("shard_names must have one entry per shard")
+        analyzer = self.shards[0].analyzer
+        if any(shard.analyzer != analyzer for shard in self.shards):
+            raise ValueError("all shards must use the same analyzer")
+        if self.corpus_stats is not None and self.corpus_stats.analyzer != analyzer:
+            raise ValueError(
+                f"corpus_stats was built with {self.corpus_stats.analyzer!r}, "
+                f"but the shards use {analyzer!r}"
+            )
+        # Each shard must return (at least) the global k, scored with the shared stats
+        shards = []
+        for shard in self.shards:
+            update: dict[str, Any] = {}
+            if shard.k != self.k:
+                update["k"] = self.k
+            if self.corpus_stats is not None and shard.corpus_stats is not self.corpus_stats:
+                update["corpus_stats"] = self.corpus_stats
+            shards.append(shard.model_copy(update=update) if update else shard)
+        self.shards = shards
+        return self
+
+    @classmethod
+    def from_tables(
+        cls,
+        retriever: HANABm25Retriever,
+        tables: Sequence[str],
+        global_stats: bool = False,
+        **kwargs: Any,
+    ) -> HANAShardedRetriever:
+        """One shard per table (``SCHEMA.TABLE`` names work too), configured like ``retriever``.
+
+        With ``global_stats``, ``corpus_stats`` is computed with :meth:`scan_corpus_stats`.
+        A ``trigram_index``, ``postings_index``, ``replica`` or ``corpus_stats`` covers a
+        single table, so none is copied to the shards; pass shards with their own to the
+        constructor instead.
+        """
+        update = dict.fromkeys(_TABLE_COMPONENTS)
+        shards = [retriever.model_copy(update={**update, "table_name": table}) for table in tables]
+        kwargs.setdefault("shard_names", list(tables))
+        return cls._create(retriever, shards, global_stats, kwargs)
+
+    @classmethod
+    def from_partitions(
+        cls,
+        retriever: HANABm25Retriever,
+        column: str,
+        values: Sequence[Any],
+        global_stats: bool = False,
+        **kwargs: Any,
+    ) -> HANAShardedRetriever:
+        """One shard per value of a partition ``column`` of ``retriever``'s table.
+
+        Each shard adds ``column = value`` to ``retriever``'s filter, so HANA can prune
+        partitions and each shard's ``candidate_limit`` applies per partition. With
+        ``global_stats``, ``corpus_stats`` is computed over the table.
+        """
+        shards = []
+        for value in values:
+            where = MetadataFilter.coerce(retriever.filter, {column: value})
+            assert where is not None
+            shards.append(retriever.model_copy(update={"filter": where.spec}))
+        kwargs.setdefault("shard_names", [f"{column}={value}" for value in values])
+        return cls._create(retriever, shards, global_stats, kwargs)
+
+    @classmethod
+    def _create(
+        cls,
+        retriever: HANABm25Retriever,
+        shards: list[HANABm25Retriever],
+        global_stats: bool,
+        kwargs: dict[str, Any],
+    ) -> HANAShardedRetriever:
+        kwargs.setdefault("k", retriever.k)
+        if global_stats:
+            kwargs.setdefault("corpus_stats", cls.scan_corpus_stats(shards))
+        return cls(shards=shards, **kwargs)
+
+    @staticmethod
+    def scan_corpus_stats(
+        shards: Sequence[HANABm25Retriever], batch_size: int = 1000
+    ) -> CorpusStats:
+        """Scan every distinct shard table once and merge the statistics.
+
+        Partition shards of one table share its statistics, computed over the whole
+        table.
+        """
+        parts = []
+        seen: set[tuple[int, str]] = set()
+        for shard in shards:
+            key = (id(shard.connection), shard.table_name)
+            if key in seen:
+                continue
+            seen.add(key)
+            parts.append(
+                CorpusStats.from_table(
+                    shard.connection,
+                    shard.table_name,
+                    content_column=shard.content_column,
+                    batch_size=batch_size,
+                    analyzer=shard.analyzer,
+                )
+            )
+        return CorpusStats.merge(parts)
+
+    def names(self) -> list[str]:
+        """Shard names: ``shard_names``, or table names (indexed when repeated)."""
+        if self.shard_names is not None:
+            return list(self.shard_names)
+        tables = [shard.table_name for shard in self.shards]
+        if len(set(tables)) == len(tables):
+            return tables
+        return [f"{table}#{i}" for i, table in enumerate(tables)]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun,
+        filter: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        with profile(self.instrumentation, "sharded") as record:
+            docs = self._search(query, filter)
+        publish(record, [docs], [run_manager], self.include_timings)
+        return docs
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun,
+        filter: dict[str, Any] | None = None,
+    ) -> list[Document]:
+        with profile(self.instrumentation, "sharded") as record:
+            docs = await self._asearch(query, filter)
+        await apublish(record, [docs], [run_manager], self.include_timings)
+        return docs
+
+    def batch(
+        self,
+        inputs: list[str],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[list[Document]]:
+        """Retrieve for several queries with one batched call per shard.
+
+        A ``filter`` keyword argument applies to every query; other keyword arguments
+        raise :class:`TypeError`.
+        """
+        filter = _batch_filter(kwargs)
+
+        def search_many(
+            queries: list[str], run_manager: list[CallbackManagerForChainRun]
+        ) -> list[Exception | list[Document]]:
+            with profile(self.instrumentation, "sharded") as record:
+                results = self._search_many(queries, filter)
+            publish(record, results, run_manager, self.include_timings)
+            return list(results)
+
+        return self._batch_with_config(
+            search_many,
+            inputs,
+            config,
+            return_exceptions=return_exceptions,
+            run_type="retriever",
+        )
+
+    async def abatch(
+        self,
+        inputs: list[str],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[list[Document]]:
+        """Async variant of :meth:`batch`."""
+        filter = _batch_filter(kwargs)
+
+        async def search_many(
+            queries: list[str], run_manager: list[AsyncCallbackManagerForChainRun]
+        ) -> list[Exception | list[Document]]:
+            with profile(self.instrumentation, "sharded") as record:
+                results = await self._asearch_many(queries, filter)
+            await apublish(record, results, run_manager, self.include_timings)
+            return list(results)
+
+        return await self._abatch_with_config(
+            search_many,
+            inputs,
+            config,
+            return_exceptions=return_exceptions,
+            run_type="retriever",
+        )
+
+    def _search(self, query: str, filter: dict[str, Any] | None = None) -> list[Document]:
+        kwargs: dict[str, Any] = {} if filter is None else {"filter": filter}
+        names = self.names()
+        futures = [
+            self._submit(name, shard.invoke, query, **kwargs)
+            for name, shard in zip(names, self.shards, strict=True)
+        ]
+        return self._merge(names, self._collect(names, futures))
+
+    async def _asearch(self, query: str, filter: dict[str, Any] | None = None) -> list[Document]:
+        kwargs: dict[str, Any] = {} if filter is None else {"filter": filter}
+        names = self.names()
+        results = await asyncio.gather(
+            *(
+                self._acollect(name, shard.ainvoke(query, **kwargs))
+                for name, shard in zip(names, self.shards, strict=True)
+            )
+        )
+        return self._merge(names, results)
+
+    def _search_many(
+        self, queries: list[str], filter: dict[str, Any] | None = None
+    ) -> list[list[Document]]:
+        kwargs: dict[str, Any] = {} if filter is None else {"filter": filter}
+        names = self.names()
+        futures = [
+            self._submit(name, shard.batch, queries, **kwargs)
+            for name, shard in zip(names, self.shards, strict=True)
+        ]
+        batches = self._collect(names, futures)
+        return [
+            self._merge(names, [None if docs is None else docs[i] for docs in batches])
+            for i in range(len(queries))
+        ]
+
+    async def _asearch_many(
+        self, queries: list[str], filter: dict[str, Any] | None = None
+    ) -> list[list[Document]]:
+        kwargs: dict[str, Any] = {} if filter is None else {"filter": filter}
+        names = self.names()
+        batches = await asyncio.gather(
+            *(
+                self._acollect(name, shard.abatch(queries, **kwargs))
+                for name, shard in zip(names, self.shards, strict=True)
+            )
+        )
+        return [
+            self._merge(names, [None if docs is None else docs[i] for docs in batches])
+            for i in range(len(queries))
+        ]
+
+    def _stage(self, name: str) -> AbstractContextManager[Any]:
+        return stage(self.instrumentation, name)
+
+    def _timed(self, name: str, func: Any, *args: Any, **kwargs: Any) -> Any:
+        with deadline(self.shard_timeout), self._stage(name):
+            return func(*args, **kwargs)
+
+    def _submit(self, name: str, func: Any, *args: Any, **kwargs: Any) -> Future[Any]:
+        """Run a shard on the shared executor, or on the nested one from its workers.
+
+        A worker blocking on shards queued behind it could starve the pool and, without
+        ``shard_timeout``, never return.
+        """
+        return submit_nested(self._timed, name, func, *args, **kwargs)
+
+    def _collect(self, names: list[str], futures: list[Future[Any]]) -> list[Any | None]:
+        """Wait for all shards within ``shard_timeout`` (shared deadline); ``None`` if late."""
+        start = time.monotonic()
+        results: list[Any | None] = []
+        for name, future in zip(names, futures, strict=True):
+            remaining = None
+            if self.shard_timeout is not None:
+                remaining = max(self.shard_timeout - (time.monotonic() - start), 0.0)
+            try:
+                results.append(future.result(timeout=remaining))
+            except FutureTimeoutError:
+                future.cancel()
+                logger.warning(
+                    "shard %s timed out after %.3fs; skipping it", name, self.shard_timeout
+                )
+                results.append(None)
+        return results
+
+    async def _acollect(self, name: str, awaitable: Any) -> Any | None:
+        try:
+            with deadline(self.shard_timeout), self._stage(name):
+                return await asyncio.wait_for(awaitable, self.shard_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("shard %s timed out after %.3fs; skipping it", name, self.shard_timeout)
+            return None
+
+    def _merge(self, names: list[str], results: list[list[Document] | None]) -> list[Document]:
+        """K-way merge of best-first shard lists into the global top ``k``."""
+        skipped = [name for name, docs in zip(names, results, strict=True) if docs is None]
+        with self._stage("merge"):
+            for name, docs in zip(names, results, strict=True):
+                for doc in docs or ():
+                    doc.metadata["shard"] = name
+            merged = heapq.merge(
+                *(docs for docs in results if docs),
+                key=lambda doc: doc.metadata["bm25_score"],
+                reverse=True,
+            )
+            top = list(islice(merged, self.k))
+        if skipped:
+            for doc in top:
+                doc.metadata["skipped_shards"] = skipped
+        return top
@@ -0,0 +1,544 @@
+"""Versioned, memory-mapped on-disk snapshots of the BM25 inverted index.
+
+Layout: an 8-byte magic, a little-endian ``uint32`` format version and ``uint32``
+header length, a JSON header, then 8-byte aligned flat arrays:
+
+- ``term_offsets`` / ``term_bytes``: sorted UTF-8 term dictionary.
+- ``postings_ptr`` / ``post_docs`` / ``post_tfs``: CSR postings per term id.
+- ``doc_len``: document lengths.
+- ``row_offsets`` / ``row_bytes``: JSON-encoded ``[key, content, *metadata]`` per document.
+  Dates, times, decimals and binary values are stored as ``{"$type": ..., "value": ...}``
+  objects and restored to their Python types on read, so filters compare them as before.
+
+Opened snapshots are read through ``mmap``, so worker processes sharing a snapshot file
+share its pages through the OS cache and start without rescanning the table.
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from collections.abc import Callable, Hashable, Sequence
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from langchain_hana_retriever.analysis import DEFAULT_ANALYZER, Analyzer
+from langchain_hana_retriever.cache import table_version_probe
+from langchain_hana_retriever.instrumentation import count
+from langchain_hana_retriever.scoring import (
+    TermPostings,
+    bm25_term_scores,
+    bm25_upper_bound,
+    maxscore_top_k,
+    top_k,
+)
+
+MAGIC = b"HANABM25"
+FORMAT_VERSION = 2
+_PREFIX = struct.Struct("<8sII")
+_ALIGN = 8
+
+_SECTIONS: dict[str, Any] = {
+    "term_offsets": np.int64,
+    "term_bytes": np.uint8,
+    "postings_ptr": np.int64,
+    "post_docs": np.int32,
+    "post_tfs": np.int32,
+    "doc_len": np.int32,
+    "row_offsets": np.int64,
+    "row_bytes": np.uint8,
+}
+
+
+class StaleSnapshotError(RuntimeError):
+    """Raised when a snapshot no longer matches its source table."""
+
+
+def _normalize_version(version: Hashable) -> Any:
+    # Compare probe results as they round-trip through the JSON header
+    return json.loads(json.dumps(version, default=str))
+
+
+def _tag_value(value: Any) -> Any:
+    """JSON form of row values json cannot represent, tagged with their type."""
+    if isinstance(value, dt.datetime):
+        return {"$type": "datetime", "value": value.isoformat()}
+    if isinstance(value, dt.date):
+        return {"$type": "date", "value": value.isoformat()}
+    if isinstance(value, dt.time):
+        return {"$type": "time", "value": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$type": "decimal", "value": str(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$type": "bytes", "value": bytes(value).hex()}
+    return str(value)
+
+
+_UNTAG: dict[str, Callable[[str], Any]] = {
+    "datetime": dt.datetime.fromisoformat,
+    "date": dt.date.fromisoformat,
+    "time": dt.time.fromisoformat,
+    "decimal": Decimal,
+    "bytes": bytes.fromhex,
+}
+
+
+def _untag_value(obj: dict[str, Any]) -> Any:
+    decode = _UNTAG.get(obj.get("$type", "")) if len(obj) == 2 and "value" in obj else None
+    return obj if decode is None else decode(obj["value"])
+
+
+def _encode_strings(values: Sequence[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(v) for v in values])
+    return offsets, np.frombuffer(b"".join(values), dtype=np.uint8)
+
+
+def write_snapshot(
+    path: str | Path,
+    postings: dict[str, tuple[Sequence[int], Sequence[int]]],
+    doc_len: Sequence[int],
+    keys: Sequence[Any],
+    rows: Sequence[tuple[Any, ...]],
+    *,
+    table_name: str,
+    content_column: str,
+    metadata_columns: Sequence[str],
+    k1: float = 1.5,
+    b: float = 0.75,
+    timestamp_column: str | None = None,
+    analyzer: Analyzer = DEFAULT_ANALYZER,
+    source_version: Hashable = None,
+) -> None:
+    """Write an index snapshot atomically (to a temporary file, then renamed).
+
+    Args:
+        path: Destination file.
+        postings: ``term -> (doc ids, term frequencies)`` over dense document ids.
+        doc_len: Length of each document in tokens.
+        keys: Primary key of each document.
+        rows: ``(content, *metadata)`` of each document.
+        table_name: Source table, recorded for staleness checks.
+        content_column: Source content column.
+        metadata_columns: Source metadata columns, in ``rows`` order.
+        k1: BM25 term frequency saturation, the snapshot's default for searches.
+        b: BM25 length normalization, the snapshot's default for searches.
+        timestamp_column: Column probed with the row count by staleness checks.
+        analyzer: Analyzer that produced the terms, restored when opening.
+        source_version: Result of :func:`~langchain_hana_retriever.cache.table_version_probe`
+            for the table and ``timestamp_column``, taken before the scan started.
+    """
+    terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+    term_offsets, term_bytes = _encode_strings([t.encode("utf-8") for t in terms])
+    postings_ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    postings_ptr[1:] = np.cumsum([len(postings[t][0]) for t in terms])
+    post_docs = np.fromiter(
+        (d for t in terms for d in postings[t][0]), dtype=np.int32, count=int(postings_ptr[-1])
+    )
+    post_tfs = np.fromiter(
+        (f for t in terms for f in postings[t][1]), dtype=np.int32, count=int(postings_ptr[-1])
+    )
+    row_offsets, row_bytes = _encode_strings(
+        [
+            json.dumps([key, *row], default=_tag_value, ensure_ascii=False).encode("utf-8")
+            for key, row in zip(keys, rows, strict=True)
+        ]
+    )
+    arrays = {
+        "term_offsets": term_offsets,
+        "term_bytes": term_bytes,
+        "postings_ptr": postings_ptr,
+        "post_docs": post_docs,
+        "post_tfs": post_tfs,
+        "doc_len": np.asarray(doc_len, dtype=np.int32),
+        "row_offsets": row_offsets,
+        "row_bytes": row_bytes,
+    }
+
+    sections = {}
+    offset = 0
+    for name, values in arrays.items():
+        sections[name] = {"offset": offset, "count": len(values)}
+        offset += -(-values.nbytes // _ALIGN) * _ALIGN
+    header = {
+        "table_name": table_name,
+        "content_column": content_column,
+        "metadata_columns": list(metadata_columns),
+        "doc_count": len(keys),
+        "total_length": int(np.sum(arrays["doc_len"], dtype=np.int64)),
+        "k1": k1,
+        "b": b,
+        "timestamp_column": timestamp_column,
+        "analyzer": analyzer.config(),
+        "created_at": time.time(),
+        "source_version": _normalize_version(source_version),
+        "sections": sections,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(_PREFIX.size + len(header_bytes)) // _ALIGN) * _ALIGN
+
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, values in arrays.items():
+            f.seek(data_start + sections[name]["offset"])
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+class IndexSnapshot:
+    """Read-only BM25 index opened from a snapshot file with ``mmap``.
+
+    Exposes the same ``search``/``ready`` interface as
+    :class:`~langchain_hana_retriever.replica.LocalIndexReplica`, so it can be passed
+    as a retriever's ``replica``, plus ``idf``/``avgdl`` for corpus statistics.
+    """
+
+    ready = True
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREFIX.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not an index snapshot")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(
+                f"{self.path} has snapshot format {version}, expected {FORMAT_VERSION}"
+            )
+        header = json.loads(self._mmap[_PREFIX.size : _PREFIX.size + header_len])
+        data_start = -(-(_PREFIX.size + header_len) // _ALIGN) * _ALIGN
+
+        self.header: dict[str, Any] = header
+        self.table_name: str = header["table_name"]
+        self.content_column: str = header["content_column"]
+        self.metadata_columns: list[str] = header["metadata_columns"]
+        self.doc_count: int = header["doc_count"]
+        self.total_length: int = header["total_length"]
+        self.k1: float = header["k1"]
+        self.b: float = header["b"]
+        self.timestamp_column: str | None = header["timestamp_column"]
+        self.analyzer = Analyzer(**header["analyzer"])
+        self.created_at: float = header["created_at"]
+        self.source_version: Any = header["source_version"]
+
+        self._arrays: dict[str, np.ndarray] = {
+            name: np.frombuffer(
+                self._mmap,
+                dtype=dtype,
+                count=header["sections"][name]["count"],
+                offset=data_start + header["sections"][name]["offset"],
+            )
+            for name, dtype in _SECTIONS.items()
+        }
+        # Highest frequency and shortest document per term, computed on first use
+        self._bounds: dict[int, tuple[int, int]] = {}
+
+    @classmethod
+    def open(
+        cls, path: str | Path, connection: Any = None, max_age: float | None = None
+    ) -> IndexSnapshot:
+        """Open a snapshot, refusing it if stale.
+
+        Args:
+            path: Snapshot file.
+            connection: When given, the source table's version (row count and max of
+                the snapshot's timestamp column) must equal the one recorded at build.
+            max_age: Maximum snapshot age in seconds.
+
+        Raises:
+            StaleSnapshotError: If the snapshot is older than ``max_age`` or the table
+                changed since it was built.
+        """
+        snapshot = cls(path)
+        try:
+            snapshot.check(connection, max_age)
+        except StaleSnapshotError:
+            snapshot.close()
+            raise
+        return snapshot
+
+    def check(self, connection: Any = None, max_age: float | None = None) -> None:
+        """Raise :class:`StaleSnapshotError` if the snapshot is stale; see :meth:`open`."""
+        if max_age is not None and time.time() - self.created_at > max_age:
+            raise StaleSnapshotError(f"{self.path} is older than {max_age} seconds")
+        if connection is not None:
+            probe = table_version_probe(connection, self.table_name, self.timestamp_column)
+            current = probe()
+            if _normalize_version(current) != self.source_version:
+                raise StaleSnapshotError(
+                    f"{self.table_name} changed since {self.path} was built "
+                    f"({self.source_version} -> {_normalize_version(current)})"
+                )
+
+    def close(self) -> None:
+        """Release the memory map."""
+        self._arrays = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Array views are still referenced elsewhere; the map is freed with them
+            pass
+
+    def __enter__(self) -> IndexSnapshot:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @property
+    def avgdl(self) -> float:
+        """Average document length in tokens."""
+        return self.total_length / self.doc_count if self.doc_count else 0.0
+
+    @property
+    def n_terms(self) -> int:
+        return len(self._arrays["term_offsets"]) - 1
+
+    def _term(self, term_id: int) -> bytes:
+        offsets = self._arrays["term_offsets"]
+        return self._arrays["term_bytes"][offsets[term_id] : offsets[term_id + 1]].tobytes()
+
+    def term_id(self, term: str) -> int | None:
+        """Id of ``term`` in the sorted dictionary, by binary search."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_terms and self._term(lo) == key:
+            return lo
+        return None
+
+    def doc_freq(self, term: str) -> int:
+        term_id = self.term_id(term)
+        if term_id is None:
+            return 0
+        ptr = self._arrays["postings_ptr"]
+        return int(ptr[term_id + 1] - ptr[term_id])
+
+    def idf(self, term: str) -> float:
+        """Non-negative BM25 IDF, as in :meth:`CorpusStats.idf`."""
+        df = self.doc_freq(term)
+        return math.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def row(self, doc: int) -> tuple[Any, tuple[Any, ...]]:
+        """``(key, (content, *metadata))`` of a document."""
+        offsets = self._arrays["row_offsets"]
+        key, *row = json.loads(
+            self._arrays["row_bytes"][offsets[doc] : offsets[doc + 1]].tobytes(),
+            object_hook=_untag_value,
+        )
+        return key, tuple(row)
+
+    def _term_bounds(self, term_id: int, doc_ids: np.ndarray, tfs: np.ndarray) -> tuple[int, int]:
+        bounds = self._bounds.get(term_id)
+        if bounds is None:
+            bounds = self._bounds[term_id] = (
+                int(tfs.max()),
+                int(self._arrays["doc_len"][doc_ids].min()),
+            )
+        return bounds
+
+    def search(
+        self,
+        tokens: list[str],
+        k: int,
+        accept: Callable[[tuple[Any, ...]], bool] | None = None,
+        prune: bool = True,
+        k1: float | None = None,
+        b: float | None = None,
+    ) -> list[tuple[tuple[Any, ...], float]]:
+        """Return up to ``k`` ``(row, score)`` pairs for the query ``tokens``, best first.
+
+        ``accept``, if given, is called with the row of each matching document and
+        excludes it from the results when it returns false. ``prune`` skips documents
+        that cannot reach the top ``k``, and ``k1`` and ``b`` override the snapshot's
+        own, as in :meth:`~langchain_hana_retriever.replica.LocalIndexReplica.search`.
+        """
+        if not tokens or self.doc_count == 0:
+            return []
+        avgdl = self.avgdl or 1.0
+        k1 = self.k1 if k1 is None else k1
+        b = self.b if b is None else b
+        ptr = self._arrays["postings_ptr"]
+        doc_len = self._arrays["doc_len"]
+        terms: list[TermPostings] = []
+        for term in dict.fromkeys(tokens):
+            term_id = self.term_id(term)
+            if term_id is None:
+                continue
+            start, end = ptr[term_id], ptr[term_id + 1]
+            doc_ids = self._arrays["post_docs"][start:end]
+            tfs = self._arrays["post_tfs"][start:end]
+            df = len(doc_ids)
+            idf = math.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+            max_tf, min_len = self._term_bounds(term_id, doc_ids, tfs)
+            bound = bm25_upper_bound(idf, max_tf, min_len, avgdl, k1, b)
+            terms.append(TermPostings(doc_ids, tfs, idf, bound))
+
+        if prune:
+            matches = None
+            if accept is not None:
+
+                def matches(docs: np.ndarray) -> np.ndarray:
+                    return np.array([accept(self.row(d)[1]) for d in docs.tolist()], dtype=bool)
+
+            docs, scores, skipped = maxscore_top_k(terms, doc_len, avgdl, k1, b, k, accept=matches)
+            count("postings_skipped", skipped)
+            return [
+                (self.row(d)[1], score)
+                for d, score in zip(docs.tolist(), scores.tolist(), strict=True)
+            ]
+
+        all_scores = np.zeros(self.doc_count)
+        for posting in terms:
+            all_scores[posting.doc_ids] += bm25_term_scores(
+                posting.idf,
+                posting.tfs.astype(np.float64),
+                doc_len[posting.doc_ids],
+                avgdl,
+                k1,
+                b,
+            )
+        matched = np.flatnonzero(all_scores > 0)
+        if accept is not None:
+            matched = np.array(
+                [d for d in matched.tolist() if accept(self.row(d)[1])], dtype=np.intp
+            )
+        order = top_k(all_scores[matched], k)
+        return [(self.row(d)[1], float(all_scores[d])) for d in matched[order].tolist()]
+
+
+# -- CLI ---------------------------------------------------------------------
+
+
+def _connect(args: argparse.Namespace, max_size: int = 1) -> Any:
+    from langchain_hana_retriever.pool import HANAConnectionPool
+
+    return HANAConnectionPool.from_params(
+        min_size=1,
+        max_size=max_size,
+        address=args.host or os.environ["HANA_HOST"],
+        port=int(args.port or os.environ.get("HANA_PORT", "443")),
+        user=args.user or os.environ["HANA_USER"],
+        password=os.environ["HANA_PASSWORD"],
+        encrypt=True,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Build, check or describe index snapshots from the command line.
+
+    Connection settings default to the ``HANA_HOST``, ``HANA_PORT``, ``HANA_USER`` and
+    ``HANA_PASSWORD`` environment variables.
+    """
+    from langchain_hana_retriever.build import ParallelIndexBuilder
+    from langchain_hana_retriever.replica import LocalIndexReplica
+
+    parser = argparse.ArgumentParser(prog="hana-bm25-snapshot", description=main.__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="scan a table and write a snapshot")
+    build.add_argument("output")
+    build.add_argument("--table", required=True)
+    build.add_argument("--id-column", required=True)
+    build.add_argument("--content-column", default="VEC_TEXT")
+    build.add_argument("--metadata-column", action="append", default=[])
+    build.add_argument("--timestamp-column")
+    build.add_argument("--batch-size", type=int, default=1000)
+    build.add_argument("--partitions", type=int, default=1, help="parallel key-range scans")
+    build.add_argument("--workers", type=int, help="tokenizer processes")
+    build.add_argument("--checkpoint-dir", help="resume a failed partitioned build")
+
+    check = commands.add_parser("check", help="exit 1 if a snapshot is stale")
+    check.add_argument("snapshot")
+    check.add_argument("--max-age", type=float)
+
+    info = commands.add_parser("info", help="print a snapshot header")
+    info.add_argument("snapshot")
+
+    for sub in (build, check):
+        sub.add_argument("--host")
+        sub.add_argument("--port")
+        sub.add_argument("--user")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        with IndexSnapshot(args.snapshot) as snapshot:
+            header = {k: v for k, v in snapshot.header.items() if k != "sections"}
+            print(json.dumps(header, indent=2, default=str))
+        return 0
+
+    connection = _connect(args, max_size=getattr(args, "partitions", 1))
+    try:
+        if args.command == "build":
+            started = time.monotonic()
+            # Probe before scanning so rows changed mid-scan make the snapshot stale
+            version = table_version_probe(connection, args.table, args.timestamp_column)()
+            replica = LocalIndexReplica(
+                connection,
+                args.table,
+                id_column=args.id_column,
+                content_column=args.content_column,
+                metadata_columns=args.metadata_column,
+                timestamp_column=args.timestamp_column,
+                batch_size=args.batch_size,
+            )
+            if args.partitions > 1 or args.checkpoint_dir:
+                ParallelIndexBuilder(
+                    replica,
+                    partitions=args.partitions,
+                    max_workers=args.workers,
+                    chunk_size=args.batch_size,
+                    checkpoint_dir=args.checkpoint_dir,
+                    progress=lambda p: print(
+                        f"{p.partitions_done}/{p.partitions_total} partitions, "
+                        f"{p.rows} rows, {p.elapsed:.1f}s",
+                        file=sys.stderr,
+                    ),
+                ).build()
+            else:
+                replica.load()
+            replica.save_snapshot(args.output, source_version=version)
+            print(
+                f"wrote {args.output}: {replica.metrics().documents} documents "
+                f"in {time.monotonic() - started:.1f}s"
+            )
+            return 0
+
+        with IndexSnapshot(args.snapshot) as snapshot:
+            try:
+                snapshot.check(connection, args.max_age)
+            except StaleSnapshotError as e:
+                print(f"stale: {e}", file=sys.stderr)
+                return 1
+        print("fresh")
+        return 0
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
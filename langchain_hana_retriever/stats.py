@@ -0,0 +1,180 @@
+"""Corpus-wide BM25 statistics for SAP HANA Cloud tables."""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+from langchain_hana_retriever.analysis import DEFAULT_ANALYZER, Analyzer
+from langchain_hana_retriever.pool import checkout
+from langchain_hana_retriever.scoring import BM25Scorer, TermDocument
+
+
+class CorpusStats:
+    """Document frequencies, document count and average length of a whole corpus.
+
+    Computed once over a table (or fed incrementally) so that BM25 IDF and length
+    normalization reflect the full corpus rather than the candidate sample returned by
+    a single query. At query time only per-candidate term frequencies are needed.
+    Texts are analyzed with ``analyzer``, which must match the retriever's.
+    """
+
+    def __init__(
+        self,
+        doc_freqs: dict[str, int] | None = None,
+        doc_count: int = 0,
+        total_length: int = 0,
+        analyzer: Analyzer = DEFAULT_ANALYZER,
+    ) -> None:
+        self.doc_freqs: dict[str, int] = dict(doc_freqs or {})
+        self.doc_count = doc_count
+        self.total_length = total_length
+        self.analyzer = analyzer
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_table(
+        cls,
+        connection: Any,
+        table_name: str,
+        content_column: str = "VEC_TEXT",
+        batch_size: int = 1000,
+        analyzer: Analyzer = DEFAULT_ANALYZER,
+    ) -> CorpusStats:
+        """Scan ``content_column`` of ``table_name`` once and build statistics.
+
+        Rows are streamed with ``fetchmany`` so memory stays bounded by ``batch_size``.
+        """
+        stats = cls(analyzer=analyzer)
+        with checkout(connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {content_column} FROM {table_name}")
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    stats.add_texts(row[0] for row in rows)
+            finally:
+                cursor.close()
+        return stats
+
+    @classmethod
+    def merge(cls, parts: Iterable[CorpusStats]) -> CorpusStats:
+        """Combine statistics of disjoint corpora (e.g. shards) into corpus-wide ones."""
+        parts = list(parts)
+        if not parts:
+            return cls()
+        analyzer = parts[0].analyzer
+        merged = cls(analyzer=analyzer)
+        for part in parts:
+            if part.analyzer != analyzer:
+                raise ValueError("cannot merge statistics built with different analyzers")
+            with part._lock:
+                merged.doc_count += part.doc_count
+                merged.total_length += part.total_length
+                for term, df in part.doc_freqs.items():
+                    merged.doc_freqs[term] = merged.doc_freqs.get(term, 0) + df
+        return merged
+
+    @property
+    def avgdl(self) -> float:
+        """Average document length in tokens."""
+        if self.doc_count == 0:
+            return 0.0
+        return self.total_length / self.doc_count
+
+    def add_document(self, tokens: list[str]) -> None:
+        """Account for a new document given its terms (with repeats)."""
+        with self._lock:
+            self.doc_count += 1
+            self.total_length += len(tokens)
+            for term in set(tokens):
+                self.doc_freqs[term] = self.doc_freqs.get(term, 0) + 1
+
+    def remove_document(self, tokens: list[str]) -> None:
+        """Remove a previously added document given its terms (with repeats)."""
+        with self._lock:
+            self.doc_count = max(self.doc_count - 1, 0)
+            self.total_length = max(self.total_length - len(tokens), 0)
+            for term in set(tokens):
+                remaining = self.doc_freqs.get(term, 0) - 1
+                if remaining > 0:
+                    self.doc_freqs[term] = remaining
+                else:
+                    self.doc_freqs.pop(term, None)
+
+    def update_document(self, old_tokens: list[str], new_tokens: list[str]) -> None:
+        """Replace a document's contribution after its content changed."""
+        self.remove_document(old_tokens)
+        self.add_document(new_tokens)
+
+    def add_texts(self, texts: Iterable[str | None]) -> None:
+        """Analyze and add raw document texts."""
+        for text in texts:
+            self.add_document(self.analyzer.terms(text))
+
+    def remove_texts(self, texts: Iterable[str | None]) -> None:
+        """Analyze and remove raw document texts."""
+        for text in texts:
+            self.remove_document(self.analyzer.terms(text))
+
+    def idf(self, term: str) -> float:
+        """Non-negative BM25 IDF: ``ln(1 + (N - df + 0.5) / (df + 0.5))``."""
+        df = self.doc_freqs.get(term, 0)
+        return math.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+
+    def score(
+        self,
+        query_tokens: list[str],
+        documents: Sequence[TermDocument],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> list[float]:
+        """Score analyzed candidate documents against a query with corpus-wide IDF.
+
+        Args:
+            query_tokens: Query terms.
+            documents: Terms (or term counts) of each candidate document.
+            k1: BM25 term frequency saturation.
+            b: BM25 length normalization.
+
+        Returns:
+            One BM25 score per document, in input order.
+        """
+        scorer = BM25Scorer("okapi", k1=k1, b=b)
+        scores = scorer.score(query_tokens, documents, idf=self.idf, avgdl=self.avgdl or None)
+        return [float(score) for score in scores]
+
+    def to_dict(self) -> dict[str, Any]:
+        """Serialize statistics to a JSON-compatible dict."""
+        with self._lock:
+            return {
+                "doc_count": self.doc_count,
+                "total_length": self.total_length,
+                "doc_freqs": dict(self.doc_freqs),
+                "analyzer": self.analyzer.config(),
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> CorpusStats:
+        """Restore statistics produced by :meth:`to_dict`."""
+        return cls(
+            doc_freqs=data["doc_freqs"],
+            doc_count=data["doc_count"],
+            total_length=data["total_length"],
+            analyzer=Analyzer(**data["analyzer"]) if "analyzer" in data else DEFAULT_ANALYZER,
+        )
+
+    def save(self, path: str | Path) -> None:
+        """Persist statistics as JSON."""
+        Path(path).write_text(json.dumps(self.to_dict()), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> CorpusStats:
+        """Load statistics saved with :meth:`save`."""
+        return cls.from_dict(json.loads(Path(path).read_text(encoding="utf-8")))
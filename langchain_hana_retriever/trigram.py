@@ -0,0 +1,268 @@
+"""Trigram side table that narrows LOCATE substring matching to index lookups."""
+
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from collections.abc import Iterable
+from typing import Any
+
+from langchain_hana_retriever.index import _chunks, _placeholders
+from langchain_hana_retriever.pool import checkout
+
+
+def trigrams(text: str | None) -> set[str]:
+    """Distinct three-character substrings of the lowercased ``text``."""
+    if not text:
+        return set()
+    text = text.lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class HANATrigramIndex:
+    """Trigrams of every document's lowercased content, kept in a side table.
+
+    The candidate query matches a term when ``LOCATE(LOWER(content), term) > 0``, so
+    "config" also matches "configuration". Any document containing a term as a
+    substring contains all of the term's trigrams, so rows can first be narrowed to
+    those having every trigram of a term (index lookups on ``<table>_TRIGRAMS``) and
+    only then verified with LOCATE, which keeps the matching behavior unchanged.
+    Terms shorter than three characters have no trigrams and cannot be narrowed.
+
+    The table (GRAM, DOC_KEY) holds one row per distinct trigram per document.
+    Trigrams are computed client-side with Python's ``str.lower``, which agrees with
+    HANA's ``LOWER`` except for a few special-cased characters (e.g. "ß").
+
+    Frequent trigrams ("ion", "the") select little and cost the most to look up, so
+    trigrams found in more than ``max_df_ratio`` of the documents are never used, and
+    each term is narrowed by at most ``max_grams`` of its rarest remaining trigrams.
+    Trigram frequencies are read from the table on first use and kept current by this
+    object's maintenance methods; frequencies gone stale through other writers only
+    make narrowing less selective, never incorrect.
+    """
+
+    def __init__(
+        self,
+        connection: Any,
+        table_name: str,
+        id_column: str,
+        content_column: str = "VEC_TEXT",
+        index_prefix: str | None = None,
+        id_type: str = "NVARCHAR(255)",
+        max_grams: int = 4,
+        max_df_ratio: float = 0.5,
+    ) -> None:
+        prefix = index_prefix or table_name
+        self.connection = connection
+        self.table_name = table_name
+        self.id_column = id_column
+        self.content_column = content_column
+        self.id_type = id_type
+        self.max_grams = max_grams
+        self.max_df_ratio = max_df_ratio
+        self.trigram_table = f"{prefix}_TRIGRAMS"
+        self._lock = threading.Lock()
+        self._doc_freqs: Counter[str] | None = None
+        self._doc_count = 0
+
+    # -- DDL -----------------------------------------------------------------
+
+    def create(self) -> None:
+        """Create the side table (without data)."""
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"CREATE TABLE {self.trigram_table} (GRAM NVARCHAR(3), DOC_KEY {self.id_type})"
+                )
+                cursor.execute(
+                    f"CREATE INDEX {self.trigram_table}_GRAM_IDX "
+                    f"ON {self.trigram_table} (GRAM, DOC_KEY)"
+                )
+                cursor.execute(
+                    f"CREATE INDEX {self.trigram_table}_KEY_IDX ON {self.trigram_table} (DOC_KEY)"
+                )
+            finally:
+                cursor.close()
+            conn.commit()
+
+    def drop(self) -> None:
+        """Drop the side table."""
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"DROP TABLE {self.trigram_table}")
+            finally:
+                cursor.close()
+            conn.commit()
+
+    # -- Build and maintenance -----------------------------------------------
+
+    def build(self, batch_size: int = 1000) -> None:
+        """Rebuild the index from scratch by streaming the content table."""
+        with self._lock:
+            self._doc_freqs = Counter()
+            self._doc_count = 0
+        with checkout(self.connection) as conn:
+            read_cursor = conn.cursor()
+            write_cursor = conn.cursor()
+            try:
+                write_cursor.execute(f"DELETE FROM {self.trigram_table}")
+                read_cursor.execute(
+                    f"SELECT {self.id_column}, {self.content_column} FROM {self.table_name}"
+                )
+                while True:
+                    rows = read_cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    self._insert(write_cursor, rows)
+            finally:
+                read_cursor.close()
+                write_cursor.close()
+            conn.commit()
+
+    def _insert(self, cursor: Any, documents: Iterable[tuple[Any, str | None]]) -> None:
+        grams = [(key, trigrams(text)) for key, text in documents]
+        entries = [(gram, key) for key, doc_grams in grams for gram in doc_grams]
+        if entries:
+            cursor.executemany(f"INSERT INTO {self.trigram_table} VALUES (?, ?)", entries)
+        with self._lock:
+            if self._doc_freqs is not None:
+                for _, doc_grams in grams:
+                    self._doc_freqs.update(doc_grams)
+                self._doc_count += sum(1 for _, doc_grams in grams if doc_grams)
+
+    def add_documents(self, documents: Iterable[tuple[Any, str | None]]) -> None:
+        """Index new documents given as ``(key, text)`` pairs."""
+        documents = list(documents)
+        if not documents:
+            return
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                self._insert(cursor, documents)
+            finally:
+                cursor.close()
+            conn.commit()
+
+    def delete_documents(self, keys: Iterable[Any]) -> None:
+        """Remove documents from the index by key."""
+        keys = list(keys)
+        if not keys:
+            return
+        removed: Counter[str] = Counter()
+        docs: set[Any] = set()
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                for chunk in _chunks(keys):
+                    cursor.execute(
+                        f"SELECT DOC_KEY, GRAM FROM {self.trigram_table} "
+                        f"WHERE DOC_KEY IN ({_placeholders(len(chunk))})",
+                        list(chunk),
+                    )
+                    for key, gram in cursor.fetchall():
+                        removed[gram] += 1
+                        docs.add(key)
+                    cursor.execute(
+                        f"DELETE FROM {self.trigram_table} "
+                        f"WHERE DOC_KEY IN ({_placeholders(len(chunk))})",
+                        list(chunk),
+                    )
+            finally:
+                cursor.close()
+            conn.commit()
+        with self._lock:
+            if self._doc_freqs is not None:
+                self._doc_freqs.subtract(removed)
+                self._doc_count -= len(docs)
+
+    def update_documents(self, documents: Iterable[tuple[Any, str | None]]) -> None:
+        """Re-index changed documents given as ``(key, text)`` pairs."""
+        documents = list(documents)
+        self.delete_documents(key for key, _ in documents)
+        self.add_documents(documents)
+
+    def sync_documents(self, keys: Iterable[Any]) -> None:
+        """Bring the index in line with the content table for the given keys.
+
+        Rows that still exist are re-indexed (covering inserts and updates); keys that
+        no longer exist in the content table are removed from the index.
+        """
+        keys = list(keys)
+        found: list[tuple[Any, str | None]] = []
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                for chunk in _chunks(keys):
+                    cursor.execute(
+                        f"SELECT {self.id_column}, {self.content_column} "
+                        f"FROM {self.table_name} "
+                        f"WHERE {self.id_column} IN ({_placeholders(len(chunk))})",
+                        list(chunk),
+                    )
+                    found.extend(cursor.fetchall())
+            finally:
+                cursor.close()
+        self.delete_documents(keys)
+        self.add_documents(found)
+
+    # -- Query ---------------------------------------------------------------
+
+    def load_frequencies(self) -> None:
+        """Read per-trigram document frequencies from the table."""
+        with checkout(self.connection) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT GRAM, COUNT(*) FROM {self.trigram_table} GROUP BY GRAM")
+                doc_freqs = Counter(dict(cursor.fetchall()))
+                cursor.execute(f"SELECT COUNT(DISTINCT DOC_KEY) FROM {self.trigram_table}")
+                doc_count = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+        with self._lock:
+            self._doc_freqs = doc_freqs
+            self._doc_count = doc_count
+
+    def _select_grams(self, term: str) -> list[str] | None:
+        """The term's rarest trigrams, or ``None`` if it cannot be narrowed usefully."""
+        grams = trigrams(term)
+        if not grams:
+            return None
+        if self._doc_freqs is None:
+            self.load_frequencies()
+        with self._lock:
+            assert self._doc_freqs is not None
+            df = self._doc_freqs
+            limit = self.max_df_ratio * self._doc_count
+            selective = [gram for gram in grams if df[gram] <= limit]
+        selective.sort(key=lambda gram: (df[gram], gram))
+        return selective[: self.max_grams] or None
+
+    def narrow_sql(self, terms: list[str], strategy: str = "or") -> tuple[str, list[Any]] | None:
+        """Condition on ``id_column`` keeping rows that may contain the ``terms``.
+
+        With the ``"and"`` strategy every term must be present, so terms that cannot be
+        narrowed (shorter than three characters, or with only frequent trigrams) are
+        left to LOCATE; with ``"or"`` any such term means most rows may match, and
+        ``None`` is returned. Returns the SQL condition and its parameters, or ``None``
+        when nothing is narrowed.
+        """
+        conditions: list[str] = []
+        params: list[Any] = []
+        for term in terms:
+            grams = self._select_grams(term)
+            if grams is None:
+                if strategy == "and":
+                    continue
+                return None
+            conditions.append(
+                f"{self.id_column} IN (SELECT DOC_KEY FROM {self.trigram_table} "
+                f"WHERE GRAM IN ({_placeholders(len(grams))}) "
+                f"GROUP BY DOC_KEY HAVING COUNT(DISTINCT GRAM) = {len(grams)})"
+            )
+            params += grams
+        if not conditions:
+            return None
+        joiner = " AND " if strategy == "and" else " OR "
+        return f"({joiner.join(conditions)})", params
@@ -26,3 +26,21 @@ def hana_connection():
     )
     yield conn
     conn.close()
+
+
+def _locate(haystack, needle):
+    if haystack is None or needle is None:
+        return 0
+    return str(haystack).find(str(needle)) + 1
+
+
+@pytest.fixture
+def sqlite_connection():
+    """SQLite stand-in for a HANA DB-API connection with the SQL functions we use."""
+    import sqlite3
+
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.create_function("LOCATE", 2, _locate, deterministic=True)
+    conn.create_function("TO_NVARCHAR", 1, lambda value: value, deterministic=True)
+    yield conn
+    conn.close()
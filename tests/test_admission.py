@@ -0,0 +1,249 @@
+"""Tests for admission control, deadlines and load shedding."""
+
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.admission import (
+    AdmissionController,
+    DeadlineExceededError,
+    LoadShedError,
+    apply_deadline,
+    deadline,
+    time_left,
+)
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.hybrid import HANAHybridRetriever
+
+DOCS = [(f"Python recipe number {i}", f"{i}.pdf") for i in range(20)]
+
+
+@pytest.fixture
+def connection(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute("CREATE TABLE DOCS (VEC_TEXT NCLOB, SOURCE NVARCHAR(255))")
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?)", DOCS)
+    cursor.close()
+    return sqlite_connection
+
+
+class RecordingConnection:
+    """Records the SQL and query timeouts sent through hdbcli-style cursors."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = []
+        self.timeouts = []
+
+    def cursor(self):
+        cursor = self.conn.cursor()
+        recorder = MagicMock(fetchall=cursor.fetchall, close=cursor.close)
+        recorder.setquerytimeout.side_effect = self.timeouts.append
+
+        def execute(sql, params=()):
+            self.statements.append(sql)
+            return cursor.execute(sql, params)
+
+        recorder.execute.side_effect = execute
+        return recorder
+
+
+def _retriever(connection, **kwargs):
+    return HANABm25Retriever(
+        connection=connection,
+        table_name="DOCS",
+        metadata_columns=["SOURCE"],
+        candidate_limit=20,
+        k=4,
+        **kwargs,
+    )
+
+
+def _hold(controller):
+    """Occupy one slot from another thread until the returned event is set."""
+    release = threading.Event()
+
+    def hold():
+        with controller.slot():
+            release.wait(1.0)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while controller.metrics().in_flight == 0:
+        time.sleep(0.001)
+    return release, holder
+
+
+class TestAdmissionController:
+    def test_bounds_concurrency(self):
+        controller = AdmissionController(max_concurrent=2)
+        peak = 0
+        lock = threading.Lock()
+
+        def work():
+            nonlocal peak
+            with controller.slot():
+                with lock:
+                    peak = max(peak, controller.metrics().in_flight)
+                time.sleep(0.02)
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = controller.metrics()
+        assert peak == 2
+        assert metrics.admitted == 6
+        assert metrics.in_flight == 0 and metrics.queue_depth == 0
+        assert metrics.wait_time > 0
+
+    def test_sheds_when_queue_is_full(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        release, holder = _hold(controller)
+
+        with pytest.raises(LoadShedError, match="queue full"):
+            with controller.slot():
+                pass
+        release.set()
+        holder.join()
+
+        assert controller.metrics().shed == 1
+
+    def test_sheds_when_deadline_passes_in_queue(self):
+        controller = AdmissionController(max_concurrent=1)
+        release, holder = _hold(controller)
+
+        with deadline(0.05), pytest.raises(LoadShedError, match="no slot"):
+            with controller.slot():
+                pass
+        release.set()
+        holder.join()
+
+        metrics = controller.metrics()
+        assert metrics.shed == 1
+        assert metrics.queue_depth == 0 and metrics.in_flight == 0
+
+    def test_nested_calls_reuse_the_slot(self):
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        with controller.slot(), controller.slot():
+            assert controller.metrics().in_flight == 1
+
+    def test_async_waiters_are_served_in_order(self):
+        controller = AdmissionController(max_concurrent=1)
+        order = []
+
+        async def request(name):
+            async with controller.aslot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(*(request(name) for name in "abc"))
+
+        asyncio.run(main())
+
+        assert order == ["a", "b", "c"]
+        assert controller.metrics().admitted == 3
+
+    def test_deadline_nesting_and_statement_timeout(self):
+        cursor = MagicMock()
+        with deadline(10.0):
+            with deadline(60.0):
+                assert time_left() <= 10.0
+                apply_deadline(cursor)
+        cursor.setquerytimeout.assert_called_once_with(10)
+        assert time_left() is None
+
+        with deadline(0.0), pytest.raises(DeadlineExceededError):
+            apply_deadline(cursor)
+
+
+class TestRetrieverAdmission:
+    def test_request_timeout_reaches_statements(self, connection):
+        recording = RecordingConnection(connection)
+        retriever = _retriever(recording, admission=AdmissionController(), request_timeout=30.0)
+
+        docs = retriever.invoke("python recipe")
+
+        assert len(docs) == 4
+        assert recording.timeouts == [30]
+        assert retriever.admission.metrics().admitted == 1
+
+    def test_degrades_candidate_limit_near_deadline(self, connection):
+        recording = RecordingConnection(connection)
+        controller = AdmissionController(degrade_within=60.0)
+        retriever = _retriever(recording, admission=controller, request_timeout=5.0)
+
+        docs = retriever.invoke("python")
+        batched = retriever.batch(["python", "recipe"])
+
+        assert len(docs) == 4 and all(len(result) == 4 for result in batched)
+        assert all(sql.count("LIMIT 5") >= 1 for sql in recording.statements)
+        assert controller.metrics().degraded == {"candidate_limit": 2}
+
+    def test_expired_deadline_is_not_sent(self, connection):
+        recording = RecordingConnection(connection)
+        retriever = _retriever(recording)
+
+        with deadline(0.0), pytest.raises(DeadlineExceededError):
+            retriever.invoke("python")
+        assert recording.statements == []
+
+
+class TestHybridAdmission:
+    def _hybrid(self, **kwargs):
+        vector_store = MagicMock()
+        vector_store.similarity_search.return_value = [Document(page_content="vec")]
+        vector_store.asimilarity_search = AsyncMock(return_value=[Document(page_content="vec")])
+        keyword = MagicMock()
+        keyword.invoke.return_value = [Document(page_content="kw")]
+        keyword.ainvoke = AsyncMock(return_value=[Document(page_content="kw")])
+        return HANAHybridRetriever(vector_store=vector_store, keyword_retriever=keyword, **kwargs)
+
+    def test_runs_degraded_leg_only_near_deadline(self):
+        controller = AdmissionController(degrade_within=60.0)
+        hybrid = self._hybrid(admission=controller, request_timeout=5.0, degraded_leg="keyword")
+
+        results = hybrid.invoke("query")
+        async_results = asyncio.run(hybrid.ainvoke("query"))
+
+        hybrid.vector_store.similarity_search.assert_not_called()
+        hybrid.vector_store.asimilarity_search.assert_not_awaited()
+        assert [d.page_content for d in results] == ["kw"]
+        assert [d.page_content for d in async_results] == ["kw"]
+        assert controller.metrics().degraded == {"keyword_only": 2}
+
+    def test_deadline_caps_leg_timeouts(self):
+        hybrid = self._hybrid(request_timeout=0.05)
+        hybrid.vector_store.similarity_search.side_effect = lambda query, k: time.sleep(0.5)
+
+        start = time.monotonic()
+        results = hybrid.invoke("query")
+
+        assert time.monotonic() - start < 0.4
+        assert [d.page_content for d in results] == ["kw"]
+
+    def test_leg_timeout_reaches_statements(self, connection):
+        recording = RecordingConnection(connection)
+        vector_store = MagicMock()
+        vector_store.similarity_search.return_value = [Document(page_content="vec")]
+        hybrid = HANAHybridRetriever(
+            vector_store=vector_store,
+            keyword_retriever=_retriever(recording),
+            keyword_timeout=5.0,
+        )
+
+        hybrid.invoke("python")
+        hybrid.batch(["python", "recipe"])
+
+        assert recording.timeouts and set(recording.timeouts) == {5}
+
+    def test_rejects_unknown_degraded_leg(self):
+        with pytest.raises(ValueError, match="degraded_leg"):
+            self._hybrid(degraded_leg="sparse")
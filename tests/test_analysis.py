@@ -0,0 +1,111 @@
+"""Tests for the text analysis pipeline."""
+
+import pickle
+from unittest.mock import MagicMock
+
+import pytest
+
+from langchain_hana_retriever.analysis import (
+    Analyzer,
+    english_light_stem,
+    fold_accents,
+    spanish_light_stem,
+)
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.stats import CorpusStats
+
+
+class TestAnalyzer:
+    def test_tokens_keep_repeats(self):
+        analyzer = Analyzer()
+
+        assert analyzer.tokens("Python, python & C_plus a PYTHON") == [
+            "python",
+            "python",
+            "plus",
+            "python",
+        ]
+        assert analyzer.query_tokens("python data python") == ["python", "data"]
+
+    def test_stopwords_by_language_and_explicit(self):
+        assert Analyzer(stopwords="english").tokens("the cat and the hat") == ["cat", "hat"]
+        assert Analyzer(stopwords=["spanish", "gato"]).tokens("el gato y la casa") == ["casa"]
+
+    def test_stemmers(self):
+        assert [english_light_stem(w) for w in ("queries", "boxes", "cats", "glass")] == [
+            "query",
+            "boxe",
+            "cat",
+            "glass",
+        ]
+        assert [spanish_light_stem(w) for w in ("canciones", "luces", "casas", "mes")] == [
+            "cancion",
+            "luz",
+            "casa",
+            "mes",
+        ]
+
+    def test_accent_folding_keeps_enye(self):
+        assert fold_accents("canción española") == "cancion española"
+
+        analyzer = Analyzer(stopwords="spanish", stemmer="spanish", fold_accents=True)
+        assert analyzer.tokens("Las Canciones más españolas") == ["canciones", "españolas"]
+        assert analyzer.terms("Las Canciones más españolas") == ["cancion", "española"]
+        assert analyzer.query_terms(["canción", "canciones"]) == ["cancion"]
+
+    def test_unknown_stemmer(self):
+        with pytest.raises(ValueError):
+            Analyzer(stemmer="klingon")
+
+    def test_counts_memoized_by_key_and_text(self):
+        analyzer = Analyzer()
+
+        first = analyzer.counts("python python data", key=1)
+        assert first == {"python": 2, "data": 1}
+        assert analyzer.counts("python python data", key=1) is first
+        assert analyzer.counts("java", key=1) == {"java": 1}
+
+    def test_pickle_and_equality(self):
+        analyzer = Analyzer(stopwords="english", stemmer="english")
+        analyzer.counts("cached text")
+
+        restored = pickle.loads(pickle.dumps(analyzer))
+
+        assert restored == analyzer
+        assert hash(restored) == hash(analyzer)
+        assert restored != Analyzer()
+        assert restored.terms("The queries") == ["query"]
+
+
+class TestRetrieverAnalysis:
+    def test_term_frequency_affects_ranking(self):
+        conn = MagicMock()
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [
+            ("python notes on tooling", "once.pdf"),
+            ("python python python notes", "thrice.pdf"),
+            ("guide to cooking", "c.pdf"),
+            ("guide to baking", "d.pdf"),
+            ("guide to hiking", "e.pdf"),
+        ]
+        conn.cursor.return_value = cursor
+
+        retriever = HANABm25Retriever(
+            connection=conn, table_name="DOCS", metadata_columns=["SOURCE"]
+        )
+        results = retriever.invoke("python guide")
+
+        assert [d.metadata["SOURCE"] for d in results[:2]] == ["thrice.pdf", "once.pdf"]
+
+    def test_stemmed_query_matches_stats(self):
+        analyzer = Analyzer(stemmer="english")
+        stats = CorpusStats(analyzer=analyzer)
+        stats.add_texts(["many queries", "one query"])
+
+        assert stats.doc_freqs["query"] == 2
+
+    def test_rejects_mismatched_analyzer(self):
+        stats = CorpusStats(analyzer=Analyzer(stemmer="english"))
+
+        with pytest.raises(ValueError, match="analyzer|Analyzer"):
+            HANABm25Retriever(connection=None, table_name="DOCS", corpus_stats=stats)
@@ -1,10 +1,12 @@
 """Tests for HANABm25Retriever with mocked HANA connection."""
 
+import asyncio
 from unittest.mock import MagicMock
 
 import pytest
 
 from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.stats import CorpusStats
 
 
 @pytest.fixture
@@ -114,3 +116,86 @@ class TestHANABm25Retriever:
         sql, params = cursor.execute.call_args[0]
         assert "?" in sql
         assert isinstance(params, list)
+
+    def test_corpus_stats_used_for_scoring(self, mock_connection):
+        rows = [
+            ("Python programming language",),
+            ("Cooking programming",),
+        ]
+        _setup_cursor(mock_connection, rows)
+
+        stats = CorpusStats()
+        stats.add_texts(["Python tutorial"] * 50 + ["Cooking programming"])
+
+        retriever = HANABm25Retriever(
+            connection=mock_connection,
+            table_name="TEST_TABLE",
+            corpus_stats=stats,
+        )
+        results = retriever.invoke("python cooking")
+
+        # "cooking" is rare corpus-wide, so it outweighs the common "python"
+        assert results[0].page_content == "Cooking programming"
+
+    def test_async_matches_sync(self, mock_connection):
+        rows = [
+            ("Python programming with advanced techniques in Python",),
+            ("The quick brown fox",),
+        ]
+        _setup_cursor(mock_connection, rows)
+
+        retriever = HANABm25Retriever(
+            connection=mock_connection,
+            table_name="TEST_TABLE",
+        )
+        sync_results = retriever.invoke("Python programming")
+        async_results = asyncio.run(retriever.ainvoke("Python programming"))
+
+        assert async_results == sync_results
+
+    def test_batch_single_round_trip(self, mock_connection):
+        cursor = _setup_cursor(
+            mock_connection,
+            [
+                (0, "Python programming language"),
+                (1, "Cooking recipes for dinner"),
+                (1, "Python programming language"),
+            ],
+        )
+
+        retriever = HANABm25Retriever(
+            connection=mock_connection,
+            table_name="TEST_TABLE",
+            candidate_limit=7,
+        )
+        results = retriever.batch(["python", "dinner python"])
+
+        cursor.execute.assert_called_once()
+        sql, params = cursor.execute.call_args[0]
+        assert sql.count("UNION ALL") == 1
+        assert sql.count("LIMIT 7") == 2
+        assert params == ["python", "dinner", "python"]
+        assert len(results[0]) == 1
+        assert len(results[1]) == 2
+
+    def test_streaming_uses_fetchmany(self, mock_connection):
+        cursor = MagicMock()
+        cursor.fetchmany.side_effect = [
+            [("Python one",), ("Java two",)],
+            [("Python python three",)],
+            [],
+        ]
+        mock_connection.cursor.return_value = cursor
+
+        retriever = HANABm25Retriever(
+            connection=mock_connection,
+            table_name="TEST_TABLE",
+            fetch_size=2,
+            k=1,
+        )
+        results = retriever.invoke("python")
+
+        cursor.fetchall.assert_not_called()
+        cursor.fetchmany.assert_called_with(2)
+        assert len(results) == 1
+        assert "Python" in results[0].page_content
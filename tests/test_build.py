@@ -0,0 +1,103 @@
+"""Tests for the parallel partitioned index build, run against a SQLite stand-in."""
+
+import pytest
+
+from langchain_hana_retriever.build import ParallelIndexBuilder
+from langchain_hana_retriever.replica import LocalIndexReplica
+
+WORDS = ["python", "java", "data", "science", "cooking", "dinner", "language", "hana"]
+DOCS = [
+    (f"{i:03d}", i, " ".join(WORDS[j % len(WORDS)] for j in range(i, i + 1 + i % 5)), f"{i}.pdf")
+    for i in range(25)
+]
+QUERIES = [["python", "data"], ["hana"], ["cooking", "language", "java"]]
+
+
+@pytest.fixture
+def table(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute(
+        "CREATE TABLE DOCS (ID NVARCHAR(10), TS INTEGER, VEC_TEXT NCLOB, SOURCE NVARCHAR(255))"
+    )
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?, ?, ?)", DOCS)
+    cursor.close()
+    return sqlite_connection
+
+
+def _replica(conn):
+    return LocalIndexReplica(
+        conn, "DOCS", id_column="ID", metadata_columns=["SOURCE"], timestamp_column="TS"
+    )
+
+
+@pytest.fixture
+def expected(table):
+    replica = _replica(table)
+    replica.load()
+    return replica
+
+
+class TestParallelIndexBuilder:
+    def test_partition_bounds_balance_rows(self, table):
+        bounds = ParallelIndexBuilder(_replica(table), partitions=4).partition_bounds()
+
+        assert bounds == ["007", "014", "021"]
+
+    @pytest.mark.parametrize("max_workers", [0, 2])
+    def test_matches_sequential_load(self, table, expected, max_workers):
+        replica = ParallelIndexBuilder(
+            _replica(table), partitions=4, max_workers=max_workers, chunk_size=3
+        ).build()
+
+        assert replica.ready
+        assert replica.metrics().documents == len(DOCS)
+        assert replica.metrics().watermark == 24
+        for query in QUERIES:
+            assert replica.search(query, 5) == expected.search(query, 5)
+
+    def test_reports_progress(self, table):
+        reports = []
+        ParallelIndexBuilder(
+            _replica(table), partitions=3, max_workers=0, progress=reports.append
+        ).build()
+
+        assert [r.partitions_done for r in reports] == [1, 2, 3]
+        assert reports[-1].partitions_total == 3
+        assert reports[-1].rows == len(DOCS)
+
+    def test_resumes_failed_partitions(self, table, expected, tmp_path, monkeypatch):
+        builder = ParallelIndexBuilder(
+            _replica(table), partitions=3, max_workers=0, checkpoint_dir=tmp_path
+        )
+        original = builder._build_partition
+        calls = []
+        failures = [1]
+
+        def flaky(bounds, i, tokenizers):
+            calls.append(i)
+            if i in failures:
+                failures.remove(i)
+                raise ConnectionError("lost connection")
+            return original(bounds, i, tokenizers)
+
+        monkeypatch.setattr(builder, "_build_partition", flaky)
+
+        with pytest.raises(RuntimeError, match=r"\[1\]"):
+            builder.build()
+        assert not builder.replica.ready
+
+        calls.clear()
+        replica = builder.build()
+
+        assert calls == [1]
+        for query in QUERIES:
+            assert replica.search(query, 5) == expected.search(query, 5)
+
+    def test_rejects_checkpoints_of_another_build(self, table, tmp_path):
+        ParallelIndexBuilder(
+            _replica(table), partitions=2, max_workers=0, checkpoint_dir=tmp_path
+        ).build()
+        other = LocalIndexReplica(table, "DOCS", id_column="ID")
+
+        with pytest.raises(ValueError):
+            ParallelIndexBuilder(other, checkpoint_dir=tmp_path).build()
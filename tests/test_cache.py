@@ -0,0 +1,236 @@
+"""Tests for the query result cache."""
+
+import asyncio
+import gc
+import threading
+import time
+import weakref
+from unittest.mock import MagicMock
+
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.cache import QueryCache, table_version_probe
+from langchain_hana_retriever.hybrid import HANAHybridRetriever
+
+
+def _bm25_connection(rows):
+    cursor = MagicMock()
+    cursor.fetchall.return_value = rows
+    conn = MagicMock()
+    conn.cursor.return_value = cursor
+    return conn, cursor
+
+
+class TestQueryCache:
+    def test_lru_eviction(self):
+        cache = QueryCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.metrics().evictions == 1
+
+    def test_ttl_expiry(self):
+        cache = QueryCache(ttl=0.01)
+        cache.put("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert cache.metrics().expirations == 1
+
+    def test_version_probe_invalidates(self):
+        version = [1]
+        cache = QueryCache(version_probe=lambda: version[0], version_check_interval=0.0)
+        cache.put("a", 1)
+        assert cache.get("a") == 1
+
+        version[0] = 2
+        assert cache.get("a") is None
+        assert cache.metrics().invalidations == 1
+
+    def test_single_flight(self):
+        cache = QueryCache()
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return "value"
+
+        results = []
+        owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        owner.start()
+        started.wait()
+        waiters = [
+            threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+            for _ in range(5)
+        ]
+        for thread in waiters:
+            thread.start()
+        for thread in [owner, *waiters]:
+            thread.join()
+
+        assert calls == [1]
+        assert results == ["value"] * 6
+        assert cache.metrics().coalesced == 5
+
+    def test_errors_are_not_cached(self):
+        cache = QueryCache()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        for _ in range(2):
+            try:
+                cache.get_or_compute("k", fail)
+            except RuntimeError:
+                pass
+        assert cache.get_or_compute("k", lambda: "ok") == "ok"
+
+    def test_async_single_flight(self):
+        cache = QueryCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        async def run():
+            return await asyncio.gather(*(cache.aget_or_compute("k", compute) for _ in range(4)))
+
+        assert asyncio.run(run()) == ["value"] * 4
+        assert calls == [1]
+
+    def test_table_version_probe(self):
+        conn, cursor = _bm25_connection([])
+        cursor.fetchone.return_value = (10, "2024-01-01")
+        probe = table_version_probe(conn, "DOCS", timestamp_column="UPDATED_AT")
+
+        assert probe() == (10, "2024-01-01")
+        assert cursor.execute.call_args[0][0] == "SELECT COUNT(*), MAX(UPDATED_AT) FROM DOCS"
+
+
+class TestRetrieverCaching:
+    def test_bm25_repeated_query_hits_cache(self):
+        conn, cursor = _bm25_connection([("Python programming language",)])
+        cache = QueryCache()
+        retriever = HANABm25Retriever(connection=conn, table_name="DOCS", cache=cache)
+
+        first = retriever.invoke("Python programming")
+        second = retriever.invoke("programming, PYTHON!")
+
+        assert first == second
+        assert cursor.execute.call_count == 1
+        assert cache.metrics().hits == 1
+
+    def test_bm25_cached_results_are_copies(self):
+        conn, _ = _bm25_connection([("Python programming language",)])
+        retriever = HANABm25Retriever(connection=conn, table_name="DOCS", cache=QueryCache())
+
+        retriever.invoke("python")[0].metadata["mutated"] = True
+
+        assert "mutated" not in retriever.invoke("python")[0].metadata
+
+    def test_bm25_key_includes_parameters(self):
+        conn, cursor = _bm25_connection([("Python programming language",)])
+        cache = QueryCache()
+        HANABm25Retriever(connection=conn, table_name="DOCS", cache=cache, k=1).invoke("python")
+        HANABm25Retriever(connection=conn, table_name="DOCS", cache=cache, k=2).invoke("python")
+        assert cursor.execute.call_count == 2
+
+    def test_bm25_batch_uses_cache(self):
+        conn, cursor = _bm25_connection([(0, "Python programming language")])
+        cache = QueryCache()
+        retriever = HANABm25Retriever(connection=conn, table_name="DOCS", cache=cache)
+        retriever.batch(["python", "python programming"])
+        cursor.fetchall.return_value = [("Python programming language",)]
+
+        retriever.invoke("python")
+
+        assert cursor.execute.call_count == 1
+
+    def test_hybrid_cache_skips_degraded_results(self):
+        vector_store = MagicMock()
+        keyword_retriever = MagicMock()
+        vector_store.similarity_search.return_value = [Document(page_content="vec")]
+        keyword_retriever.invoke.return_value = [Document(page_content="kw")]
+        cache = QueryCache()
+        hybrid = HANAHybridRetriever(
+            vector_store=vector_store, keyword_retriever=keyword_retriever, cache=cache
+        )
+
+        hybrid.invoke("some query")
+        hybrid.invoke("  some  query ")
+        assert vector_store.similarity_search.call_count == 1
+        hybrid.invoke("Some query?")
+        assert vector_store.similarity_search.call_count == 2
+
+        vector_store.similarity_search.side_effect = lambda query, k: time.sleep(0.2) or []
+        hybrid.vector_timeout = 0.01
+        hybrid.invoke("another query")
+        assert cache.get(hybrid._cache_key("another query", None)) is None
+
+    def test_hybrid_key_includes_settings(self):
+        vector_store = MagicMock()
+        vector_store.similarity_search.return_value = [Document(page_content="vec")]
+        conn, cursor = _bm25_connection([("Python programming language",)])
+        cache = QueryCache()
+
+        def hybrid(k=4, **kwargs):
+            keyword = HANABm25Retriever(connection=conn, table_name="DOCS", k=k)
+            return HANAHybridRetriever(
+                vector_store=vector_store, keyword_retriever=keyword, cache=cache, **kwargs
+            )
+
+        first = hybrid()
+        first.invoke("python")
+        first.invoke(" python ")
+        hybrid(rrf_k=10).invoke("python")
+        hybrid(k=8).invoke("python")
+
+        assert vector_store.similarity_search.call_count == 3
+
+    def test_hybrid_key_keeps_sources_alive(self):
+        # An id is only unique while its object lives, so cached keys hold the sources
+        class VectorStore:
+            def similarity_search(self, query, k):
+                return [Document(page_content="vec")]
+
+        cache = QueryCache()
+        vector_store = VectorStore()
+        keyword_retriever = MagicMock()
+        keyword_retriever.invoke.return_value = []
+        HANAHybridRetriever(
+            vector_store=vector_store, keyword_retriever=keyword_retriever, cache=cache
+        ).invoke("query")
+        store_ref = weakref.ref(vector_store)
+
+        del vector_store
+        gc.collect()
+
+        assert store_ref() is not None
+
+    def test_cached_copies_keep_id_and_nested_metadata(self):
+        cache = QueryCache()
+        vector_store = MagicMock()
+        vector_store.similarity_search.return_value = [
+            Document(id="d1", page_content="vec", metadata={"tags": ["a"]})
+        ]
+        keyword_retriever = MagicMock()
+        keyword_retriever.invoke.return_value = []
+        hybrid = HANAHybridRetriever(
+            vector_store=vector_store, keyword_retriever=keyword_retriever, cache=cache
+        )
+
+        first = hybrid.invoke("query")
+        first[0].metadata["tags"].append("mutated")
+        second = hybrid.invoke("query")
+
+        assert second[0].id == "d1"
+        assert second[0].metadata["tags"] == ["a"]
@@ -0,0 +1,189 @@
+"""Tests for the query-embedding cache and its use in the hybrid retriever."""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.embeddings import EmbeddingCache, model_identity
+from langchain_hana_retriever.hybrid import HANAHybridRetriever
+
+
+class FakeEmbeddings:
+    def __init__(self, model="fake-small"):
+        self.model = model
+        self.query_calls = []
+        self.document_calls = []
+
+    def _vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97) / 7.0, 0.1]
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        self.document_calls.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+
+class TestEmbeddingCache:
+    def test_hits_skip_model(self):
+        cache = EmbeddingCache()
+        embeddings = FakeEmbeddings()
+
+        first = cache.embed_query(embeddings, "what is hana?")
+        second = cache.embed_query(embeddings, "  what is   hana? ")
+
+        assert first == second
+        assert embeddings.query_calls == ["what is hana?"]
+        metrics = cache.metrics()
+        assert (metrics.hits, metrics.misses) == (1, 1)
+        assert metrics.hit_rate == 0.5
+
+    def test_keyed_by_model(self):
+        cache = EmbeddingCache()
+        small, large = FakeEmbeddings("small"), FakeEmbeddings("large")
+
+        cache.embed_query(small, "query")
+        cache.embed_query(large, "query")
+
+        assert small.query_calls == large.query_calls == ["query"]
+        assert model_identity(small) == "FakeEmbeddings:small"
+
+    def test_lru_eviction(self):
+        cache = EmbeddingCache(maxsize=2)
+        embeddings = FakeEmbeddings()
+        for text in ["a", "b", "a", "c", "a", "b"]:
+            cache.embed_query(embeddings, text)
+
+        assert embeddings.query_calls == ["a", "b", "c", "b"]
+        assert cache.metrics().size == 2
+
+    def test_disk_backing_survives_restart(self, tmp_path):
+        path = tmp_path / "embeddings.sqlite"
+        embeddings = FakeEmbeddings()
+        cache = EmbeddingCache(path=path)
+        vector = cache.embed_query(embeddings, "persist me")
+        cache.close()
+
+        reopened = EmbeddingCache(path=path)
+        assert reopened.embed_query(embeddings, "persist me") == vector
+        assert embeddings.query_calls == ["persist me"]
+        assert reopened.metrics().disk_hits == 1
+
+        reopened.clear()
+        reopened.embed_query(embeddings, "persist me")
+        assert len(embeddings.query_calls) == 2
+
+    def test_batch_embeds_distinct_misses_once(self):
+        cache = EmbeddingCache(batch_with_documents=True)
+        embeddings = FakeEmbeddings()
+        cache.embed_query(embeddings, "cached")
+
+        vectors = cache.embed_queries(embeddings, ["new", "cached", "other", "new"])
+
+        assert embeddings.document_calls == [["new", "other"]]
+        assert vectors[0] == vectors[3] == embeddings.embed_query("new")
+        assert cache.metrics().batches == 1
+
+    def test_batch_embeds_misses_as_queries_by_default(self):
+        cache = EmbeddingCache()
+        embeddings = FakeEmbeddings()
+
+        asyncio.run(cache.aembed_queries(embeddings, ["a", "b", "a"]))
+
+        assert embeddings.document_calls == []
+        assert embeddings.query_calls == ["a", "b"]
+
+    def test_async_batch_embeds_misses_concurrently(self):
+        class SlowEmbeddings(FakeEmbeddings):
+            async def aembed_query(self, text):
+                await asyncio.sleep(0.2)
+                return self.embed_query(text)
+
+        cache = EmbeddingCache()
+        start = time.monotonic()
+        asyncio.run(cache.aembed_queries(SlowEmbeddings(), ["a", "b", "c", "d"]))
+
+        assert time.monotonic() - start < 0.6
+
+
+@pytest.fixture
+def vector_store():
+    store = MagicMock()
+    store.embedding = FakeEmbeddings()
+    store.similarity_search_by_vector.return_value = [Document(page_content="vec")]
+    store.asimilarity_search_by_vector = AsyncMock(return_value=[Document(page_content="vec")])
+    return store
+
+
+@pytest.fixture
+def keyword_retriever():
+    retriever = MagicMock()
+    retriever.invoke.return_value = [Document(page_content="kw")]
+    retriever.ainvoke = AsyncMock(return_value=[Document(page_content="kw")])
+    retriever.batch.side_effect = lambda queries, **kwargs: [
+        [Document(page_content="kw")] for _ in queries
+    ]
+    return retriever
+
+
+class TestHybridEmbeddingCache:
+    def test_repeated_query_embeds_once(self, vector_store, keyword_retriever):
+        hybrid = HANAHybridRetriever(
+            vector_store=vector_store,
+            keyword_retriever=keyword_retriever,
+            embedding_cache=EmbeddingCache(),
+        )
+
+        hybrid.invoke("hana vectors")
+        hybrid.invoke("hana vectors")
+        asyncio.run(hybrid.ainvoke("hana vectors"))
+
+        assert vector_store.embedding.query_calls == ["hana vectors"]
+        vector_store.similarity_search.assert_not_called()
+        assert vector_store.similarity_search_by_vector.call_count == 2
+        vector = vector_store.embedding.embed_query("hana vectors")
+        vector_store.asimilarity_search_by_vector.assert_awaited_once_with(vector, k=10)
+
+    def test_batch_embeds_in_one_call(self, vector_store, keyword_retriever):
+        hybrid = HANAHybridRetriever(
+            vector_store=vector_store,
+            keyword_retriever=keyword_retriever,
+            embedding_cache=EmbeddingCache(batch_with_documents=True),
+        )
+
+        results = hybrid.batch(["a query", "b query", "a query"])
+
+        assert len(results) == 3
+        assert vector_store.embedding.document_calls == [["a query", "b query"]]
+        assert vector_store.similarity_search_by_vector.call_count == 3
+
+    def test_cold_batch_stays_within_vector_timeout(self, vector_store, keyword_retriever):
+        class SlowEmbeddings(FakeEmbeddings):
+            def embed_query(self, text):
+                time.sleep(1.0)
+                return super().embed_query(text)
+
+        vector_store.embedding = SlowEmbeddings()
+        hybrid = HANAHybridRetriever(
+            vector_store=vector_store,
+            keyword_retriever=keyword_retriever,
+            embedding_cache=EmbeddingCache(),
+            vector_timeout=0.2,
+        )
+
+        start = time.monotonic()
+        results = hybrid.batch(["a query", "b query", "c query"])
+
+        assert time.monotonic() - start < 0.8
+        assert [[doc.page_content for doc in docs] for docs in results] == [["kw"]] * 3
@@ -0,0 +1,233 @@
+"""Tests for metadata filter compilation and pushdown, run against a SQLite stand-in."""
+
+import datetime
+import sqlite3
+from decimal import Decimal
+
+import pytest
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.cache import QueryCache
+from langchain_hana_retriever.filters import MetadataFilter
+from langchain_hana_retriever.index import HANAPostingsIndex
+from langchain_hana_retriever.replica import LocalIndexReplica
+
+DOCS = [
+    ("1", "acme", 2019, "Python programming language", "a.pdf"),
+    ("2", "acme", 2022, "Python data science with Python", "b.pdf"),
+    ("3", "globex", 2021, "Python web programming", "c.pdf"),
+    ("4", "globex", 2023, "Java programming language", "d.pdf"),
+    ("5", None, 2024, "Python scripting", "e.pdf"),
+]
+COLUMNS = ["TENANT", "YEAR", "SOURCE"]
+
+FILTERS = [
+    {"TENANT": "acme"},
+    {"TENANT": {"$ne": "acme"}},
+    {"YEAR": {"$gt": 2019, "$lt": 2023}},
+    {"YEAR": {"$gte": 2022}, "TENANT": {"$in": ["acme", "globex"]}},
+    {"SOURCE": {"$nin": ["a.pdf", "b.pdf"]}},
+    {"YEAR": {"$between": [2020, 2022]}},
+    {"$or": [{"TENANT": "globex"}, {"SOURCE": "a.pdf"}]},
+    {"$and": [{"TENANT": {"$in": []}}]},
+]
+
+
+@pytest.fixture
+def table(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute(
+        "CREATE TABLE DOCS (ID NVARCHAR(10), TENANT NVARCHAR(20), YEAR INTEGER, "
+        "VEC_TEXT NCLOB, SOURCE NVARCHAR(255))"
+    )
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?, ?, ?, ?)", DOCS)
+    cursor.close()
+    return sqlite_connection
+
+
+def _sql_ids(conn, where):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT ID FROM DOCS WHERE {where.sql} ORDER BY ID", where.params)
+    ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return ids
+
+
+def _sources(docs):
+    return sorted(doc.metadata["SOURCE"] for doc in docs)
+
+
+class TestMetadataFilter:
+    @pytest.mark.parametrize("spec", FILTERS)
+    def test_sql_and_python_agree(self, table, spec):
+        where = MetadataFilter(spec)
+        in_python = [
+            key
+            for key, tenant, year, _, source in DOCS
+            if where.matches({"TENANT": tenant, "YEAR": year, "SOURCE": source})
+        ]
+
+        assert _sql_ids(table, where) == in_python
+
+    def test_compiles_parameterized_sql(self):
+        where = MetadataFilter({"TENANT": "acme", "YEAR": {"$in": [2021, 2022]}})
+
+        assert where.sql == "((TENANT = ?) AND (YEAR IN (?, ?)))"
+        assert where.params == ["acme", 2021, 2022]
+        assert where.columns == {"TENANT", "YEAR"}
+
+    @pytest.mark.parametrize(
+        "spec",
+        [
+            {},
+            {"TENANT; DROP TABLE DOCS": "x"},
+            {"TENANT": {"$regex": "a.*"}},
+            {"$not": [{"TENANT": "acme"}]},
+            {"$or": []},
+            {"YEAR": {"$in": 2021}},
+            {"YEAR": {"$between": [1]}},
+            {"TENANT": ["acme"]},
+        ],
+    )
+    def test_rejects_invalid(self, spec):
+        with pytest.raises(ValueError):
+            MetadataFilter(spec)
+
+    def test_coerce_combines_with_and(self):
+        where = MetadataFilter.coerce({"TENANT": "acme"}, None, {"YEAR": 2022})
+
+        assert where == MetadataFilter({"$and": [{"TENANT": "acme"}, {"YEAR": 2022}]})
+        assert MetadataFilter.coerce(None, {}) is None
+
+    def test_accepts_decimal_values(self):
+        where = MetadataFilter({"PRICE": {"$lte": Decimal("9.99")}})
+
+        assert where.params == [Decimal("9.99")]
+        assert where.matches({"PRICE": Decimal("4.50")})
+        assert not where.matches({"PRICE": 12})
+
+
+class TestFilterPushdown:
+    @pytest.fixture
+    def retriever(self, table):
+        return HANABm25Retriever(connection=table, table_name="DOCS", metadata_columns=COLUMNS)
+
+    def test_filter_applies_before_limit(self, table):
+        retriever = HANABm25Retriever(
+            connection=table, table_name="DOCS", metadata_columns=COLUMNS, candidate_limit=1
+        )
+
+        docs = retriever.invoke("python", filter={"TENANT": "globex"})
+
+        assert _sources(docs) == ["c.pdf"]
+
+    def test_default_filter_combines_with_call_filter(self, table):
+        retriever = HANABm25Retriever(
+            connection=table,
+            table_name="DOCS",
+            metadata_columns=COLUMNS,
+            filter={"TENANT": "acme"},
+        )
+
+        assert _sources(retriever.invoke("python")) == ["a.pdf", "b.pdf"]
+        assert _sources(retriever.invoke("python", filter={"YEAR": {"$gt": 2020}})) == ["b.pdf"]
+
+    def test_invalid_default_filter_fails_fast(self, table):
+        with pytest.raises(ValueError):
+            HANABm25Retriever(connection=table, table_name="DOCS", filter={"A": {"$bad": 1}})
+
+    @pytest.mark.parametrize(
+        "options",
+        [{"two_phase": True, "id_column": "ID"}, {"fetch_size": 2}, {"candidate_limit": 50}],
+    )
+    def test_all_sql_paths_filter(self, table, options):
+        retriever = HANABm25Retriever(
+            connection=table, table_name="DOCS", metadata_columns=COLUMNS, **options
+        )
+
+        docs = retriever.invoke("python programming", filter={"YEAR": {"$lt": 2022}})
+
+        assert _sources(docs) == ["a.pdf", "c.pdf"]
+
+    def test_batch_filter(self, retriever):
+        where = {"TENANT": {"$in": ["globex"]}}
+        batched = retriever.batch(["python", "programming"], filter=where)
+
+        assert [_sources(docs) for docs in batched] == [["c.pdf"], ["c.pdf", "d.pdf"]]
+        assert batched == [retriever.invoke(q, filter=where) for q in ["python", "programming"]]
+
+    def test_filter_is_part_of_cache_key(self, table):
+        retriever = HANABm25Retriever(
+            connection=table, table_name="DOCS", metadata_columns=COLUMNS, cache=QueryCache()
+        )
+
+        acme = retriever.invoke("python", filter={"TENANT": "acme"})
+        globex = retriever.invoke("python", filter={"TENANT": "globex"})
+
+        assert _sources(acme) == ["a.pdf", "b.pdf"]
+        assert _sources(globex) == ["c.pdf"]
+
+    def test_postings_index_filter(self, table):
+        index = HANAPostingsIndex(table, "DOCS", id_column="ID")
+        index.create()
+        index.build()
+        retriever = HANABm25Retriever(
+            connection=table, table_name="DOCS", metadata_columns=COLUMNS, postings_index=index
+        )
+
+        docs = retriever.invoke("python", filter={"YEAR": {"$gte": 2022}})
+
+        assert _sources(docs) == ["b.pdf", "e.pdf"]
+
+    def test_replica_filter(self, table):
+        replica = LocalIndexReplica(table, "DOCS", id_column="ID", metadata_columns=COLUMNS)
+        replica.load()
+        retriever = HANABm25Retriever(
+            connection=table, table_name="DOCS", metadata_columns=COLUMNS, replica=replica
+        )
+        where = {"$or": [{"TENANT": "globex"}, {"YEAR": 2019}]}
+
+        assert _sources(retriever.invoke("programming", filter=where)) == [
+            "a.pdf",
+            "c.pdf",
+            "d.pdf",
+        ]
+        # Columns outside the replica's rows are answered by SQL
+        assert _sources(retriever.invoke("python", filter={"ID": "3"})) == ["c.pdf"]
+
+    def test_replica_filter_on_date_column(self):
+        sqlite3.register_converter("DATE", lambda raw: datetime.date.fromisoformat(raw.decode()))
+        conn = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.execute(
+            "CREATE TABLE DOCS (ID NVARCHAR(10), PUBLISHED DATE, VEC_TEXT NCLOB, "
+            "SOURCE NVARCHAR(255))"
+        )
+        conn.executemany(
+            "INSERT INTO DOCS VALUES (?, ?, ?, ?)",
+            [
+                ("1", "2024-01-15", "Python release notes", "a.pdf"),
+                ("2", "2024-03-01", "Python typing notes", "b.pdf"),
+                ("3", "2024-06-30", "Python roadmap", "c.pdf"),
+            ],
+        )
+        columns = ["PUBLISHED", "SOURCE"]
+        replica = LocalIndexReplica(conn, "DOCS", id_column="ID", metadata_columns=columns)
+        replica.load()
+        retriever = HANABm25Retriever(
+            connection=conn, table_name="DOCS", metadata_columns=columns, replica=replica
+        )
+
+        assert isinstance(replica.search(["python"], 1)[0][0][1], datetime.date)
+        for spec, expected in [
+            ({"PUBLISHED": {"$gte": "2024-03-01"}}, ["b.pdf", "c.pdf"]),
+            ({"PUBLISHED": "2024-03-01"}, ["b.pdf"]),
+            ({"PUBLISHED": {"$lt": datetime.date(2024, 3, 1)}}, ["a.pdf"]),
+            ({"PUBLISHED": {"$gt": "2024-03-01T12:00:00"}}, ["c.pdf"]),
+            (
+                {"PUBLISHED": {"$between": ["2024-01-01", datetime.datetime(2024, 3, 1)]}},
+                ["a.pdf", "b.pdf"],
+            ),
+            ({"PUBLISHED": {"$in": ["2024-06-30", "not a date"]}}, ["c.pdf"]),
+        ]:
+            assert _sources(retriever.invoke("python", filter=spec)) == expected
+        conn.close()
@@ -0,0 +1,109 @@
+"""Tests for the rank fusion engine."""
+
+import pytest
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.fusion import document_identity, fuse, normalize_scores
+from langchain_hana_retriever.utils import reciprocal_rank_fusion
+
+
+def _doc(content, **metadata):
+    return Document(page_content=content, metadata=metadata)
+
+
+def _contents(docs):
+    return [doc.page_content for doc in docs]
+
+
+class TestFuse:
+    def test_rrf_matches_reference(self):
+        list_a = [_doc("a"), _doc("b"), _doc("c")]
+        list_b = [_doc("c"), _doc("d"), _doc("a")]
+
+        fused = fuse([list_a, list_b], k=4, weights=[0.7, 0.3])
+        reference = reciprocal_rank_fusion([list_a, list_b], weights=[0.7, 0.3], k=4)
+
+        assert _contents(fused) == _contents(reference)
+
+    def test_annotates_ranks_and_score(self):
+        fused = fuse(
+            [[_doc("a"), _doc("b")], [_doc("b")]], k=2, sources=["vector", "keyword"], rrf_k=0
+        )
+
+        assert fused[0].page_content == "b"
+        assert fused[0].metadata["fusion_ranks"] == {"vector": 2, "keyword": 1}
+        assert fused[0].metadata["fusion_score"] == pytest.approx(1 / 2 + 1 / 1)
+        assert fused[1].metadata["fusion_ranks"] == {"vector": 1}
+
+    def test_does_not_mutate_inputs(self):
+        doc = _doc("a", source="x")
+
+        fused = fuse([[doc]], k=1)
+        unannotated = fuse([[doc]], k=1, annotate=False)
+
+        assert doc.metadata == {"source": "x"}
+        assert fused[0] is not doc
+        assert unannotated[0] is doc
+
+    def test_identity_by_metadata_key(self):
+        # Same text in two rows stays two results; same key merges across lists
+        list_a = [_doc("same text", ID=1), _doc("same text", ID=2)]
+        list_b = [_doc("other text of row 2", ID=2)]
+
+        fused = fuse([list_a, list_b], k=5, identity="ID")
+
+        assert [doc.metadata["ID"] for doc in fused] == [2, 1]
+        assert len(fuse([list_a, list_b], k=5)) == 2
+
+    def test_identity_falls_back_to_id_then_content(self):
+        with_id = Document(id="pk-1", page_content="text")
+
+        assert document_identity(with_id, "ID") == ("id", "pk-1")
+        assert document_identity(_doc("text"), "ID") == ("content", "text")
+        assert document_identity(_doc("text"), lambda d: len(d.page_content)) == 4
+
+    def test_combsum_uses_normalized_scores(self):
+        vector = [_doc("a", score=0.9), _doc("b", score=0.8), _doc("c", score=0.1)]
+        keyword = [_doc("c", bm25=12.0), _doc("b", bm25=11.0), _doc("a", bm25=1.0)]
+
+        fused = fuse(
+            [vector, keyword], k=3, method="combsum", score_keys=["score", "bm25"], annotate=True
+        )
+
+        # Normalized: a = 1.0 + 0.0, b = 0.875 + 0.909, c = 0.0 + 1.0
+        assert _contents(fused) == ["b", "a", "c"]
+        assert fused[0].metadata["fusion_score"] == pytest.approx(0.875 + 10 / 11)
+
+    def test_combmnz_rewards_overlap(self):
+        list_a = [_doc("a", s=1.0), _doc("b", s=0.9)]
+        list_b = [_doc("b", s=0.5)]
+
+        combsum = fuse([list_a, list_b], k=2, method="combsum", score_keys=["s", "s"])
+        combmnz = fuse([list_a, list_b], k=2, method="combmnz", score_keys=["s", "s"])
+
+        # Both sum to 1.0 (a tie kept in first-seen order); CombMNZ doubles b
+        assert _contents(combsum) == ["a", "b"]
+        assert _contents(combmnz) == ["b", "a"]
+        assert combmnz[0].metadata["fusion_score"] == pytest.approx(2 * (0.0 + 1.0))
+
+    def test_missing_scores_fall_back_to_rank(self):
+        fused = fuse([[_doc("a"), _doc("b"), _doc("c")]], k=3, method="combsum")
+
+        assert _contents(fused) == ["a", "b", "c"]
+
+    def test_rejects_mismatched_lengths(self):
+        with pytest.raises(ValueError):
+            fuse([[_doc("a")], [_doc("b")]], k=1, weights=[1.0])
+
+
+class TestNormalizeScores:
+    def test_minmax(self):
+        assert normalize_scores([2.0, 4.0, 3.0], "minmax") == [0.0, 1.0, 0.5]
+        assert normalize_scores([5.0, 5.0], "minmax") == [1.0, 1.0]
+
+    def test_zscore(self):
+        scores = normalize_scores([1.0, 2.0, 3.0], "zscore")
+
+        assert sum(scores) == pytest.approx(0.0)
+        assert scores[2] == pytest.approx(1.224744871)
+        assert normalize_scores([1.0, 1.0], "zscore") == [0.0, 0.0]
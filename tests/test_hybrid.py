@@ -1,10 +1,14 @@
 """Tests for HANAHybridRetriever with mocked components."""
 
-from unittest.mock import MagicMock
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from langchain_core.documents import Document
 
+from langchain_hana_retriever.cache import QueryCache
+from langchain_hana_retriever.executor import DEFAULT_MAX_WORKERS, set_max_workers, submit
 from langchain_hana_retriever.hybrid import HANAHybridRetriever
 
 
@@ -97,3 +101,292 @@ class TestHANAHybridRetriever:
         results = retriever.invoke("test")
 
         assert results == []
+
+    def test_sync_leg_timeout_degrades(self, mock_vector_store, mock_keyword_retriever):
+        def slow_search(query, k):
+            time.sleep(0.5)
+            return [Document(page_content="vec1")]
+
+        mock_vector_store.similarity_search.side_effect = slow_search
+        mock_keyword_retriever.invoke.return_value = [Document(page_content="kw1")]
+
+        retriever = _make_hybrid(mock_vector_store, mock_keyword_retriever)
+        retriever.vector_timeout = 0.05
+        results = retriever.invoke("test")
+
+        assert [r.page_content for r in results] == ["kw1"]
+
+
+class TestHANAHybridRetrieverAsync:
+    def test_async_merges_results(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.asimilarity_search = AsyncMock(
+            return_value=[Document(page_content="vec1"), Document(page_content="shared")]
+        )
+        mock_keyword_retriever.ainvoke = AsyncMock(
+            return_value=[Document(page_content="shared"), Document(page_content="kw1")]
+        )
+
+        retriever = _make_hybrid(mock_vector_store, mock_keyword_retriever)
+        results = asyncio.run(retriever.ainvoke("test query"))
+
+        assert results[0].page_content == "shared"
+        mock_vector_store.similarity_search.assert_not_called()
+        mock_keyword_retriever.invoke.assert_not_called()
+
+    def test_async_legs_run_concurrently(self, mock_vector_store, mock_keyword_retriever):
+        async def slow(docs):
+            await asyncio.sleep(0.2)
+            return docs
+
+        mock_vector_store.asimilarity_search = MagicMock(
+            side_effect=lambda query, k: slow([Document(page_content="vec1")])
+        )
+        mock_keyword_retriever.ainvoke = MagicMock(
+            side_effect=lambda query: slow([Document(page_content="kw1")])
+        )
+
+        retriever = _make_hybrid(mock_vector_store, mock_keyword_retriever)
+        start = time.monotonic()
+        results = asyncio.run(retriever.ainvoke("test"))
+
+        assert len(results) == 2
+        assert time.monotonic() - start < 0.35
+
+    def test_async_leg_timeout_degrades(self, mock_vector_store, mock_keyword_retriever):
+        async def hang(query):
+            await asyncio.sleep(5)
+            return [Document(page_content="kw1")]
+
+        mock_vector_store.asimilarity_search = AsyncMock(
+            return_value=[Document(page_content="vec1")]
+        )
+        mock_keyword_retriever.ainvoke = MagicMock(side_effect=hang)
+
+        retriever = _make_hybrid(mock_vector_store, mock_keyword_retriever)
+        retriever.keyword_timeout = 0.05
+        results = asyncio.run(retriever.ainvoke("test"))
+
+        assert [r.page_content for r in results] == ["vec1"]
+
+
+class TestHANAHybridRetrieverBatch:
+    def test_batch_uses_keyword_batch(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.similarity_search.side_effect = lambda query, k: [
+            Document(page_content=f"vec-{query}")
+        ]
+        mock_keyword_retriever.batch.return_value = [
+            [Document(page_content="kw-a")],
+            [Document(page_content="kw-b")],
+        ]
+
+        retriever = _make_hybrid(mock_vector_store, mock_keyword_retriever)
+        results = retriever.batch(["a", "b"])
+
+        mock_keyword_retriever.batch.assert_called_once_with(["a", "b"])
+        mock_keyword_retriever.invoke.assert_not_called()
+        assert {d.page_content for d in results[0]} == {"vec-a", "kw-a"}
+        assert {d.page_content for d in results[1]} == {"vec-b", "kw-b"}
+
+    def test_abatch_uses_keyword_abatch(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.asimilarity_search = AsyncMock(
+            return_value=[Document(page_content="vec")]
+        )
+        mock_keyword_retriever.abatch = AsyncMock(
+            return_value=[[Document(page_content="kw-a")], [Document(page_content="kw-b")]]
+        )
+
+        retriever = _make_hybrid(mock_vector_store, mock_keyword_retriever)
+        results = asyncio.run(retriever.abatch(["a", "b"]))
+
+        mock_keyword_retriever.abatch.assert_awaited_once_with(["a", "b"])
+        assert {d.page_content for d in results[1]} == {"vec", "kw-b"}
+
+
+class TestHybridFilter:
+    def test_forwards_filter_to_both_legs(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.similarity_search.return_value = [Document(page_content="v")]
+        mock_keyword_retriever.invoke.return_value = [Document(page_content="k")]
+        retriever = HANAHybridRetriever(
+            vector_store=mock_vector_store,
+            keyword_retriever=mock_keyword_retriever,
+            filter={"TENANT": "acme"},
+        )
+
+        retriever.invoke("query", filter={"YEAR": {"$gte": 2020}})
+
+        expected = {"$and": [{"TENANT": "acme"}, {"YEAR": {"$gte": 2020}}]}
+        mock_vector_store.similarity_search.assert_called_once_with("query", k=10, filter=expected)
+        mock_keyword_retriever.invoke.assert_called_once_with("query", filter=expected)
+
+    def test_batch_forwards_filter(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.similarity_search.return_value = []
+        mock_keyword_retriever.batch.return_value = [[], []]
+        retriever = _make_hybrid(mock_vector_store, mock_keyword_retriever)
+
+        retriever.batch(["a", "b"], filter={"TENANT": "acme"})
+
+        mock_keyword_retriever.batch.assert_called_once_with(["a", "b"], filter={"TENANT": "acme"})
+        assert all(
+            call.kwargs["filter"] == {"TENANT": "acme"}
+            for call in mock_vector_store.similarity_search.call_args_list
+        )
+
+    def test_filter_is_part_of_cache_key(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.similarity_search.return_value = []
+        mock_keyword_retriever.invoke.return_value = [Document(page_content="k")]
+        retriever = HANAHybridRetriever(
+            vector_store=mock_vector_store,
+            keyword_retriever=mock_keyword_retriever,
+            cache=QueryCache(),
+        )
+
+        retriever.invoke("query", filter={"TENANT": "acme"})
+        retriever.invoke("query", filter={"TENANT": "globex"})
+        retriever.invoke("query", filter={"TENANT": "acme"})
+
+        assert mock_keyword_retriever.invoke.call_count == 2
+
+
+class TestHybridFusion:
+    def _retriever(self, contents):
+        retriever = MagicMock()
+        retriever.invoke.return_value = [Document(page_content=c) for c in contents]
+        return retriever
+
+    def test_fuses_retriever_list(self):
+        legs = [self._retriever(["a", "b"]), self._retriever(["b"]), self._retriever(["c", "a"])]
+        retriever = HANAHybridRetriever(
+            retrievers=legs, weights=[1.0, 1.0, 0.5], sources=["dense", "bm25", "sparse"], k=3
+        )
+
+        results = retriever.invoke("query")
+
+        # b: 1/62 + 1/61 beats a: 1/61 + 0.5/62
+        assert [d.page_content for d in results] == ["b", "a", "c"]
+        assert results[1].metadata["fusion_ranks"] == {"dense": 1, "sparse": 2}
+        for leg in legs:
+            leg.invoke.assert_called_once_with("query")
+
+    def test_combmnz_reads_bm25_score(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.similarity_search.return_value = [
+            Document(page_content="v1"),
+            Document(page_content="shared"),
+        ]
+        mock_keyword_retriever.invoke.return_value = [
+            Document(page_content="shared", metadata={"bm25_score": 9.0}),
+            Document(page_content="k1", metadata={"bm25_score": 1.0}),
+        ]
+        retriever = HANAHybridRetriever(
+            vector_store=mock_vector_store,
+            keyword_retriever=mock_keyword_retriever,
+            fusion="combmnz",
+        )
+
+        results = retriever.invoke("query")
+
+        assert results[0].page_content == "shared"
+        assert results[0].metadata["fusion_ranks"] == {"vector": 2, "keyword": 1}
+
+    def test_nested_hybrid_runs_inline_on_a_pool_worker(self):
+        def inner(contents):
+            legs = [self._retriever(contents), self._retriever(contents[::-1])]
+            for leg in legs:
+                leg.batch.side_effect = lambda queries, leg=leg, **kwargs: [
+                    leg.invoke.return_value for _ in queries
+                ]
+            return HANAHybridRetriever(retrievers=legs, k=3)
+
+        outer = HANAHybridRetriever(retrievers=[inner(["a", "b"]), inner(["b", "c"])], k=3)
+        set_max_workers(2)
+        try:
+            nested = submit(outer.invoke, "query").result(timeout=5)
+            batched = submit(outer.batch, ["query"]).result(timeout=5)
+        finally:
+            set_max_workers(DEFAULT_MAX_WORKERS)
+
+        assert [d.page_content for d in nested] == [d.page_content for d in batched[0]]
+        assert [d.page_content for d in nested] == [d.page_content for d in outer.invoke("query")]
+
+    def test_rejects_mixed_configuration(self, mock_vector_store, mock_keyword_retriever):
+        with pytest.raises(ValueError):
+            HANAHybridRetriever(
+                vector_store=mock_vector_store,
+                keyword_retriever=mock_keyword_retriever,
+                retrievers=[mock_keyword_retriever],
+            )
+        with pytest.raises(ValueError):
+            HANAHybridRetriever(retrievers=[self._retriever([])], weights=[1.0, 2.0])
+
+
+def _scored(*scores):
+    return [
+        Document(page_content=f"kw{i}", metadata={"bm25_score": score})
+        for i, score in enumerate(scores)
+    ]
+
+
+class TestHybridCascade:
+    def _cascade(self, vector_store, keyword_retriever, **kwargs):
+        return HANAHybridRetriever(
+            vector_store=vector_store,
+            keyword_retriever=keyword_retriever,
+            k=10,
+            cascade=True,
+            **kwargs,
+        )
+
+    @pytest.mark.parametrize(
+        ("scores", "decision", "depth"),
+        [
+            ((9.0, 2.0, 1.0), "skip", None),
+            ((4.0, 2.0), "shallow", 5),
+            ((4.0, 3.5), "deep", 20),
+            ((), "deep", 20),
+            ((0.2,), "deep", 20),
+            ((5.0, 0.0), "deep", 20),
+        ],
+    )
+    def test_margin_decides_vector_depth(
+        self, mock_vector_store, mock_keyword_retriever, scores, decision, depth
+    ):
+        mock_vector_store.similarity_search.return_value = [Document(page_content="vec")]
+        mock_keyword_retriever.invoke.return_value = _scored(*scores)
+        retriever = self._cascade(mock_vector_store, mock_keyword_retriever, vector_k=20)
+
+        results = retriever.invoke("query")
+
+        if depth is None:
+            mock_vector_store.similarity_search.assert_not_called()
+        else:
+            mock_vector_store.similarity_search.assert_called_once_with("query", k=depth)
+        assert results[0].metadata["cascade"]["decision"] == decision
+        assert retriever.cascade_counts == {decision: 1}
+
+    def test_async_skips_vector_leg(self, mock_vector_store, mock_keyword_retriever):
+        mock_vector_store.asimilarity_search = AsyncMock(return_value=[])
+        mock_keyword_retriever.ainvoke = AsyncMock(return_value=_scored(9.0, 1.0))
+        retriever = self._cascade(mock_vector_store, mock_keyword_retriever)
+
+        results = asyncio.run(retriever.ainvoke("ERR-4711"))
+
+        mock_vector_store.asimilarity_search.assert_not_awaited()
+        assert results[0].metadata["cascade"] == {"decision": "skip", "margin": 9.0, "vector_k": 0}
+
+    def test_batch_runs_vector_leg_only_where_needed(
+        self, mock_vector_store, mock_keyword_retriever
+    ):
+        mock_vector_store.similarity_search.side_effect = lambda query, k: [
+            Document(page_content=f"vec-{query}")
+        ]
+        mock_keyword_retriever.batch.return_value = [_scored(9.0, 1.0), _scored(2.0, 1.9)]
+        retriever = self._cascade(mock_vector_store, mock_keyword_retriever)
+
+        results = retriever.batch(["ERR-4711", "how to configure"])
+
+        mock_vector_store.similarity_search.assert_called_once_with("how to configure", k=10)
+        assert "vec-how to configure" in {d.page_content for d in results[1]}
+        assert retriever.cascade_counts == {"skip": 1, "deep": 1}
+
+    def test_rejects_single_statement(self, mock_vector_store, mock_keyword_retriever):
+        with pytest.raises(ValueError, match="cascade"):
+            self._cascade(mock_vector_store, mock_keyword_retriever, single_statement=True)
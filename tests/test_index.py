@@ -0,0 +1,305 @@
+"""Tests for the postings index, run against a SQLite stand-in."""
+
+import asyncio
+import math
+
+import pytest
+from rank_bm25 import BM25Okapi
+
+from langchain_hana_retriever.analysis import DEFAULT_ANALYZER, Analyzer
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.index import MAX_TERM_LENGTH, HANAPostingsIndex
+from langchain_hana_retriever.scoring import BM25Scorer
+from langchain_hana_retriever.stats import CorpusStats
+
+DOCS = [
+    ("1", "Python programming language", "a.pdf"),
+    ("2", "Java programming language", "b.pdf"),
+    ("3", "Python data science with Python", "c.pdf"),
+    ("4", "Cooking recipes for dinner", "d.pdf"),
+]
+
+
+@pytest.fixture
+def index(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute("CREATE TABLE DOCS (ID NVARCHAR(10), VEC_TEXT NCLOB, SOURCE NVARCHAR(255))")
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?, ?)", DOCS)
+    cursor.close()
+
+    postings_index = HANAPostingsIndex(sqlite_connection, "DOCS", id_column="ID")
+    postings_index.create()
+    postings_index.build(batch_size=2)
+    return postings_index
+
+
+def _term_stats(conn, index):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT TERM, DF FROM {index.terms_table}")
+    terms = dict(cursor.fetchall())
+    cursor.execute(f"SELECT DOC_COUNT, TOTAL_LENGTH FROM {index.meta_table}")
+    meta = cursor.fetchone()
+    cursor.close()
+    return terms, meta
+
+
+class TestHANAPostingsIndex:
+    def test_build_populates_tables(self, sqlite_connection, index):
+        terms, meta = _term_stats(sqlite_connection, index)
+        assert terms["python"] == 2
+        assert terms["programming"] == 2
+        assert meta == (4, sum(len(DEFAULT_ANALYZER.terms(text)) for _, text, _ in DOCS))
+
+    def test_sql_scores_match_corpus_stats(self, index):
+        stats = CorpusStats()
+        stats.add_texts(text for _, text, _ in DOCS)
+        query = ["python", "programming"]
+
+        rows = index.search(query, ["ID", "VEC_TEXT"], k=10)
+
+        expected = stats.score(query, [DEFAULT_ANALYZER.terms(text) for _, text, _ in DOCS])
+        by_id = {doc_id: score for (doc_id, _, _), score in zip(DOCS, expected, strict=True)}
+        assert rows[0][0] == max(by_id, key=by_id.__getitem__)
+        for doc_id, _, score in rows:
+            assert score == pytest.approx(by_id[doc_id])
+
+    def test_search_respects_k(self, index):
+        rows = index.search(["programming", "python"], ["ID"], k=1)
+        assert len(rows) == 1
+
+    def test_incremental_matches_rebuild(self, sqlite_connection, index):
+        cursor = sqlite_connection.cursor()
+        cursor.execute("INSERT INTO DOCS VALUES ('5', 'Rust programming', 'e.pdf')")
+        cursor.execute("UPDATE DOCS SET VEC_TEXT = 'Baking bread' WHERE ID = '4'")
+        cursor.execute("DELETE FROM DOCS WHERE ID = '2'")
+        cursor.close()
+
+        index.sync_documents(["5", "4", "2"])
+        incremental = _term_stats(sqlite_connection, index)
+
+        index.build()
+        rebuilt = _term_stats(sqlite_connection, index)
+
+        assert incremental == rebuilt
+        assert "cooking" not in incremental[0]
+        assert incremental[0]["programming"] == 2
+
+    def test_delete_unknown_key_is_noop(self, sqlite_connection, index):
+        before = _term_stats(sqlite_connection, index)
+        index.delete_documents(["missing"])
+        assert _term_stats(sqlite_connection, index) == before
+
+    def test_empty_documents_do_not_leak_into_stats(self, sqlite_connection, index):
+        before = _term_stats(sqlite_connection, index)
+        index.add_documents([("5", ""), ("6", None), ("7", "!!!")])
+        assert _term_stats(sqlite_connection, index) == before
+
+        index.delete_documents(["5", "6", "7"])
+        assert _term_stats(sqlite_connection, index) == before
+
+    def test_update_is_atomic(self, sqlite_connection, index, monkeypatch):
+        before = _term_stats(sqlite_connection, index)
+
+        def fail(conn, documents):
+            raise RuntimeError("insert failed")
+
+        monkeypatch.setattr(index, "_add", fail)
+        with pytest.raises(RuntimeError, match="insert failed"):
+            index.update_documents([("1", "Python programming language")])
+        assert _term_stats(sqlite_connection, index) == before
+
+    def test_skips_terms_longer_than_column(self, sqlite_connection, index):
+        blob = "x" * (MAX_TERM_LENGTH + 1)
+        index.add_documents([("5", f"python {blob}")])
+
+        terms, meta = _term_stats(sqlite_connection, index)
+        assert blob not in terms
+        assert terms["python"] == 3
+        assert meta[1] == sum(len(DEFAULT_ANALYZER.terms(text)) for _, text, _ in DOCS) + 2
+        assert index.search([blob], ["ID"], k=5) == []
+
+    @pytest.mark.parametrize("variant", ["okapi", "plus", "l"])
+    def test_sql_scores_follow_variant(self, index, variant):
+        stats = CorpusStats()
+        stats.add_texts(text for _, text, _ in DOCS)
+        query = ["python", "programming"]
+
+        rows = index.search(query, ["ID"], k=10, k1=1.2, b=0.5, variant=variant)
+
+        scorer = BM25Scorer(variant, k1=1.2, b=0.5)
+        documents = [DEFAULT_ANALYZER.terms(text) for _, text, _ in DOCS]
+        expected = scorer.score(query, documents, idf=stats.idf, avgdl=stats.avgdl)
+        by_id = {doc_id: score for (doc_id, _, _), score in zip(DOCS, expected, strict=True)}
+        for doc_id, score in rows:
+            assert score == pytest.approx(by_id[doc_id])
+
+
+class TestRetrieverWithPostingsIndex:
+    def test_retriever_uses_index(self, sqlite_connection, index):
+        retriever = HANABm25Retriever(
+            connection=sqlite_connection,
+            table_name="DOCS",
+            metadata_columns=["SOURCE"],
+            postings_index=index,
+            k=2,
+        )
+        results = retriever.invoke("Python science")
+
+        assert results[0].metadata["SOURCE"] == "c.pdf"
+        assert len(results) == 2
+        scores = [doc.metadata["bm25_score"] for doc in results]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_locate_path_runs_on_sqlite(self, sqlite_connection, index):
+        retriever = HANABm25Retriever(connection=sqlite_connection, table_name="DOCS")
+        results = retriever.invoke("cooking")
+
+        corpus = [DEFAULT_ANALYZER.terms("Cooking recipes for dinner")]
+        assert results[0].metadata["bm25_score"] == pytest.approx(
+            BM25Okapi(corpus).get_scores(["cooking"])[0]
+        )
+
+
+class TestBatchRetrieval:
+    def test_batch_matches_invoke(self, sqlite_connection, index):
+        retriever = HANABm25Retriever(
+            connection=sqlite_connection,
+            table_name="DOCS",
+            metadata_columns=["SOURCE"],
+        )
+        queries = ["python programming", "cooking dinner", "!!!", "java"]
+
+        batched = retriever.batch(queries)
+
+        assert batched == [retriever.invoke(query) for query in queries]
+        assert batched[2] == []
+
+    def test_abatch_matches_batch(self, sqlite_connection, index):
+        retriever = HANABm25Retriever(connection=sqlite_connection, table_name="DOCS")
+        queries = ["python", "language"]
+
+        assert asyncio.run(retriever.abatch(queries)) == retriever.batch(queries)
+
+    def test_batch_rejects_unknown_kwargs(self, sqlite_connection, index):
+        retriever = HANABm25Retriever(connection=sqlite_connection, table_name="DOCS")
+
+        with pytest.raises(TypeError, match="arguments: k"):
+            retriever.batch(["python"], k=1)
+        with pytest.raises(TypeError, match="arguments: k"):
+            asyncio.run(retriever.abatch(["python"], k=1))
+
+
+class TestTwoPhaseRetrieval:
+    def test_requires_id_column(self, sqlite_connection):
+        with pytest.raises(ValueError):
+            HANABm25Retriever(connection=sqlite_connection, table_name="DOCS", two_phase=True)
+
+    def test_fetches_content_only_for_top_k(self, sqlite_connection, index):
+        statements = []
+        sqlite_connection.set_trace_callback(statements.append)
+        retriever = HANABm25Retriever(
+            connection=sqlite_connection,
+            table_name="DOCS",
+            metadata_columns=["SOURCE"],
+            id_column="ID",
+            two_phase=True,
+            k=1,
+        )
+
+        results = retriever.invoke("python language")
+
+        assert len(results) == 1
+        assert results[0].metadata["SOURCE"] == "a.pdf"
+        phase_one, phase_two = statements[-2:]
+        assert "VEC_TEXT, SOURCE" not in phase_one
+        assert "WHERE ID IN ('1')" in phase_two
+        # Docs 2 and 3 were candidates but their content was never transferred
+        assert retriever.characters_saved == len(DOCS[1][1]) + len(DOCS[2][1])
+
+    def test_scores_term_frequency_with_corpus_length(self, sqlite_connection, index):
+        statements = []
+        sqlite_connection.set_trace_callback(statements.append)
+        retriever = HANABm25Retriever(
+            connection=sqlite_connection, table_name="DOCS", id_column="ID", two_phase=True, k=2
+        )
+
+        results = retriever.invoke("python")
+        retriever.invoke("python")
+
+        # Doc 3 mentions python twice; match flags alone would favour the shorter doc 1
+        assert [d.page_content for d in results] == [DOCS[2][1], DOCS[0][1]]
+        avgdl = sum(len(text.split()) for _, text, _ in DOCS) / len(DOCS)
+        norm = 1 - 0.75 + 0.75 * 5 / avgdl
+        idf = math.log(1 + (2 - 2 + 0.5) / (2 + 0.5))
+        assert results[0].metadata["bm25_score"] == pytest.approx(idf * 2 * 2.5 / (2 + 1.5 * norm))
+        assert sum("AVG(" in sql for sql in statements) == 1
+
+    def test_ranking_matches_single_phase_order(self, sqlite_connection, index):
+        kwargs = {"connection": sqlite_connection, "table_name": "DOCS", "k": 4}
+        single = HANABm25Retriever(**kwargs).invoke("cooking dinner recipes")
+        two_phase = HANABm25Retriever(**kwargs, id_column="ID", two_phase=True).invoke(
+            "cooking dinner recipes"
+        )
+        assert [d.page_content for d in two_phase] == [d.page_content for d in single]
+
+    def test_counts_words_like_the_analyzer(self, sqlite_connection):
+        texts = [
+            "Java, java and JavaScript: javascript everywhere.",
+            "Servers (java) - two servers, one server.",
+            "My server; the java server!",
+            "Javanese   cooking\nwith coconuts",
+        ]
+        cursor = sqlite_connection.cursor()
+        cursor.execute("CREATE TABLE DOCS (ID NVARCHAR(10), VEC_TEXT NCLOB)")
+        cursor.executemany("INSERT INTO DOCS VALUES (?, ?)", list(enumerate(texts)))
+        cursor.close()
+        analyzer = Analyzer(stemmer="english")
+        stats = CorpusStats(analyzer=analyzer)
+        stats.add_texts(texts)
+        kwargs = {
+            "connection": sqlite_connection,
+            "table_name": "DOCS",
+            "analyzer": analyzer,
+            "corpus_stats": stats,
+            "k": 4,
+        }
+
+        single = HANABm25Retriever(**kwargs).invoke("java servers")
+        two_phase = HANABm25Retriever(**kwargs, id_column="ID", two_phase=True).invoke(
+            "java servers"
+        )
+
+        # Substrings (javascript, javanese) do not count; plurals count as the analyzer stems
+        assert [d.page_content for d in two_phase] == [d.page_content for d in single]
+        assert [d.metadata["bm25_score"] for d in two_phase] == pytest.approx(
+            [d.metadata["bm25_score"] for d in single]
+        )
+
+
+class TestStreamingRetrieval:
+    def test_matches_fetchall_with_corpus_stats(self, sqlite_connection, index):
+        stats = CorpusStats()
+        stats.add_texts(text for _, text, _ in DOCS)
+        kwargs = {
+            "connection": sqlite_connection,
+            "table_name": "DOCS",
+            "metadata_columns": ["SOURCE"],
+            "corpus_stats": stats,
+            "k": 2,
+        }
+
+        expected = HANABm25Retriever(**kwargs).invoke("python programming language")
+        streamed = HANABm25Retriever(**kwargs, fetch_size=1).invoke("python programming language")
+
+        assert streamed == expected
+
+    def test_running_statistics(self, sqlite_connection, index):
+        retriever = HANABm25Retriever(
+            connection=sqlite_connection, table_name="DOCS", fetch_size=2, k=3
+        )
+        results = retriever.invoke("python programming")
+
+        assert len(results) == 3
+        scores = [doc.metadata["bm25_score"] for doc in results]
+        assert scores == sorted(scores, reverse=True)
+        assert results[0].page_content == "Python programming language"
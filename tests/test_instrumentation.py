@@ -0,0 +1,167 @@
+"""Tests for per-stage instrumentation of the retrievers."""
+
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.hybrid import HANAHybridRetriever
+from langchain_hana_retriever.instrumentation import PROFILE_EVENT, Instrumentation, count
+
+DOCS = [
+    ("Python programming language", "a.pdf"),
+    ("Java programming language", "b.pdf"),
+    ("Python data science", "c.pdf"),
+    ("Cooking recipes for dinner", "d.pdf"),
+]
+
+
+@pytest.fixture
+def connection(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute("CREATE TABLE DOCS (VEC_TEXT NCLOB, SOURCE NVARCHAR(255))")
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?)", DOCS)
+    cursor.close()
+    return sqlite_connection
+
+
+class Recorder(BaseCallbackHandler):
+    def __init__(self):
+        self.events = []
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        self.events.append((name, data))
+
+
+class TestInstrumentation:
+    def test_percentiles_over_profiles(self):
+        instrumentation = Instrumentation()
+        for _ in range(3):
+            with instrumentation.profile("bm25"), instrumentation.stage("sql"):
+                count("rows", 2)
+
+        stats = instrumentation.stats()
+
+        assert stats["sql"].count == stats["bm25"].count == 3
+        assert stats["sql"].p50 <= stats["sql"].p99 <= stats["sql"].max
+        assert instrumentation.counters() == {"rows": 6}
+        instrumentation.reset()
+        assert instrumentation.stats() == {}
+
+    def test_stages_are_summed_and_not_double_counted(self):
+        instrumentation = Instrumentation()
+
+        with instrumentation.profile("bm25") as record:
+            for _ in range(2):
+                with instrumentation.stage("fetch"), instrumentation.stage("fetch"):
+                    pass
+
+        assert list(record.timings) == ["fetch"]
+        assert instrumentation.stats()["fetch"].count == 1
+
+    def test_stage_outside_profile_is_sampled(self):
+        instrumentation = Instrumentation(window=2)
+        for _ in range(3):
+            with instrumentation.stage("score"):
+                pass
+
+        assert instrumentation.stats()["score"].count == 2
+
+    def test_span_hook(self):
+        spans = []
+
+        @contextmanager
+        def span_hook(name, attributes):
+            span = MagicMock()
+            spans.append((name, span))
+            yield span
+
+        instrumentation = Instrumentation(span_hook=span_hook)
+        with instrumentation.profile("hybrid"), instrumentation.stage("fusion"):
+            count("rows", 5)
+
+        assert [name for name, _ in spans] == ["hybrid", "hybrid.fusion"]
+        spans[0][1].set_attribute.assert_any_call("rows", 5)
+
+
+class TestBm25Instrumentation:
+    def test_profiles_sql_path(self, connection):
+        instrumentation = Instrumentation()
+        recorder = Recorder()
+        retriever = HANABm25Retriever(
+            connection=connection,
+            table_name="DOCS",
+            metadata_columns=["SOURCE"],
+            instrumentation=instrumentation,
+            include_timings=True,
+        )
+
+        results = retriever.invoke("python", config={"callbacks": [recorder]})
+
+        timings = results[0].metadata["timings"]
+        assert {"tokenize", "sql", "fetch", "analyze", "score"} <= set(timings["stages_ms"])
+        assert timings["counters"]["rows"] == 2
+        assert timings["counters"]["candidates"] == 2
+        assert timings["counters"]["bytes"] == sum(
+            len(text) + len(source) for text, source in DOCS if "Python" in text
+        )
+        assert recorder.events == [(PROFILE_EVENT, timings)]
+        assert instrumentation.stats()["bm25"].count == 1
+
+    def test_batch_and_async(self, connection):
+        instrumentation = Instrumentation()
+        recorder = Recorder()
+        retriever = HANABm25Retriever(
+            connection=connection, table_name="DOCS", instrumentation=instrumentation
+        )
+
+        retriever.batch(["python", "java"], config={"callbacks": [recorder]})
+        results = asyncio.run(retriever.ainvoke("dinner"))
+
+        assert len(recorder.events) == 2
+        assert "timings" not in results[0].metadata
+        stats = instrumentation.stats()
+        assert stats["bm25"].count == 2
+        assert stats["sql"].count == 2
+
+
+class TestHybridInstrumentation:
+    def test_profiles_legs_and_fusion(self):
+        vector_store = MagicMock()
+        vector_store.similarity_search.return_value = [Document(page_content="v")]
+        keyword = MagicMock()
+        keyword.invoke.return_value = [Document(page_content="k")]
+        instrumentation = Instrumentation()
+        retriever = HANAHybridRetriever(
+            vector_store=vector_store,
+            keyword_retriever=keyword,
+            instrumentation=instrumentation,
+            include_timings=True,
+        )
+
+        results = retriever.invoke("query")
+
+        stages = results[0].metadata["timings"]["stages_ms"]
+        assert set(stages) == {"vector", "keyword", "fusion"}
+        assert set(instrumentation.stats()) == {"vector", "keyword", "fusion", "hybrid"}
+
+    def test_shared_instrumentation_profiles_keyword_leg(self, connection):
+        instrumentation = Instrumentation()
+        vector_store = MagicMock()
+        vector_store.similarity_search.return_value = []
+        keyword = HANABm25Retriever(
+            connection=connection, table_name="DOCS", instrumentation=instrumentation
+        )
+        retriever = HANAHybridRetriever(
+            vector_store=vector_store, keyword_retriever=keyword, instrumentation=instrumentation
+        )
+
+        retriever.invoke("python")
+
+        stats = instrumentation.stats()
+        assert stats["hybrid"].count == stats["bm25"].count == 1
+        assert stats["sql"].count == 1
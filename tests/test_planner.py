@@ -0,0 +1,111 @@
+"""Tests for the selectivity-aware query planner."""
+
+import pytest
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.planner import QueryPlanner
+from langchain_hana_retriever.stats import CorpusStats
+
+DOCS = [
+    "python programming language",
+    "java programming language",
+    "python data science",
+    "cooking recipes for dinner",
+]
+
+
+@pytest.fixture
+def stats():
+    corpus = CorpusStats()
+    corpus.add_texts(DOCS)
+    return corpus
+
+
+@pytest.fixture
+def table(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute("CREATE TABLE DOCS (ID NVARCHAR(10), VEC_TEXT NCLOB)")
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?)", [(str(i), t) for i, t in enumerate(DOCS)])
+    cursor.close()
+    return sqlite_connection
+
+
+class TestQueryPlanner:
+    def test_orders_terms_by_document_frequency(self, stats):
+        plan = QueryPlanner(max_df_ratio=1.0).plan(["programming", "cooking"], 50, stats)
+
+        assert plan.terms == ["cooking", "programming"]
+        assert plan.strategy == "or"
+        assert plan.order_by_matches
+
+    def test_drops_stopwords_and_frequent_terms(self, stats):
+        plan = QueryPlanner(max_df_ratio=0.4).plan(["the", "language", "dinner"], 50, stats)
+
+        assert plan.terms == ["dinner"]
+        assert set(plan.dropped) == {"the", "language"}
+
+    def test_never_returns_empty_plan(self):
+        plan = QueryPlanner().plan(["the", "of"], 50)
+
+        assert plan.terms == ["the"]
+        assert plan.dropped == ["of"]
+
+    def test_falls_back_to_length_without_stats(self):
+        plan = QueryPlanner(max_terms=2).plan(["ab", "abcd", "abc"], 50)
+
+        assert plan.terms == ["abcd", "abc"]
+        assert plan.dropped == ["ab"]
+        assert plan.estimated_matches is None
+
+    def test_chooses_and_when_estimate_reaches_limit(self, stats):
+        plan = QueryPlanner(max_df_ratio=1.0).plan(["programming", "language"], 1, stats)
+
+        # 4 docs * (2/4) * (2/4)
+        assert plan.estimated_matches == pytest.approx(1.0)
+        assert plan.strategy == "and"
+        assert not plan.order_by_matches
+
+
+class TestRetrieverWithPlanner:
+    def test_limit_keeps_best_matching_rows(self, table):
+        retriever = HANABm25Retriever(
+            connection=table,
+            table_name="DOCS",
+            candidate_limit=1,
+            planner=QueryPlanner(),
+            include_plan=True,
+        )
+
+        results = retriever.invoke("java language")
+
+        # Without ordering, LIMIT 1 would keep the first row that mentions "language"
+        assert results[0].page_content == "java programming language"
+        assert results[0].metadata["query_plan"]["order_by_matches"]
+
+    def test_and_plan_widens_to_or_when_too_few_rows(self, table, stats):
+        retriever = HANABm25Retriever(
+            connection=table,
+            table_name="DOCS",
+            corpus_stats=stats,
+            candidate_limit=1,
+            k=3,
+            planner=QueryPlanner(max_df_ratio=1.0),
+            include_plan=True,
+        )
+
+        results = retriever.invoke("programming language")
+
+        assert len(results) == 1
+        assert results[0].metadata["query_plan"]["strategy"] == "or"
+
+    def test_batch_matches_invoke(self, table, stats):
+        retriever = HANABm25Retriever(
+            connection=table,
+            table_name="DOCS",
+            corpus_stats=stats,
+            planner=QueryPlanner(),
+            include_plan=True,
+        )
+        queries = ["python programming", "the dinner", "java"]
+
+        assert retriever.batch(queries) == [retriever.invoke(q) for q in queries]
@@ -0,0 +1,106 @@
+"""Tests for the hdbcli connection pool."""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.pool import HANAConnectionPool, PoolTimeoutError, checkout
+
+
+def _factory(rows=()):
+    def make():
+        conn = MagicMock()
+        conn.isconnected.return_value = True
+        conn.cursor.return_value.fetchall.return_value = list(rows)
+        return conn
+
+    return make
+
+
+class TestHANAConnectionPool:
+    def test_min_size_opened_eagerly(self):
+        factory = MagicMock(side_effect=_factory())
+        pool = HANAConnectionPool(factory, min_size=2, max_size=4)
+        assert factory.call_count == 2
+        assert pool.metrics().idle == 2
+
+    def test_reuses_released_connections(self):
+        pool = HANAConnectionPool(_factory(), min_size=0, max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            assert pool.metrics().in_use == 1
+        assert first is second
+        assert pool.metrics().size == 1
+
+    def test_checkout_timeout(self):
+        pool = HANAConnectionPool(_factory(), min_size=0, max_size=1)
+        held = pool.acquire()
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire(timeout=0.05)
+        pool.release(held)
+        metrics = pool.metrics()
+        assert metrics.timeouts == 1
+        assert metrics.in_use == 0
+
+    def test_waiter_gets_released_connection(self):
+        pool = HANAConnectionPool(_factory(), min_size=0, max_size=1)
+        held = pool.acquire()
+        threading.Timer(0.05, pool.release, args=[held]).start()
+
+        conn = pool.acquire(timeout=1.0)
+
+        assert conn is held
+        metrics = pool.metrics()
+        assert metrics.waits == 1
+        assert metrics.wait_time > 0
+
+    def test_stale_connection_replaced(self):
+        pool = HANAConnectionPool(_factory(), min_size=1, max_size=1, health_check_interval=0.0)
+        with pool.connection() as conn:
+            conn.isconnected.return_value = False
+        time.sleep(0.01)
+        with pool.connection() as replacement:
+            assert replacement is not conn
+        conn.close.assert_called_once()
+        assert pool.metrics().reconnects == 1
+
+    def test_broken_connection_discarded_on_error(self):
+        pool = HANAConnectionPool(_factory(), min_size=0, max_size=1)
+        with pytest.raises(RuntimeError):
+            with pool.connection() as conn:
+                conn.isconnected.return_value = False
+                raise RuntimeError("connection lost")
+        assert pool.metrics().size == 0
+        conn.close.assert_called_once()
+
+    def test_checkout_plain_connection(self):
+        conn = MagicMock()
+        with checkout(conn) as checked_out:
+            assert checked_out is conn
+
+    def test_retrievers_share_pool_concurrently(self):
+        pool = HANAConnectionPool(
+            _factory([("Python programming language",)]), min_size=0, max_size=3
+        )
+        retriever = HANABm25Retriever(connection=pool, table_name="TEST_TABLE")
+        results = []
+
+        def run():
+            results.append(retriever.invoke("python"))
+
+        threads = [threading.Thread(target=run) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 10
+        assert all(len(docs) == 1 for docs in results)
+        metrics = pool.metrics()
+        assert metrics.in_use == 0
+        assert metrics.checkouts == 10
+        assert metrics.size <= 3
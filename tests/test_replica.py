@@ -0,0 +1,226 @@
+"""Tests for the in-process index replica, run against a SQLite stand-in."""
+
+import random
+import threading
+
+import pytest
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.index import HANAPostingsIndex
+from langchain_hana_retriever.replica import LocalIndexReplica
+
+DOCS = [
+    ("1", 1, "Python programming language", "a.pdf"),
+    ("2", 1, "Java programming language", "b.pdf"),
+    ("3", 2, "Python data science with Python", "c.pdf"),
+    ("4", 3, "Cooking recipes for dinner", "d.pdf"),
+]
+
+
+@pytest.fixture
+def table(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute(
+        "CREATE TABLE DOCS (ID NVARCHAR(10), TS INTEGER, VEC_TEXT NCLOB, SOURCE NVARCHAR(255))"
+    )
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?, ?, ?)", DOCS)
+    cursor.close()
+    return sqlite_connection
+
+
+@pytest.fixture
+def replica(table):
+    replica = LocalIndexReplica(
+        table,
+        "DOCS",
+        id_column="ID",
+        metadata_columns=["SOURCE"],
+        timestamp_column="TS",
+        batch_size=2,
+    )
+    replica.load()
+    return replica
+
+
+def _execute(conn, sql, params=()):
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    cursor.close()
+
+
+class TestLocalIndexReplica:
+    def test_scores_match_postings_index(self, table, replica):
+        postings_index = HANAPostingsIndex(table, "DOCS", id_column="ID")
+        postings_index.create()
+        postings_index.build()
+
+        expected = postings_index.search(["python", "language"], ["VEC_TEXT", "SOURCE"], 4)
+        results = replica.search(["python", "language"], 4)
+
+        assert [row for row, _ in results] == [tuple(row[:-1]) for row in expected]
+        assert [score for _, score in results] == pytest.approx([row[-1] for row in expected])
+
+    def test_sync_applies_inserts_and_updates(self, table, replica):
+        _execute(table, "INSERT INTO DOCS VALUES ('5', 4, 'Rust systems programming', 'e.pdf')")
+        _execute(table, "UPDATE DOCS SET VEC_TEXT = 'Baking bread', TS = 4 WHERE ID = '4'")
+
+        changed = replica.sync()
+
+        assert changed == 2
+        assert replica.search(["rust"], 1)[0][0] == ("Rust systems programming", "e.pdf")
+        assert replica.search(["cooking"], 1) == []
+        assert replica.metrics().watermark == 4
+
+    def test_sync_skips_unchanged_rows_at_watermark(self, replica):
+        assert replica.sync() == 0
+        assert replica.sync() == 0
+
+        metrics = replica.metrics()
+        assert metrics.documents == 4
+        assert replica._dead == 0
+
+    def test_load_partitions_matches_load(self, table, replica):
+        merged = LocalIndexReplica(
+            table, "DOCS", id_column="ID", metadata_columns=["SOURCE"], timestamp_column="TS"
+        )
+        merged.load_partitions(
+            [merged.partition(DOCS[:2]), merged.partition(DOCS[2:]), merged.partition([])]
+        )
+
+        assert merged.ready
+        assert merged.metrics().watermark == 3
+        assert merged.metrics().postings == replica.metrics().postings
+        for query in (["python"], ["python", "programming"], ["dinner", "java"]):
+            assert merged.search(query, 4) == replica.search(query, 4)
+
+    def test_search_scores_outside_the_lock(self, replica):
+        writers = []
+
+        def accept(row):
+            # A writer must get through while the query is scoring
+            writer = threading.Thread(target=replica.delete_documents, args=(["2"],))
+            writer.start()
+            writer.join(1.0)
+            writers.append(writer.is_alive())
+            return True
+
+        results = replica.search(["programming"], 4, accept=accept, prune=False)
+
+        assert writers and not any(writers)
+        assert {row[1] for row, _ in results} == {"a.pdf", "b.pdf"}
+        assert replica.search(["java"], 4) == []
+
+    def test_delete_and_reconcile(self, table, replica):
+        _execute(table, "DELETE FROM DOCS WHERE ID = '2'")
+
+        assert replica.reconcile() == 1
+        assert replica.search(["java"], 4) == []
+        assert replica.metrics().documents == 3
+
+    def test_compaction_preserves_results(self, table, replica):
+        replica.delete_documents(["4"])
+        replica.delete_documents(["2"])
+
+        metrics = replica.metrics()
+        assert metrics.documents == 2
+        assert metrics.terms == len(
+            {"python", "programming", "language", "data", "science", "with"}
+        )
+
+        _execute(table, "DELETE FROM DOCS WHERE ID IN ('2', '4')")
+        fresh = LocalIndexReplica(table, "DOCS", id_column="ID", metadata_columns=["SOURCE"])
+        fresh.load()
+        for query in (["python"], ["python", "programming"], ["java"]):
+            assert replica.search(query, 4) == fresh.search(query, 4)
+
+    def test_pruned_search_matches_exhaustive(self, table):
+        rng = random.Random(0)
+        words = [f"w{i}" for i in range(60)]
+        weights = [1 / (rank + 1) for rank in range(60)]
+        rows = [
+            (f"r{i}", 5, " ".join(rng.choices(words, weights=weights, k=rng.randint(1, 25))), "")
+            for i in range(500)
+        ]
+        table.executemany("INSERT INTO DOCS VALUES (?, ?, ?, ?)", rows)
+        replica = LocalIndexReplica(table, "DOCS", id_column="ID", metadata_columns=["SOURCE"])
+        replica.load()
+        replica.delete_documents([f"r{i}" for i in range(0, 500, 9)])
+
+        def accept(row):
+            return len(row[0]) % 2 == 0
+
+        for _ in range(20):
+            query = rng.sample(words, rng.randint(2, 8))
+            for k, filter_ in ((1, None), (10, None), (10, accept)):
+                assert replica.search(query, k, accept=filter_) == replica.search(
+                    query, k, accept=filter_, prune=False
+                )
+
+    def test_metrics(self, replica):
+        metrics = replica.metrics()
+
+        assert metrics.ready
+        assert metrics.documents == 4
+        assert metrics.postings == 3 + 3 + 4 + 4
+        assert metrics.memory_bytes > sum(len(text) for _, _, text, _ in DOCS)
+        assert metrics.sync_lag is not None and metrics.sync_lag >= 0
+
+    def test_background_thread_loads(self, table):
+        replica = LocalIndexReplica(table, "DOCS", id_column="ID", timestamp_column="TS")
+        replica.start(interval=0.01)
+        try:
+            for _ in range(200):
+                if replica.ready:
+                    break
+                replica._stop.wait(0.01)
+        finally:
+            replica.stop()
+
+        assert replica.ready
+        assert replica.metrics().sync_errors == 0
+
+
+class TestRetrieverWithReplica:
+    def test_falls_back_to_sql_while_warming(self, table):
+        replica = LocalIndexReplica(table, "DOCS", id_column="ID", metadata_columns=["SOURCE"])
+        retriever = HANABm25Retriever(
+            connection=table, table_name="DOCS", metadata_columns=["SOURCE"], replica=replica
+        )
+
+        cold = retriever.invoke("cooking")
+        replica.load()
+        warm = retriever.invoke("cooking")
+
+        assert [d.page_content for d in cold] == [d.page_content for d in warm]
+        assert warm[0].metadata["SOURCE"] == "d.pdf"
+
+    def test_rejects_mismatched_columns(self, table):
+        replica = LocalIndexReplica(table, "DOCS", id_column="ID")
+        with pytest.raises(ValueError):
+            HANABm25Retriever(
+                connection=table, table_name="DOCS", metadata_columns=["SOURCE"], replica=replica
+            )
+
+    def test_scores_with_retriever_parameters(self, table, replica):
+        postings_index = HANAPostingsIndex(table, "DOCS", id_column="ID")
+        postings_index.create()
+        postings_index.build()
+        kwargs = {"connection": table, "table_name": "DOCS", "metadata_columns": ["SOURCE"]}
+
+        expected = HANABm25Retriever(**kwargs, postings_index=postings_index, k1=0.9, b=0.3)
+        served = HANABm25Retriever(**kwargs, replica=replica, k1=0.9, b=0.3)
+
+        scores = [d.metadata["bm25_score"] for d in served.invoke("python language")]
+        assert scores == pytest.approx(
+            [d.metadata["bm25_score"] for d in expected.invoke("python language")]
+        )
+
+    def test_rejects_other_variants(self, table, replica):
+        with pytest.raises(ValueError, match="okapi"):
+            HANABm25Retriever(
+                connection=table,
+                table_name="DOCS",
+                metadata_columns=["SOURCE"],
+                replica=replica,
+                bm25_variant="plus",
+            )
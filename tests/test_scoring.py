@@ -0,0 +1,200 @@
+"""Tests for the vectorized BM25 scoring engine."""
+
+import math
+import random
+
+import numpy as np
+import pytest
+from rank_bm25 import BM25Okapi
+
+from langchain_hana_retriever.scoring import (
+    BM25Scorer,
+    TermMatrix,
+    TermPostings,
+    bm25_term_scores,
+    bm25_upper_bound,
+    maxscore_top_k,
+    top_k,
+)
+from langchain_hana_retriever.utils import tokenize
+
+CORPUS = [
+    tokenize(text)
+    for text in [
+        "Python programming language",
+        "Java programming language",
+        "Python data science",
+        "Cooking recipes for dinner",
+        "Python python programming tips",
+    ]
+]
+
+
+def _random_corpus(seed, n_docs=200, vocab=50):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab)]
+    return [rng.choices(words, k=rng.randint(0, 30)) for _ in range(n_docs)]
+
+
+class TestBM25Scorer:
+    @pytest.mark.parametrize("query", [["python"], ["python", "programming"], ["missing"]])
+    def test_okapi_matches_rank_bm25(self, query):
+        expected = BM25Okapi(CORPUS).get_scores(query)
+        np.testing.assert_allclose(BM25Scorer().score(query, CORPUS), expected)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_okapi_matches_rank_bm25_with_tf(self, seed):
+        corpus = _random_corpus(seed)
+        query = ["w1", "w2", "w7", "w1", "zzz"]
+        expected = BM25Okapi(corpus, k1=1.2, b=0.6).get_scores(query)
+        np.testing.assert_allclose(BM25Scorer(k1=1.2, b=0.6).score(query, corpus), expected)
+
+    def test_external_statistics(self):
+        scores = BM25Scorer(k1=1.0, b=0.0).score(["python"], CORPUS, idf={"python": 2.0})
+        # b=0 removes length normalization: idf * tf * (k1 + 1) / (tf + k1)
+        assert scores[0] == pytest.approx(2.0 * 1 * 2 / (1 + 1))
+        assert scores[3] == 0.0
+
+        callable_scores = BM25Scorer().score(["python"], CORPUS, idf=lambda t: 1.0, avgdl=3.0)
+        assert callable_scores[0] == pytest.approx(1.0 * 2.5 / (1 + 1.5 * (0.25 + 0.75)))
+
+    def test_plus_and_l_variants(self):
+        docs = [["a", "a", "b"], ["b"]]
+        idf = {"a": 1.0}
+        k1, b = 1.5, 0.75
+        norm = 1 - b + b * 3 / 2.0
+
+        plus = BM25Scorer("plus", k1=k1, b=b, delta=1.0).score(["a"], docs, idf=idf)
+        assert plus[0] == pytest.approx(1.0 + 2 * (k1 + 1) / (k1 * norm + 2))
+        assert plus[1] == 0.0
+
+        ctd = 2 / norm
+        bm25l = BM25Scorer("l", k1=k1, b=b, delta=0.5).score(["a"], docs, idf=idf)
+        assert bm25l[0] == pytest.approx((k1 + 1) * (ctd + 0.5) / (k1 + ctd + 0.5))
+        assert bm25l[1] == 0.0
+
+    def test_unknown_variant(self):
+        with pytest.raises(ValueError):
+            BM25Scorer("bm42")
+
+    def test_empty_documents(self):
+        assert len(BM25Scorer().score(["a"], [])) == 0
+
+    def test_term_matrix_encoding(self):
+        matrix = TermMatrix.encode([["a", "b", "a"], [], ["c"]], {"a": 0, "c": 1})
+        assert matrix.indptr.tolist() == [0, 1, 1, 2]
+        assert matrix.indices.tolist() == [0, 1]
+        assert matrix.data.tolist() == [2.0, 1.0]
+        assert matrix.doc_len.tolist() == [3.0, 0.0, 1.0]
+
+
+class TestTopK:
+    @pytest.mark.parametrize("k", [0, 1, 3, 10, 50])
+    def test_matches_stable_sort(self, k):
+        rng = np.random.default_rng(0)
+        scores = rng.integers(0, 5, size=30).astype(float)
+        expected = sorted(range(30), key=lambda i: scores[i], reverse=True)[:k]
+        assert top_k(scores, k).tolist() == expected
+
+    def test_empty(self):
+        assert top_k(np.zeros(0), 3).tolist() == []
+
+
+def _zipf_postings(seed, n_docs=2000, vocab=300):
+    """Postings, lengths and average length of a Zipf corpus, with duplicated documents."""
+    rng = random.Random(seed)
+    words = list(range(vocab))
+    weights = [1 / (rank + 1) for rank in words]
+    docs = [rng.choices(words, weights=weights, k=rng.randint(1, 40)) for _ in range(n_docs)]
+    docs += docs[:50]  # exact score ties
+    postings = {}
+    for d, doc in enumerate(docs):
+        for term in set(doc):
+            postings.setdefault(term, []).append((d, doc.count(term)))
+    doc_len = np.array([len(doc) for doc in docs], dtype=np.int32)
+    return postings, doc_len, float(doc_len.mean())
+
+
+def _term(entries, n_docs, doc_len, avgdl):
+    doc_ids = np.array([d for d, _ in entries], dtype=np.int32)
+    tfs = np.array([tf for _, tf in entries], dtype=np.int32)
+    idf = math.log(1.0 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+    bound = bm25_upper_bound(idf, tfs.max(), doc_len[doc_ids].min(), avgdl, 1.5, 0.75)
+    return TermPostings(doc_ids, tfs, idf, bound)
+
+
+def _exhaustive(terms, doc_len, avgdl, k, accept=None):
+    scores = np.zeros(len(doc_len))
+    for term in terms:
+        scores[term.doc_ids] += bm25_term_scores(
+            term.idf, term.tfs.astype(np.float64), doc_len[term.doc_ids], avgdl, 1.5, 0.75
+        )
+    matched = np.flatnonzero(scores > 0)
+    if accept is not None:
+        matched = matched[accept(matched)]
+    order = matched[top_k(scores[matched], k)]
+    return order.tolist(), scores[order].tolist()
+
+
+class TestMaxScore:
+    @pytest.mark.parametrize("seed", range(4))
+    @pytest.mark.parametrize("k", [1, 10, 100])
+    def test_matches_exhaustive(self, seed, k):
+        postings, doc_len, avgdl = _zipf_postings(seed)
+        rng = random.Random(seed)
+        for _ in range(10):
+            query = rng.sample(sorted(postings), rng.randint(2, 12))
+            terms = [_term(postings[t], len(doc_len), doc_len, avgdl) for t in query]
+
+            docs, scores, _ = maxscore_top_k(terms, doc_len, avgdl, 1.5, 0.75, k)
+
+            assert (docs.tolist(), scores.tolist()) == _exhaustive(terms, doc_len, avgdl, k)
+
+    def test_skips_frequent_terms(self):
+        postings, doc_len, avgdl = _zipf_postings(0)
+        # Two rare terms and the most frequent ones
+        query = [250, 280, 0, 1, 2, 3]
+        terms = [_term(postings[t], len(doc_len), doc_len, avgdl) for t in query]
+
+        docs, scores, skipped = maxscore_top_k(terms, doc_len, avgdl, 1.5, 0.75, 5)
+
+        assert (docs.tolist(), scores.tolist()) == _exhaustive(terms, doc_len, avgdl, 5)
+        assert skipped > len(postings[0]) // 2
+
+    def test_alive_and_accept(self):
+        postings, doc_len, avgdl = _zipf_postings(1)
+        alive = np.arange(len(doc_len)) % 7 != 0
+        terms = []
+        for t in [3, 40, 41, 120]:
+            live = [(d, tf) for d, tf in postings[t] if alive[d]]
+            bounded = _term(live, int(alive.sum()), doc_len, avgdl)
+            # Postings still hold the dead documents
+            full = _term(postings[t], len(doc_len), doc_len, avgdl)
+            terms.append(TermPostings(full.doc_ids, full.tfs, bounded.idf, bounded.upper_bound))
+
+        def accept(docs):
+            return docs % 3 != 0
+
+        docs, scores, _ = maxscore_top_k(
+            terms, doc_len, avgdl, 1.5, 0.75, 10, alive=alive, accept=accept
+        )
+
+        live_terms = [
+            TermPostings(t.doc_ids[alive[t.doc_ids]], t.tfs[alive[t.doc_ids]], t.idf, 0.0)
+            for t in terms
+        ]
+        assert (docs.tolist(), scores.tolist()) == _exhaustive(
+            live_terms, doc_len, avgdl, 10, accept
+        )
+
+    def test_no_terms(self):
+        docs, scores, skipped = maxscore_top_k([], np.ones(3, dtype=np.int32), 1.0, 1.5, 0.75, 3)
+        assert docs.tolist() == scores.tolist() == [] and skipped == 0
+
+
+def test_idf_floor_uses_average_idf():
+    # "a" appears in every document, so its raw IDF is negative and gets floored
+    corpus = [["a", "b"], ["a"], ["a", "c"], ["d"]]
+    np.testing.assert_allclose(
+        BM25Scorer().score(["a", "d"], corpus), BM25Okapi(corpus).get_scores(["a", "d"])
+    )
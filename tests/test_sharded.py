@@ -0,0 +1,226 @@
+"""Tests for the sharded fan-out retriever, run against a SQLite stand-in."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from langchain_hana_retriever.admission import time_left
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.cache import QueryCache
+from langchain_hana_retriever.executor import DEFAULT_MAX_WORKERS, set_max_workers, submit
+from langchain_hana_retriever.sharded import HANAShardedRetriever
+from langchain_hana_retriever.stats import CorpusStats
+
+DOCS_2023 = [
+    ("acme", "Python programming for data pipelines"),
+    ("acme", "Java programming language basics"),
+    ("globex", "Python scripts for automation"),
+    ("globex", "Gardening tips for spring"),
+]
+DOCS_2024 = [
+    ("acme", "Advanced Python programming patterns"),
+    ("globex", "Cooking recipes with Python snakes"),
+    ("acme", "Rust programming language"),
+]
+
+
+@pytest.fixture
+def connection(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    for table, rows in (("DOCS_2023", DOCS_2023), ("DOCS_2024", DOCS_2024), ("ALL_DOCS", [])):
+        cursor.execute(f"CREATE TABLE {table} (TENANT NVARCHAR(20), VEC_TEXT NCLOB)")
+        cursor.executemany(f"INSERT INTO {table} VALUES (?, ?)", rows)
+    cursor.executemany("INSERT INTO ALL_DOCS VALUES (?, ?)", DOCS_2023 + DOCS_2024)
+    cursor.close()
+    return sqlite_connection
+
+
+class SlowConnection:
+    """Delays every statement, to make one shard miss its timeout."""
+
+    def __init__(self, conn, delay):
+        self.conn = conn
+        self.delay = delay
+
+    def cursor(self):
+        cursor = self.conn.cursor()
+
+        def execute(*args):
+            time.sleep(self.delay)
+            return cursor.execute(*args)
+
+        return SimpleNamespace(execute=execute, fetchall=cursor.fetchall, close=cursor.close)
+
+
+def _base(connection, table_name="DOCS_2023", **kwargs):
+    return HANABm25Retriever(
+        connection=connection,
+        table_name=table_name,
+        metadata_columns=["TENANT"],
+        candidate_limit=100,
+        **kwargs,
+    )
+
+
+def _contents(docs):
+    return [doc.page_content for doc in docs]
+
+
+class TestHANAShardedRetriever:
+    def test_global_stats_match_single_table(self, connection):
+        sharded = HANAShardedRetriever.from_tables(
+            _base(connection), ["DOCS_2023", "DOCS_2024"], global_stats=True, k=4
+        )
+        stats = sharded.corpus_stats
+        single = _base(
+            connection,
+            table_name="ALL_DOCS",
+            k=4,
+            corpus_stats=CorpusStats.from_table(connection, "ALL_DOCS"),
+        )
+
+        results = sharded.invoke("python programming")
+        expected = single.invoke("python programming")
+
+        assert stats.doc_count == len(DOCS_2023) + len(DOCS_2024)
+        assert all(shard.corpus_stats is stats for shard in sharded.shards)
+        assert _contents(results) == _contents(expected)
+        scores = [doc.metadata["bm25_score"] for doc in results]
+        assert scores == sorted(scores, reverse=True)
+        assert {doc.metadata["shard"] for doc in results} == {"DOCS_2023", "DOCS_2024"}
+
+    def test_from_tables_names_and_batch(self, connection):
+        sharded = HANAShardedRetriever.from_tables(_base(connection), ["DOCS_2023", "DOCS_2024"])
+
+        batched = sharded.batch(["python", "language"])
+
+        assert batched[0] == sharded.invoke("python")
+        assert batched[1] == asyncio.run(sharded.ainvoke("language"))
+        assert sharded.shards[0].table_name == "DOCS_2023"
+
+    def test_from_partitions(self, connection):
+        sharded = HANAShardedRetriever.from_partitions(
+            _base(connection, table_name="ALL_DOCS"), "TENANT", ["acme", "globex"]
+        )
+
+        results = sharded.invoke("python")
+
+        assert sharded.names() == ["TENANT=acme", "TENANT=globex"]
+        for doc in results:
+            assert doc.metadata["shard"] == f"TENANT={doc.metadata['TENANT']}"
+        assert len(results) == 4
+
+    def test_filter_is_forwarded(self, connection):
+        sharded = HANAShardedRetriever.from_tables(_base(connection), ["DOCS_2023", "DOCS_2024"])
+
+        results = sharded.invoke("python", filter={"TENANT": "globex"})
+
+        assert set(_contents(results)) == {
+            "Python scripts for automation",
+            "Cooking recipes with Python snakes",
+        }
+        assert all(doc.metadata["TENANT"] == "globex" for doc in results)
+
+    def test_slow_shard_is_skipped(self, connection):
+        shards = [
+            _base(connection),
+            _base(SlowConnection(connection, 0.5), table_name="DOCS_2024"),
+        ]
+        sharded = HANAShardedRetriever(shards=shards, shard_timeout=0.1)
+
+        results = sharded.invoke("python")
+        async_results = asyncio.run(sharded.ainvoke("python"))
+
+        for docs in (results, async_results):
+            assert docs
+            assert all(doc.metadata["shard"] == "DOCS_2023" for doc in docs)
+            assert all(doc.metadata["skipped_shards"] == ["DOCS_2024"] for doc in docs)
+
+    def test_shards_sharing_a_cache(self, connection):
+        sharded = HANAShardedRetriever.from_tables(
+            _base(connection, cache=QueryCache()), ["DOCS_2023", "DOCS_2024"]
+        )
+
+        results = sharded.invoke("rust")
+
+        assert _contents(results) == ["Rust programming language"]
+
+    def test_from_tables_drops_single_table_components(self, connection):
+        stats = CorpusStats.from_table(connection, "DOCS_2023")
+        base = _base(connection, corpus_stats=stats)
+
+        sharded = HANAShardedRetriever.from_tables(base, ["DOCS_2023", "DOCS_2024"])
+
+        for shard in sharded.shards:
+            assert shard.corpus_stats is None
+            assert shard.postings_index is None and shard.replica is None
+        assert len(sharded.invoke("python")) == 4
+
+    def test_fans_out_from_a_pool_worker(self, connection):
+        sharded = HANAShardedRetriever.from_tables(_base(connection), ["DOCS_2023", "DOCS_2024"])
+        set_max_workers(1)
+        try:
+            nested = submit(sharded.invoke, "python").result(timeout=5)
+            batched = submit(sharded.batch, ["python"]).result(timeout=5)
+        finally:
+            set_max_workers(DEFAULT_MAX_WORKERS)
+
+        assert nested == batched[0] == sharded.invoke("python")
+
+    def test_slow_shard_is_skipped_from_a_pool_worker(self, connection):
+        shards = [
+            _base(connection),
+            _base(SlowConnection(connection, 0.5), table_name="DOCS_2024"),
+        ]
+        sharded = HANAShardedRetriever(shards=shards, shard_timeout=0.1)
+        set_max_workers(1)
+        try:
+            start = time.monotonic()
+            nested = submit(sharded.invoke, "python").result(timeout=5)
+            elapsed = time.monotonic() - start
+        finally:
+            set_max_workers(DEFAULT_MAX_WORKERS)
+
+        assert elapsed < 0.4
+        assert all(doc.metadata["skipped_shards"] == ["DOCS_2024"] for doc in nested)
+
+    def test_shards_run_under_shard_timeout_deadline(self, connection):
+        seen = []
+
+        class DeadlineConnection(SlowConnection):
+            def cursor(self):
+                seen.append(time_left())
+                return super().cursor()
+
+        shards = [_base(DeadlineConnection(connection, 0)), _base(connection, "DOCS_2024")]
+        sharded = HANAShardedRetriever(shards=shards, shard_timeout=2.0)
+
+        sharded.invoke("python")
+        asyncio.run(sharded.ainvoke("python"))
+
+        assert len(seen) == 2
+        assert all(left is not None and 0 < left <= 2.0 for left in seen)
+
+    def test_batch_rejects_unknown_kwargs(self, connection):
+        sharded = HANAShardedRetriever.from_tables(_base(connection), ["DOCS_2023", "DOCS_2024"])
+
+        with pytest.raises(TypeError, match="unexpected batch keyword arguments: k"):
+            sharded.batch(["python"], k=2)
+
+    def test_rejects_mismatched_names(self, connection):
+        with pytest.raises(ValueError, match="one entry per shard"):
+            HANAShardedRetriever(shards=[_base(connection)], shard_names=["a", "b"])
+
+
+def test_merge_stats():
+    first, second = CorpusStats(), CorpusStats()
+    first.add_texts(["python code", "java code"])
+    second.add_texts(["python snakes"])
+
+    merged = CorpusStats.merge([first, second])
+
+    assert merged.doc_count == 3
+    assert merged.total_length == 6
+    assert merged.doc_freqs["python"] == 2
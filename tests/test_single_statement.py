@@ -0,0 +1,217 @@
+"""Tests for single-statement hybrid retrieval, run against a SQLite stand-in."""
+
+import json
+import math
+from enum import Enum
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+from langchain_hana_retriever.admission import AdmissionController
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.hybrid import HANAHybridRetriever
+from langchain_hana_retriever.planner import QueryPlan
+
+
+class DistanceStrategy(Enum):
+    COSINE = "COSINE"
+    EUCLIDEAN_DISTANCE = "EUCLIDEAN_DISTANCE"
+
+
+DOCS = [
+    ("Python programming language", [1.0, 0.0, 0.0], "a.pdf"),
+    ("Java programming language", [0.8, 0.6, 0.0], "b.pdf"),
+    ("Python data science", [0.6, 0.0, 0.8], "c.pdf"),
+    ("Cooking recipes for dinner", [0.0, 1.0, 0.0], "d.pdf"),
+]
+QUERY_VECTORS = {"python code": [0.9, 0.1, 0.3], "dinner": [0.1, 0.9, 0.0]}
+
+
+def _parse(vector):
+    return json.loads(vector) if isinstance(vector, str) else vector
+
+
+def _cosine(a, b):
+    a, b = _parse(a), _parse(b)
+    dot = sum(x * y for x, y in zip(a, b, strict=True))
+    return dot / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)))
+
+
+def _l2(a, b):
+    a, b = _parse(a), _parse(b)
+    return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b, strict=True)))
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return QUERY_VECTORS[text]
+
+
+class FakeHanaDB:
+    """Python implementation of the HanaDB attributes and search used by the retriever."""
+
+    def __init__(self, distance_strategy=DistanceStrategy.COSINE):
+        self.table_name = "EMBEDDINGS"
+        self.content_column = "VEC_TEXT"
+        self.metadata_column = "VEC_META"
+        self.vector_column = "VEC_VECTOR"
+        self.distance_strategy = distance_strategy
+        self.embedding = FakeEmbeddings()
+
+    def similarity_search(self, query, k=4, filter=None):
+        vector = self.embedding.embed_query(query)
+        docs = [d for d in DOCS if not filter or d[2] == filter["SOURCE"]]
+        if self.distance_strategy is DistanceStrategy.COSINE:
+            docs.sort(key=lambda d: -_cosine(d[1], vector))
+        else:
+            docs.sort(key=lambda d: _l2(d[1], vector))
+        return [Document(page_content=d[0], metadata={"source": d[2]}) for d in docs[:k]]
+
+
+class CountingConnection:
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = []
+
+    def cursor(self):
+        cursor = self.conn.cursor()
+        statements = self.statements
+        execute = cursor.execute
+        return SimpleNamespace(
+            execute=lambda sql, params=(): statements.append(sql) or execute(sql, params),
+            fetchall=cursor.fetchall,
+            close=cursor.close,
+        )
+
+
+@pytest.fixture
+def connection(sqlite_connection):
+    sqlite_connection.create_function("TO_REAL_VECTOR", 1, lambda v: v, deterministic=True)
+    sqlite_connection.create_function("COSINE_SIMILARITY", 2, _cosine, deterministic=True)
+    sqlite_connection.create_function("L2DISTANCE", 2, _l2, deterministic=True)
+    cursor = sqlite_connection.cursor()
+    cursor.execute(
+        "CREATE TABLE EMBEDDINGS (VEC_TEXT NCLOB, VEC_META NCLOB, VEC_VECTOR NCLOB, "
+        "SOURCE NVARCHAR(255))"
+    )
+    cursor.executemany(
+        "INSERT INTO EMBEDDINGS VALUES (?, ?, ?, ?)",
+        [(text, json.dumps({"source": src}), json.dumps(vec), src) for text, vec, src in DOCS],
+    )
+    cursor.close()
+    return CountingConnection(sqlite_connection)
+
+
+def _hybrid(connection, store, single_statement, **kwargs):
+    keyword = HANABm25Retriever(
+        connection=connection, table_name="EMBEDDINGS", metadata_columns=["SOURCE"]
+    )
+    return HANAHybridRetriever(
+        vector_store=store,
+        keyword_retriever=keyword,
+        k=3,
+        single_statement=single_statement,
+        **kwargs,
+    )
+
+
+def _contents(docs):
+    return [doc.page_content for doc in docs]
+
+
+class TestSingleStatementHybrid:
+    @pytest.mark.parametrize("strategy", list(DistanceStrategy))
+    @pytest.mark.parametrize("query", list(QUERY_VECTORS))
+    def test_matches_two_round_trips(self, connection, strategy, query):
+        store = FakeHanaDB(strategy)
+        expected = _hybrid(connection, store, False).invoke(query)
+        connection.statements.clear()
+
+        results = _hybrid(connection, store, True).invoke(query)
+
+        assert _contents(results) == _contents(expected)
+        assert len(connection.statements) == 1
+        assert "UNION ALL" in connection.statements[0]
+
+    def test_embeds_query_once(self, connection):
+        store = FakeHanaDB()
+
+        _hybrid(connection, store, True).invoke("python code")
+
+        assert store.embedding.calls == 1
+
+    def test_vector_documents_carry_store_metadata(self, connection):
+        results = _hybrid(connection, FakeHanaDB(), True, alpha=1.0).invoke("dinner")
+
+        assert results[0].page_content == "Cooking recipes for dinner"
+        assert results[0].metadata["source"] == "d.pdf"
+
+    def test_filter_applies_to_both_legs(self, connection):
+        store = FakeHanaDB()
+        where = {"SOURCE": "c.pdf"}
+
+        results = _hybrid(connection, store, True).invoke("python code", filter=where)
+        expected = _hybrid(connection, store, False).invoke("python code", filter=where)
+
+        assert _contents(results) == _contents(expected) == ["Python data science"]
+
+    def test_keyword_retriever_filter_applies_to_keyword_leg(self, connection):
+        store = FakeHanaDB()
+        single = _hybrid(connection, store, True)
+        single.keyword_retriever.filter = {"SOURCE": "b.pdf"}
+        two_legs = _hybrid(connection, store, False)
+        two_legs.keyword_retriever.filter = {"SOURCE": "b.pdf"}
+
+        results = single.invoke("python code")
+
+        assert "SOURCE = ?" in connection.statements[-1].split("UNION ALL")[1]
+        assert _contents(results) == _contents(two_legs.invoke("python code"))
+        # Python rows (a.pdf, c.pdf) only come back through the unfiltered vector leg
+        assert all("bm25_score" not in doc.metadata for doc in results)
+
+    def test_sql_shape(self, connection):
+        retriever = _hybrid(connection, FakeHanaDB(DistanceStrategy.EUCLIDEAN_DISTANCE), True)
+        plan = retriever.keyword_retriever._plan(["python"])
+
+        sql = retriever.single_statement_sql(plan)
+
+        assert 'L2DISTANCE("VEC_VECTOR", TO_REAL_VECTOR(?))' in sql
+        assert "ORDER BY SCORE ASC LIMIT 3" in sql
+        assert retriever.single_statement_params(plan) == ["python"]
+
+    def test_keyword_leg_degrades_near_deadline(self, connection):
+        retriever = _hybrid(connection, FakeHanaDB(), True, request_timeout=5.0)
+        retriever.keyword_retriever.admission = AdmissionController(degrade_within=60.0)
+        retriever.keyword_retriever.candidate_limit = 40
+
+        retriever.invoke("python code")
+
+        assert "LIMIT 10) K" in connection.statements[-1]
+
+    def test_widened_keyword_leg_stays_degraded(self, connection, monkeypatch):
+        retriever = _hybrid(connection, FakeHanaDB(), True, request_timeout=5.0)
+        retriever.keyword_retriever.admission = AdmissionController(degrade_within=60.0)
+        retriever.keyword_retriever.candidate_limit = 40
+        monkeypatch.setattr(
+            HANABm25Retriever,
+            "_plan",
+            lambda self, tokens: QueryPlan(terms=list(tokens), dropped=[], strategy="and"),
+        )
+
+        retriever.invoke("python code")
+
+        # No row has both terms, so the OR fallback runs, with the degraded limit too
+        assert "LIMIT 10) K" in connection.statements[-2]
+        assert connection.statements[-1].endswith("LIMIT 10")
+
+    def test_rejects_different_tables(self, connection):
+        store = FakeHanaDB()
+        store.table_name = "OTHER"
+
+        with pytest.raises(ValueError, match="same table"):
+            _hybrid(connection, store, True)
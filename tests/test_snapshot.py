@@ -0,0 +1,137 @@
+"""Tests for memory-mapped index snapshots, run against a SQLite stand-in."""
+
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.cache import table_version_probe
+from langchain_hana_retriever.replica import LocalIndexReplica
+from langchain_hana_retriever.snapshot import (
+    FORMAT_VERSION,
+    IndexSnapshot,
+    StaleSnapshotError,
+    main,
+    write_snapshot,
+)
+
+DOCS = [
+    ("1", 1, "Python programming language", "a.pdf"),
+    ("2", 1, "Java programming language", "b.pdf"),
+    ("3", 2, "Python data science with Python", "c.pdf"),
+    ("4", 3, "Cocina española: recetas para la cena", "d.pdf"),
+]
+
+
+@pytest.fixture
+def table(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute(
+        "CREATE TABLE DOCS (ID NVARCHAR(10), TS INTEGER, VEC_TEXT NCLOB, SOURCE NVARCHAR(255))"
+    )
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?, ?, ?)", DOCS)
+    cursor.close()
+    return sqlite_connection
+
+
+@pytest.fixture
+def replica(table):
+    replica = LocalIndexReplica(
+        table, "DOCS", id_column="ID", metadata_columns=["SOURCE"], timestamp_column="TS"
+    )
+    replica.load()
+    return replica
+
+
+@pytest.fixture
+def snapshot_path(table, replica, tmp_path):
+    path = tmp_path / "docs.idx"
+    version = table_version_probe(table, "DOCS", "TS")()
+    replica.save_snapshot(path, source_version=version)
+    return path
+
+
+class TestIndexSnapshot:
+    def test_search_matches_replica(self, replica, snapshot_path):
+        with IndexSnapshot.open(snapshot_path) as snapshot:
+            for query in (["python", "language"], ["española", "cena"], ["missing"]):
+                assert snapshot.search(query, 3) == replica.search(query, 3)
+                assert snapshot.search(query, 1) == snapshot.search(query, 1, prune=False)
+            assert snapshot.idf("python") == pytest.approx(replica.idf("python"))
+            assert snapshot.row(0) == ("1", ("Python programming language", "a.pdf"))
+
+    def test_snapshot_after_deletes(self, replica, tmp_path):
+        replica.delete_documents(["1"])
+        path = tmp_path / "docs.idx"
+        replica.save_snapshot(path)
+
+        with IndexSnapshot(path) as snapshot:
+            assert snapshot.doc_count == 3
+            assert snapshot.search(["python"], 3) == replica.search(["python"], 3)
+
+    def test_refuses_stale_snapshot(self, table, snapshot_path):
+        IndexSnapshot.open(snapshot_path, connection=table).close()
+
+        cursor = table.cursor()
+        cursor.execute("UPDATE DOCS SET TS = 5 WHERE ID = '1'")
+        cursor.close()
+
+        with pytest.raises(StaleSnapshotError):
+            IndexSnapshot.open(snapshot_path, connection=table)
+        with pytest.raises(StaleSnapshotError):
+            IndexSnapshot.open(snapshot_path, max_age=-1)
+
+    def test_rejects_other_format_version(self, snapshot_path):
+        data = bytearray(snapshot_path.read_bytes())
+        data[8:12] = (FORMAT_VERSION + 1).to_bytes(4, "little")
+        snapshot_path.write_bytes(bytes(data))
+
+        with pytest.raises(ValueError, match="format"):
+            IndexSnapshot(snapshot_path)
+
+    def test_rows_keep_value_types(self, tmp_path):
+        published = datetime.date(2024, 5, 1)
+        row = ("Python release notes", published, Decimal("3.12"), b"\x00\x01")
+        path = tmp_path / "typed.idx"
+        write_snapshot(
+            path,
+            {"python": ([0], [1]), "release": ([0], [1]), "notes": ([0], [1])},
+            [3],
+            ["1"],
+            [row],
+            table_name="DOCS",
+            content_column="VEC_TEXT",
+            metadata_columns=["PUBLISHED", "VERSION", "DIGEST"],
+        )
+
+        with IndexSnapshot(path) as snapshot:
+            assert snapshot.row(0) == ("1", row)
+            retriever = HANABm25Retriever(
+                connection=None,
+                table_name="DOCS",
+                metadata_columns=["PUBLISHED", "VERSION", "DIGEST"],
+                replica=snapshot,
+            )
+            newer = retriever.invoke("python", filter={"VERSION": {"$gte": 3.9}})
+            older = retriever.invoke("python", filter={"VERSION": {"$lt": 3.9}})
+
+        assert newer == [] and len(older) == 1
+
+    def test_retriever_uses_snapshot(self, table, snapshot_path):
+        with IndexSnapshot(snapshot_path) as snapshot:
+            retriever = HANABm25Retriever(
+                connection=None, table_name="DOCS", metadata_columns=["SOURCE"], replica=snapshot
+            )
+            results = retriever.invoke("java")
+
+        assert results[0].page_content == "Java programming language"
+        assert results[0].metadata["SOURCE"] == "b.pdf"
+
+    def test_cli_info(self, snapshot_path, capsys):
+        assert main(["info", str(snapshot_path)]) == 0
+
+        header = json.loads(capsys.readouterr().out)
+        assert header["table_name"] == "DOCS"
+        assert header["doc_count"] == 4
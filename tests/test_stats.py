@@ -0,0 +1,75 @@
+"""Tests for corpus-wide BM25 statistics."""
+
+import math
+from unittest.mock import MagicMock
+
+import pytest
+
+from langchain_hana_retriever.stats import CorpusStats
+from langchain_hana_retriever.utils import tokenize
+
+DOCS = [
+    "Python programming language",
+    "Java programming language",
+    "Python data science",
+    "Cooking recipes for dinner",
+]
+
+
+@pytest.fixture
+def stats():
+    corpus_stats = CorpusStats()
+    corpus_stats.add_texts(DOCS)
+    return corpus_stats
+
+
+class TestCorpusStats:
+    def test_counts_documents_and_lengths(self, stats):
+        assert stats.doc_count == 4
+        assert stats.total_length == 13
+        assert stats.avgdl == pytest.approx(13 / 4)
+        assert stats.doc_freqs["python"] == 2
+        assert stats.doc_freqs["cooking"] == 1
+
+    def test_idf_is_non_negative(self, stats):
+        stats.add_texts(["python"] * 10)
+        assert stats.idf("python") > 0
+        assert stats.idf("missing") == pytest.approx(math.log(1 + (14 + 0.5) / 0.5))
+
+    def test_rare_terms_score_higher(self, stats):
+        corpus = [tokenize("Python programming"), tokenize("Cooking programming")]
+        scores = stats.score(["cooking"], corpus)
+        assert scores[0] == 0.0
+        assert scores[1] > 0.0
+        assert stats.idf("cooking") > stats.idf("programming")
+
+    def test_remove_and_update(self, stats):
+        stats.remove_texts(["Cooking recipes for dinner"])
+        assert stats.doc_count == 3
+        assert "cooking" not in stats.doc_freqs
+
+        stats.update_document(tokenize("Java programming language"), tokenize("Rust"))
+        assert stats.doc_freqs["programming"] == 1
+        assert stats.doc_freqs["rust"] == 1
+        assert stats.doc_count == 3
+
+    def test_save_and_load(self, stats, tmp_path):
+        path = tmp_path / "stats.json"
+        stats.save(path)
+        loaded = CorpusStats.load(path)
+        assert loaded.doc_count == stats.doc_count
+        assert loaded.total_length == stats.total_length
+        assert loaded.doc_freqs == stats.doc_freqs
+
+    def test_from_table_streams_rows(self):
+        cursor = MagicMock()
+        cursor.fetchmany.side_effect = [[(DOCS[0],), (DOCS[1],)], [(DOCS[2],)], []]
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+
+        stats = CorpusStats.from_table(conn, "TEST_TABLE", batch_size=2)
+
+        assert stats.doc_count == 3
+        sql = cursor.execute.call_args[0][0]
+        assert sql == "SELECT VEC_TEXT FROM TEST_TABLE"
+        cursor.close.assert_called_once()
@@ -0,0 +1,155 @@
+"""Tests for the trigram side index, run against a SQLite stand-in."""
+
+import pytest
+
+from langchain_hana_retriever.bm25 import HANABm25Retriever
+from langchain_hana_retriever.planner import QueryPlanner
+from langchain_hana_retriever.stats import CorpusStats
+from langchain_hana_retriever.trigram import HANATrigramIndex, trigrams
+
+DOCS = [
+    ("1", "Configuration guide for the server", "a.pdf"),
+    ("2", "Edit the config files by hand", "b.pdf"),
+    ("3", "Python programming language", "c.pdf"),
+    ("4", "Reconfigure Python logging", "d.pdf"),
+    ("5", "Cooking recipes for dinner", "e.pdf"),
+]
+STATS = CorpusStats()
+STATS.add_texts(text for _, text, _ in DOCS)
+
+
+@pytest.fixture
+def connection(sqlite_connection):
+    cursor = sqlite_connection.cursor()
+    cursor.execute("CREATE TABLE DOCS (ID NVARCHAR(10), VEC_TEXT NCLOB, SOURCE NVARCHAR(255))")
+    cursor.executemany("INSERT INTO DOCS VALUES (?, ?, ?)", DOCS)
+    cursor.close()
+    return sqlite_connection
+
+
+@pytest.fixture
+def index(connection):
+    # Narrow even by trigrams shared by most of the five documents
+    trigram_index = HANATrigramIndex(connection, "DOCS", id_column="ID", max_df_ratio=1.0)
+    trigram_index.create()
+    trigram_index.build(batch_size=2)
+    return trigram_index
+
+
+def _retriever(connection, **kwargs):
+    return HANABm25Retriever(
+        connection=connection,
+        table_name="DOCS",
+        metadata_columns=["SOURCE"],
+        id_column="ID",
+        **kwargs,
+    )
+
+
+def _execute(conn, sql, params=()):
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    cursor.close()
+
+
+def _sources(docs):
+    return [doc.metadata["SOURCE"] for doc in docs]
+
+
+class TestHANATrigramIndex:
+    def test_trigrams(self):
+        assert trigrams("Config") == {"con", "onf", "nfi", "fig"}
+        assert trigrams("go") == set()
+        assert trigrams(None) == set()
+
+    def test_narrow_sql(self, index):
+        sql, params = index.narrow_sql(["config", "py"], "and")
+        assert sql.count("IN (SELECT DOC_KEY") == 1
+        assert set(params) == trigrams("config")
+        # Any OR term without trigrams may match every row
+        assert index.narrow_sql(["config", "py"], "or") is None
+        assert index.narrow_sql(["go"], "and") is None
+
+    @pytest.mark.parametrize(
+        "options",
+        [
+            {},
+            {"two_phase": True},
+            {"fetch_size": 2},
+            {"planner": QueryPlanner()},
+            {
+                "planner": QueryPlanner(max_df_ratio=1.0, and_min_matches=0.01),
+                "corpus_stats": STATS,
+            },
+        ],
+    )
+    def test_results_match_scan(self, connection, index, options):
+        scan = _retriever(connection, **options)
+        narrowed = _retriever(connection, trigram_index=index, **options)
+
+        for query in ("config", "python config", "recipes", "go python"):
+            assert narrowed.invoke(query) == scan.invoke(query)
+        assert narrowed.batch(["config", "python"]) == scan.batch(["config", "python"])
+        assert set(_sources(narrowed.invoke("config"))) == {"a.pdf", "b.pdf", "d.pdf"}
+
+    def test_narrows_with_filter(self, connection, index):
+        retriever = _retriever(connection, trigram_index=index)
+
+        results = retriever.invoke("config", filter={"SOURCE": {"$in": ["b.pdf", "d.pdf"]}})
+
+        assert sorted(_sources(results)) == ["b.pdf", "d.pdf"]
+
+    def test_incremental_maintenance(self, connection, index):
+        retriever = _retriever(connection, trigram_index=index)
+        _execute(connection, "INSERT INTO DOCS VALUES ('6', 'Kubernetes config maps', 'f.pdf')")
+        _execute(connection, "UPDATE DOCS SET VEC_TEXT = 'Gardening tips' WHERE ID = '2'")
+        _execute(connection, "DELETE FROM DOCS WHERE ID = '1'")
+
+        # Rows missing from the index are not candidates until it is synced
+        assert "f.pdf" not in _sources(retriever.invoke("kubernetes config"))
+
+        index.sync_documents(["1", "2", "6"])
+
+        assert sorted(_sources(retriever.invoke("config"))) == ["d.pdf", "f.pdf"]
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT COUNT(*) FROM {index.trigram_table} WHERE DOC_KEY = '1'")
+        assert cursor.fetchone()[0] == 0
+        cursor.close()
+
+    def test_add_update_delete(self, connection, index):
+        retriever = _retriever(connection, trigram_index=index)
+        _execute(connection, "UPDATE DOCS SET VEC_TEXT = 'Dinner party menu' WHERE ID = '3'")
+
+        index.update_documents([("3", "Dinner party menu")])
+        index.delete_documents(["5"])
+
+        assert _sources(retriever.invoke("dinner")) == ["c.pdf"]
+
+    def test_frequent_trigrams_are_not_used(self, connection, index):
+        selective = HANATrigramIndex(connection, "DOCS", id_column="ID", max_grams=2)
+
+        # "config" only has trigrams found in three of five documents
+        assert selective.narrow_sql(["config"], "or") is None
+        sql, params = selective.narrow_sql(["config", "dinner"], "and")
+        assert len(params) == 2 and set(params) <= trigrams("dinner")
+        assert "HAVING COUNT(DISTINCT GRAM) = 2" in sql
+
+    def test_narrows_once_per_plan(self, connection, index, monkeypatch):
+        retriever = _retriever(connection, trigram_index=index)
+        calls = []
+        narrow_sql = index.narrow_sql
+
+        def recording(terms, strategy="or"):
+            calls.append(terms)
+            return narrow_sql(terms, strategy)
+
+        monkeypatch.setattr(index, "narrow_sql", recording)
+
+        assert set(_sources(retriever.invoke("config"))) == {"a.pdf", "b.pdf", "d.pdf"}
+        assert calls == [["config"]]
+
+    def test_rejects_other_table(self, connection, index):
+        other = HANATrigramIndex(connection, "OTHER", id_column="ID")
+        with pytest.raises(ValueError, match="trigram_index"):
+            _retriever(connection, trigram_index=other)
+        assert index.trigram_table == "DOCS_TRIGRAMS"